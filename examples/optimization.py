@@ -6,6 +6,7 @@ from scipy.optimize import minimize
 import magcoilcalc
 import magcoilcalc.plotting
 import magcoilcalc.calculations
+import magcoilcalc.optimize
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -54,6 +55,9 @@ if __name__ == '__main__':
     res = minimize(opt_func, x0=np.array(initial_l), tol=0.02)
     optimal_l = res.x[0]
     print(res)
+    # the same search with the multi-fidelity driver: coarse meshes and lumped loops first, full resolution last.
+    res_mf = magcoilcalc.optimize.optimize_design(lambda l: construction_func(l).sources, [initial_l], 180, 60)
+    print(res_mf['x'], res_mf['fun'], res_mf['evaluations'])
     t1 = construction_func(initial_l)
     t2 = construction_func(optimal_l)
     t1.run(), t2.run()
@@ -0,0 +1,91 @@
+"""
+Append-only checkpoint files for long scans and batch runs. Every finished evaluation is appended as one pickled
+(key, value) record behind its length and flushed to disk, so a run that dies loses at most the evaluations in
+progress. Opening the file again loads the finished records, and a record cut short by the crash is dropped.
+"""
+import os
+import pickle
+import struct
+
+_HEADER = struct.Struct('<Q')
+
+
+class Checkpoint(object):
+    def __init__(self, path, sync=True):
+        """
+        :param path: checkpoint file, created if missing.
+        :param sync: fsync after every record, so that records also survive the loss of the machine.
+        """
+        self.path = path
+        self.sync = sync
+        self._results = dict()
+        end = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                while True:
+                    header = file.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        break
+                    size = _HEADER.unpack(header)[0]
+                    payload = file.read(size)
+                    if len(payload) < size:
+                        break
+                    key, value = pickle.loads(payload)
+                    self._results[key] = value
+                    end = file.tell()
+        self._file = open(path, 'ab')
+        # drop a partial record left by a crash, new records go right after the last complete one.
+        self._file.truncate(end)
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+    def __getitem__(self, key):
+        return self._results[key]
+
+    def add(self, key, value):
+        """
+        Stores the result of an evaluation.
+        :param key: picklable, hashable key, e.g. a parameter tuple or a task fingerprint.
+        :param value: picklable result.
+        :return: None
+        """
+        payload = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_HEADER.pack(len(payload)) + payload)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self._results[key] = value
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _Borrowed(object):
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+
+    def __enter__(self):
+        return self.checkpoint
+
+    def __exit__(self, *args):
+        pass
+
+
+def open_checkpoint(checkpoint):
+    """
+    :param checkpoint: path of a checkpoint file, or an open Checkpoint, which is left open.
+    :return: context manager giving the Checkpoint.
+    """
+    if isinstance(checkpoint, Checkpoint):
+        return _Borrowed(checkpoint)
+    return Checkpoint(checkpoint)
@@ -0,0 +1,90 @@
+"""
+Loop fields as convolutions along x. The field of a loop only depends on (x - x_loop, r), so on a mesh with evenly
+spaced x nodes all loops of one radius that stand at the same fraction of a step from the x nodes share one
+response, shifted by whole nodes. Their total field is that response convolved with the currents on the grid, which
+scipy.signal.fftconvolve evaluates in O(N log N) per mesh row instead of one kernel call per loop and node.
+"""
+import numpy as np
+from scipy.signal import fftconvolve
+from magcoilcalc.core import _loops_b_field_vec, _uniform_step
+
+
+def grid_offsets(loops, x0, dx, tolerance=1e-6):
+    """
+    Places the loops of a loop table on the x grid shifted by a fraction of a step, x0 + (k + f) * dx.
+    :param loops: (L, 3) array of [x, r, current] in mm and amps.
+    :param tolerance: resolution of the fractions f, in steps. Loops within it of each other share a fraction.
+    :return: (grid indices k, fractions f in [0, 1) rounded to multiples of tolerance)
+    """
+    position = (loops[:, 0] - x0) / dx
+    index = np.floor(position).astype(int)
+    fraction = np.round((position - index) / tolerance) * tolerance
+    wrapped = fraction >= 1
+    index[wrapped] += 1
+    fraction[wrapped] = 0.0
+    return index, fraction
+
+
+def _convolve(response, pattern, nx):
+    """
+    Field on nx nodes of the currents pattern[q], with response[:, m] the field of a unit loop at pattern index q on
+    node m + q - (len(pattern) - 1). Non-finite response samples, nodes on a wire, are left out of the transform and
+    added back directly, so that they stay local as in a direct evaluation.
+    """
+    bad = ~np.isfinite(response)
+    field = fftconvolve(np.where(bad, 0.0, response), pattern[None, :], mode='valid', axes=1)
+    if bad.any():
+        rows, columns = np.nonzero(bad)
+        for q in np.flatnonzero(pattern):
+            j = columns - (len(pattern) - 1) + q
+            inside = (j >= 0) & (j < nx)
+            np.add.at(field, (rows[inside], j[inside]), pattern[q] * response[rows[inside], columns[inside]])
+    return field
+
+
+def fft_loops_b_field(loops, x, y, x_tolerance=1e-6):
+    """
+    Field of a loop table on the grid meshgrid(x, y), with x evenly spaced. Loops of one radius and one fractional
+    offset from the x nodes, see grid_offsets, are convolved with one response when that takes fewer kernel
+    evaluations than summing them, all other loops are evaluated directly.
+    :param loops: (L, 3) array of [x, r, current], x and r in mm, current in amps.
+    :param x: (nx, ) evenly spaced x coordinates in mm.
+    :param y: (ny, ) y coordinates in mm.
+    :param x_tolerance: resolution of the fractional offsets, in steps. Convolved loops move by at most half of it.
+    :return: x and y fields in Tesla, (ny, nx) arrays.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    loops = np.asarray(loops, dtype=float).reshape(-1, 3)
+    dx = _uniform_step(x)
+    if dx is None:
+        raise ValueError("FFT solver: evenly spaced x coordinates required.")
+    nx = x.size
+    x_field = np.zeros((y.size, nx))
+    y_field = np.zeros((y.size, nx))
+    direct = [loops[:0]]
+    index, fraction = grid_offsets(loops, x[0], dx, x_tolerance)
+    groups, group_index = np.unique(np.column_stack([loops[:, 1], fraction]), axis=0, return_inverse=True)
+    group_index = group_index.reshape(-1)
+    for g, (radius, offset) in enumerate(groups):
+        members = group_index == g
+        k = index[members]
+        k_min, k_max = k.min(), k.max()
+        span = k_max - k_min + 1
+        if nx + span - 1 >= np.count_nonzero(members) * nx:
+            direct.append(loops[members])
+            continue
+        pattern = np.bincount(k - k_min, weights=loops[members, 2], minlength=span)
+        # unit loop field at node j of a loop at k + offset is response[:, j - k + k_max]
+        offsets = (np.arange(nx + span - 1) - (span - 1) - k_min - offset) * dx
+        x_offsets, y_offsets = np.meshgrid(offsets, y)
+        bx, by = _loops_b_field_vec(np.array([[0.0, radius, 1.0]]), x_offsets, y_offsets)
+        x_field += _convolve(bx, pattern, nx)
+        y_field += _convolve(by, pattern, nx)
+    direct = np.vstack(direct)
+    if len(direct):
+        x_mesh, y_mesh = np.meshgrid(x, y)
+        bx, by = _loops_b_field_vec(direct, x_mesh, y_mesh)
+        x_field += bx
+        y_field += by
+    return x_field, y_field
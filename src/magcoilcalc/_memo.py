@@ -0,0 +1,152 @@
+"""
+Process-wide memo of single loop field responses on a mesh, shared by every Task run in this process while it is
+enabled. Worker processes of multi-process runs keep their own memo, if any.
+"""
+import threading
+from collections import OrderedDict
+
+
+class _LRUCache(object):
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, count_miss=True):
+        """
+        :param count_miss: count a miss, False for lookups followed by another one for the same value.
+        :return: the stored value, None if missing.
+        """
+        with self._lock:
+            try:
+                value, size, _ = self._entries[key]
+            except KeyError:
+                self.misses += count_miss
+                return None
+            self._entries[key] = (value, size, self.generation)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size, keep_current=False):
+        """
+        :param keep_current: do not evict entries stored or read since the last new_generation, the value is not
+        stored if it only fits by evicting them.
+        :return: whether the value is stored.
+        """
+        with self._lock:
+            if key in self._entries:
+                return True
+            if keep_current:
+                if size > self.max_bytes:
+                    return False
+                while self.nbytes + size > self.max_bytes and self._entries:
+                    oldest = next(iter(self._entries.values()))
+                    if oldest[2] == self.generation:
+                        return False
+                    self._pop_oldest()
+            self._entries[key] = (value, size, self.generation)
+            self.nbytes += size
+            self._evict()
+            return True
+
+    def new_generation(self):
+        """
+        Starts a new generation, e.g. a new run, entries of older generations may be evicted by put(keep_current=True).
+        """
+        with self._lock:
+            self.generation += 1
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _pop_oldest(self):
+        _, (_, evicted_size, _) = self._entries.popitem(last=False)
+        self.nbytes -= evicted_size
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            self._pop_oldest()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _KernelMemo(_LRUCache):
+    def __init__(self, max_bytes, max_seen=2 ** 16):
+        """
+        LRU cache of loop responses that remembers the keys it missed, so that responses are only computed and stored
+        once they are likely to be used again. Loops met once, like those of a winding whose geometry changes from run
+        to run, are evaluated directly.
+        :param max_bytes: memory budget.
+        :param max_seen: keys remembered, forgotten all at once beyond it.
+        """
+        super().__init__(max_bytes)
+        self.max_seen = max_seen
+        self._seen = dict()
+
+    def remember(self, key, value=True):
+        """
+        Remembers a value for a key that missed, e.g. where it was met.
+        :return: the value remembered for the key before, None the first time.
+        """
+        with self._lock:
+            previous = self._seen.get(key)
+            if previous is None and len(self._seen) >= self.max_seen:
+                self._seen.clear()
+            self._seen[key] = value
+            return previous
+
+
+_kernel_memo = None
+
+
+def enable_kernel_memo(max_bytes=256 * 2 ** 20):
+    """
+    Enables the kernel memo: single-process Task runs keep the unit-current field of the loop radii and positions
+    they evaluate again, and reuse it for later runs on the same mesh. On meshes with evenly spaced x nodes loops that
+    differ by whole x steps share one response, so shifting a coil or adding turns at the same pitch costs no new
+    kernel evaluations. Loops met for the first time are evaluated directly, so runs that change the geometry cost
+    about as much as without the memo. Enabling it again keeps the stored responses and only changes the budget.
+    :param max_bytes: memory budget, least recently used responses are dropped beyond it. Responses used by the
+    current run are never dropped for another one of the same run.
+    :return: None
+    """
+    global _kernel_memo
+    if _kernel_memo is None:
+        _kernel_memo = _KernelMemo(max_bytes)
+    else:
+        _kernel_memo.resize(max_bytes)
+
+
+def disable_kernel_memo():
+    """
+    Disables the kernel memo and frees the stored responses.
+    :return: None
+    """
+    global _kernel_memo
+    _kernel_memo = None
+
+
+def kernel_memo_info():
+    """
+    :return: dict with entries, bytes, max_bytes, hits and misses of the kernel memo, None if it is disabled.
+    """
+    memo = _kernel_memo
+    if memo is None:
+        return None
+    return {'entries': len(memo), 'bytes': memo.nbytes, 'max_bytes': memo.max_bytes, 'hits': memo.hits,
+            'misses': memo.misses}
+
+
+def get_kernel_memo():
+    """
+    :return: the active memo, None if disabled.
+    """
+    return _kernel_memo
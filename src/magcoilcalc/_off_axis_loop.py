@@ -79,3 +79,25 @@ def field_radial(i, a, x, r):
         # r is not an array, but is also not zero.
         pass
     return res * sr
+
+
+def mutual_inductance(a, b, d):
+    """
+    Mutual inductance of two coaxial loops.
+    :param a: radius of the first loop in meters.
+    :param b: radius of the second loop in meters.
+    :param d: axial distance between the loop planes in meters.
+    :return: mutual inductance in Henry.
+    """
+    k_ = sqrt(4 * a * b / ((a + b) ** 2 + d ** 2))
+    return u0 * sqrt(a * b) * ((2 / k_ - k_) * K(k_) - 2 / k_ * E(k_))
+
+
+def self_inductance(a, wire_radius):
+    """
+    Self inductance of a loop of round wire with uniform current distribution, valid for wire_radius << a.
+    :param a: loop radius in meters.
+    :param wire_radius: wire radius in meters.
+    :return: self inductance in Henry.
+    """
+    return u0 * a * (np.log(8 * a / wire_radius) - 7 / 4)
@@ -1 +1,3 @@
 DEV = False
+# Upper bound on (points x loops) elements evaluated at once by the vectorized loop kernels.
+VEC_BLOCK_SIZE = 2 ** 22
@@ -0,0 +1,135 @@
+"""
+Treecode for loop fields. Loops are clustered in a kd-tree over (x, r). Seen from points far enough away, a cluster
+acts like a few equivalent loops keeping its total current, center and second moments in (x, r). Clusters too close
+to a tile of points are opened, down to leaves that are evaluated exactly. Each tile of points then takes one kernel
+call over its near loops and far equivalents, so the cost grows like (points + loops) * log(loops) instead of
+points * loops.
+"""
+import numpy as np
+from magcoilcalc.core import _loops_b_field_vec
+
+
+class _KDTree(object):
+    def __init__(self, points, leaf_size):
+        """
+        Recursive bisection at the median of the longer box side.
+        :param points: (N, 2) array.
+        :param leaf_size: largest number of points in a leaf.
+        """
+        self.order = np.arange(len(points))
+        self.lo = []
+        self.hi = []
+        self.ranges = []
+        self.children = []
+        stack = [(0, len(points), None, 0)]
+        while stack:
+            start, stop, parent, side = stack.pop()
+            index = len(self.ranges)
+            if parent is not None:
+                self.children[parent][side] = index
+            chunk = points[self.order[start: stop]]
+            lo = chunk.min(axis=0)
+            hi = chunk.max(axis=0)
+            self.lo.append(lo)
+            self.hi.append(hi)
+            self.ranges.append((start, stop))
+            self.children.append([None, None])
+            if stop - start > leaf_size:
+                axis = int(np.argmax(hi - lo))
+                middle = (stop - start) // 2
+                split = np.argpartition(chunk[:, axis], middle)
+                self.order[start: stop] = self.order[start: stop][split]
+                stack.append((start + middle, stop, index, 1))
+                stack.append((start, start + middle, index, 0))
+        self.lo = np.asarray(self.lo)
+        self.hi = np.asarray(self.hi)
+
+    def is_leaf(self, node):
+        return self.children[node][0] is None
+
+    def leaves(self):
+        return [node for node in range(len(self.ranges)) if self.is_leaf(node)]
+
+
+def _equivalent_loops(loops):
+    """
+    Equivalent loops of a cluster, four per current sign, placed on the principal axes of the current-weighted
+    spread in (x, r) so that the total current, its center and its second moments are kept.
+    :return: (k, 3) array, k <= 8.
+    """
+    equivalents = []
+    for sign in (loops[:, 2] > 0, loops[:, 2] < 0):
+        current = loops[sign, 2]
+        if current.size == 0:
+            continue
+        total = np.sum(current)
+        weights = current / total
+        center = weights @ loops[sign, :2]
+        offsets = loops[sign, :2] - center
+        variance, axes = np.linalg.eigh((offsets * weights[:, None]).T @ offsets)
+        steps = axes * np.sqrt(2 * np.clip(variance, 0, None))
+        for step in (steps[:, 0], -steps[:, 0], steps[:, 1], -steps[:, 1]):
+            equivalents.append([center[0] + step[0], center[1] + step[1], total / 4])
+    return np.asarray(equivalents).reshape(-1, 3)
+
+
+def opening_ratio(tolerance):
+    """
+    Largest ratio of cluster diagonal to box distance at which a cluster is replaced by its equivalent loops. The
+    error of the equivalent loops falls with the cube of that ratio, about 5e-4 * ratio ** 3 of the largest field on
+    multi-layer solenoids, so the ratio keeps a factor 2 margin on that.
+    """
+    return min(1.0, 10 * np.cbrt(tolerance))
+
+
+def treecode_b_field(loops, x, y, tolerance=1e-4, leaf_size=16, tile_size=64):
+    """
+    Field of a loop table on an array of points by treecode.
+    :param loops: (L, 3) array of [x, r, current], x and r in mm, current in amps.
+    :param x: x coordinates in mm, array of any shape.
+    :param y: y coordinates in mm, same shape as x.
+    :param tolerance: target field error relative to the largest field on the points, sets the opening ratio.
+    :param leaf_size: loops per leaf of the loop tree.
+    :param tile_size: points per tile.
+    :return: x and y fields in Tesla, shaped like x.
+    """
+    loops = np.asarray(loops, dtype=float).reshape(-1, 3)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x_field = np.zeros(x.size)
+    y_field = np.zeros(x.size)
+    if len(loops) == 0 or x.size == 0:
+        return x_field.reshape(x.shape), y_field.reshape(x.shape)
+    ratio = opening_ratio(tolerance)
+    loop_tree = _KDTree(loops[:, :2], leaf_size)
+    sorted_loops = loops[loop_tree.order]
+    size = np.hypot(*(loop_tree.hi - loop_tree.lo).T)
+    equivalents = dict()
+
+    # the field is symmetric in y, so points are grouped by |y|.
+    points = np.stack([x.ravel(), np.abs(y.ravel())], axis=-1)
+    point_tree = _KDTree(points, tile_size)
+    for tile in point_tree.leaves():
+        start, stop = point_tree.ranges[tile]
+        members = point_tree.order[start: stop]
+        tile_lo, tile_hi = point_tree.lo[tile], point_tree.hi[tile]
+        selected = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            gap = np.maximum(0, np.maximum(loop_tree.lo[node] - tile_hi, tile_lo - loop_tree.hi[node]))
+            distance = np.hypot(*gap)
+            if size[node] < ratio * distance:
+                if node not in equivalents:
+                    first, last = loop_tree.ranges[node]
+                    equivalents[node] = _equivalent_loops(sorted_loops[first: last])
+                selected.append(equivalents[node])
+            elif loop_tree.is_leaf(node):
+                first, last = loop_tree.ranges[node]
+                selected.append(sorted_loops[first: last])
+            else:
+                stack.extend(loop_tree.children[node])
+        bx, by = _loops_b_field_vec(np.vstack(selected), x.ravel()[members], y.ravel()[members])
+        x_field[members] = bx
+        y_field[members] = by
+    return x_field.reshape(x.shape), y_field.reshape(x.shape)
@@ -0,0 +1,184 @@
+"""
+Batch runner for designs stored as JSON lines, one design per line. A design is either a template call:
+    {"id": "a", "template": "helmholtz_coil", "params": {"r": 250}}
+a list of CurrentLoop arguments:
+    {"id": "b", "sources": [{"x_span": [-10, 10], "radius": 50, "nturns": 20, "current": 1.0, "layers": 2}]}
+or an explicit loop list of [x, r, current] rows:
+    {"id": "c", "loops": [[-50, 100, 1.0], [50, 100, 1.0]]}
+Every design is solved on the same Mesh and produces one JSON result line.
+"""
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from magcoilcalc import templates
+from magcoilcalc.core import CurrentLoop, LoopArray, Mesh, Task, _picklable_mesh
+from magcoilcalc.calculations import fom_cylindrical_cell
+
+
+def build_sources(record):
+    """
+    Builds the sources described by a design record.
+    :param record: dict with either a template and its params, a list of CurrentLoop keyword arguments under
+    sources, or a loop list under loops.
+    :return: list of sources.
+    """
+    if 'template' in record:
+        template = getattr(templates, record['template'], None)
+        if template is None or record['template'].startswith('_'):
+            raise ValueError("Batch: unknown template %s." % record['template'])
+        return template(**record.get('params', {}))
+    elif 'sources' in record:
+        return [CurrentLoop(**kwargs) for kwargs in record['sources']]
+    elif 'loops' in record:
+        return [LoopArray.from_loop_list(record['loops'])]
+    else:
+        raise ValueError("Batch: a design needs one of template, sources or loops.")
+
+
+def evaluate_record(record, mesh, cell_length=None, cell_diameter=None):
+    """
+    Solves one design and summarizes it. Errors are reported in the result instead of being raised.
+    :param record: design record, see build_sources.
+    :param mesh: Mesh to solve on.
+    :param cell_length: cell length in mm for the FOM, no FOM if None.
+    :param cell_diameter: cell diameter in mm for the FOM.
+    :return: dict with id, center_field, fom and timings in seconds, or id and error.
+    """
+    result = {'id': record.get('id')}
+    try:
+        if 'error' in record:
+            raise ValueError(record['error'])
+        t0 = time.perf_counter()
+        task = Task(build_sources(record), mesh)
+        t1 = time.perf_counter()
+        task.run()
+        center_field = [float(component[0]) for component in task.center_field]
+        t2 = time.perf_counter()
+        fom = None
+        if cell_length is not None:
+            fom = float(fom_cylindrical_cell(task, cell_length, cell_diameter))
+        t3 = time.perf_counter()
+        result.update({'center_field': center_field, 'fom': fom,
+                       'timings': {'build': t1 - t0, 'solve': t2 - t1, 'fom': t3 - t2}})
+    except Exception as e:
+        result['error'] = "%s: %s" % (type(e).__name__, e)
+    return result
+
+
+_worker_settings = None
+
+
+def _set_worker_settings(mesh, cell_length, cell_diameter):
+    global _worker_settings
+    _worker_settings = (mesh, cell_length, cell_diameter)
+
+
+def _evaluate_in_worker(record):
+    return evaluate_record(record, *_worker_settings)
+
+
+def read_records(stream):
+    """
+    Parses design records from a stream of JSON lines, skipping blank lines. Lines that fail to parse become records
+    carrying an error.
+    :param stream: iterable of strings.
+    :return: generator of dicts.
+    """
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("JSON object expected")
+        except ValueError as e:
+            record = {'id': 'line %d' % number, 'error': "invalid record: %s" % e}
+        record.setdefault('id', 'line %d' % number)
+        yield record
+
+
+def run_batch(records, mesh, cell_length=None, cell_diameter=None, processes=1, ordered=True, max_pending=None):
+    """
+    Evaluates designs with a pool of worker processes, keeping at most max_pending designs in flight so that memory
+    stays bounded however long the input is. The mesh and cell are sent to each worker once, when it starts, and
+    only the design records travel with every submission.
+    :param records: iterable of design records.
+    :param mesh: Mesh shared by all designs.
+    :param cell_length: cell length in mm for the FOM, no FOM if None.
+    :param cell_diameter: cell diameter in mm for the FOM.
+    :param processes: number of worker processes, 1 to evaluate in this process.
+    :param ordered: yield results in input order, otherwise as soon as they are done.
+    :param max_pending: designs in flight, defaults to 4 per process.
+    :return: generator of result dicts, see evaluate_record.
+    """
+    if processes == 1:
+        for record in records:
+            yield evaluate_record(record, mesh, cell_length, cell_diameter)
+        return
+    if max_pending is None:
+        max_pending = 4 * processes
+    with ProcessPoolExecutor(max_workers=processes, initializer=_set_worker_settings,
+                             initargs=(_picklable_mesh(mesh), cell_length, cell_diameter)) as pool:
+        pending = deque()
+        for record in records:
+            pending.append(pool.submit(_evaluate_in_worker, record))
+            while len(pending) >= max_pending:
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        yield future.result()
+        if ordered:
+            for future in pending:
+                yield future.result()
+        else:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog='magcoilcalc-batch', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', default='-', help="JSON lines file with designs, - for stdin.")
+    parser.add_argument('-o', '--output', default='-', help="JSON lines file for results, - for stdout.")
+    parser.add_argument('--x-range', nargs=2, type=float, default=[-100, 100], metavar=('X1', 'X2'))
+    parser.add_argument('--y-range', nargs=2, type=float, default=[-50, 50], metavar=('Y1', 'Y2'))
+    parser.add_argument('--steps', nargs=2, type=int, default=[51, 31], metavar=('NX', 'NY'))
+    parser.add_argument('--cell', nargs=2, type=float, default=None, metavar=('LENGTH', 'DIAMETER'),
+                        help="cell size in mm, enables the FOM.")
+    parser.add_argument('-p', '--processes', type=int, default=1)
+    parser.add_argument('--unordered', action='store_true', help="write results as soon as they are done.")
+    parser.add_argument('--max-pending', type=int, default=None, help="designs in flight, default 4 per process.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    mesh = Mesh(args.x_range, args.y_range, args.steps[0], args.steps[1])
+    cell_length, cell_diameter = args.cell if args.cell is not None else (None, None)
+    source = sys.stdin if args.input == '-' else open(args.input)
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        results = run_batch(read_records(source), mesh, cell_length, cell_diameter, args.processes,
+                            not args.unordered, args.max_pending)
+        for result in results:
+            sink.write(json.dumps(result) + '\n')
+            sink.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
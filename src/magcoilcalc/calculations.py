@@ -1,40 +1,87 @@
+import math
+from itertools import product
 import numpy as np
+from scipy.interpolate import griddata
+from scipy.spatial import Delaunay
+from magcoilcalc._checkpoint import open_checkpoint
 
 
-def find_gradient(task, lat_field_axis='y', gradient_axes="xyt"):
+# Normalized lateral gradient, in 1/cm, that counts as one unit of the figure of merit.
+FOM_GRADIENT_UNIT = 5e-4
+
+
+def lateral_gradient(lat_field, x, y, gradient_axes='xyt', radial_field=None, axis_limit=True):
     """
-    Finds the lateral field gradient in given axes.
-    :param task: completed task object.
-    :param lat_field_axis: Which field component should be calculated. Doesn't make sense except y direction, really.
-    :param gradient_axes: Gradient along which directions are considered. xy: gradient in the axial plane. xyt: xy plus
-    the tangential gradient.
-    :return: An array describing the field gradient figure.
+    Lateral field gradient on a rectilinear grid, the quantity behind every figure of merit of this package.
+    :param lat_field: (..., ny, nx) field sampled on meshgrid(x, y), leading dimensions are batches.
+    :param x: (nx, ) increasing node x coordinates in mm.
+    :param y: (ny, ) increasing node y coordinates in mm, the radius.
+    :param gradient_axes: x, y, xy (gradient in the axial plane) or xyt (xy plus the tangential gradient Br / r,
+    which tends to dBr / dr on the axis).
+    :param radial_field: radial field for the tangential gradient, defaults to lat_field.
+    :param axis_limit: take dBr / dr as the tangential gradient on the axis. If False, Br / r is taken with r = 1 mm
+    there, which is 0 for the vanishing Br on the axis, as find_gradient does.
+    :return: gradient in field units per cm, shaped like lat_field.
     """
-    if lat_field_axis == 'y':
-        lat_field = task.y_field
-    elif lat_field_axis == 'x':
-        lat_field = task.x_field
-    else:
-        raise ValueError("Gradient calculation: lat_field_axis accepts x, y, xy or xyt.")
-
-    gradient_y = np.gradient(lat_field, task.mesh.y_step / 10, axis=0)
-    gradient_x = np.gradient(lat_field, task.mesh.x_step / 10, axis=1)
+    gradient_y = np.gradient(lat_field, np.asarray(y, dtype=float) / 10, axis=-2)
+    gradient_x = np.gradient(lat_field, np.asarray(x, dtype=float) / 10, axis=-1)
     if gradient_axes == 'xyt':
-        g_axial_plane = np.sqrt(gradient_y ** 2 + gradient_x ** 2)
-        y_mesh_nonzero = task.y_mesh.copy()
-        y_mesh_nonzero[y_mesh_nonzero==0] = 1
-        g_tangent = task.y_field / y_mesh_nonzero * 10
-        g = np.sqrt(g_axial_plane ** 2 + g_tangent ** 2)
-
+        if radial_field is None:
+            radial_field, radial_gradient = lat_field, gradient_y
+        else:
+            radial_gradient = np.gradient(radial_field, np.asarray(y, dtype=float) / 10, axis=-2)
+        r = np.asarray(y, dtype=float)[:, None] / 10
+        if axis_limit:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                tangential = np.where(r != 0, radial_field / r, radial_gradient)
+        else:
+            tangential = radial_field / np.where(r != 0, r, 0.1)
+        return np.sqrt(gradient_y ** 2 + gradient_x ** 2 + tangential ** 2)
     elif gradient_axes == 'xy':
-        g = np.sqrt(gradient_y ** 2 + gradient_x ** 2)
+        return np.sqrt(gradient_y ** 2 + gradient_x ** 2)
     elif gradient_axes == 'y':
-        g = np.abs(gradient_y)
+        return np.abs(gradient_y)
     elif gradient_axes == 'x':
-        g = np.abs(gradient_x)
+        return np.abs(gradient_x)
     else:
         raise ValueError("Gradient calculation: gradient axes accepts x or y or xy.")
-    return g
+
+
+def gradient_fom(gradient, weights, axis=None):
+    """
+    Figure of merit of a normalized lateral gradient: its weighted mean in units of FOM_GRADIENT_UNIT.
+    :param gradient: lateral gradient divided by the center field, 1/cm.
+    :param weights: weights of the nodes, broadcasting against gradient, normalized here.
+    :param axis: axes averaged over, all if None. The others are batches.
+    :return: FOM, lower is better.
+    """
+    weights = np.broadcast_to(weights, np.shape(gradient))
+    return np.sum(gradient * weights, axis=axis) / np.sum(weights, axis=axis) / FOM_GRADIENT_UNIT
+
+
+def find_gradient(task, lat_field_axis='y', gradient_axes="xyt", region=None):
+    """
+    Finds the lateral field gradient in given axes, see lateral_gradient.
+    :param task: completed task object.
+    :param lat_field_axis: Which field component should be calculated. Doesn't make sense except y direction, really.
+    :param gradient_axes: Gradient along which directions are considered. xy: gradient in the axial plane. xyt: xy plus
+    the tangential gradient.
+    :param region: ((x_min, x_max), (y_min, y_max)) in mm to only use the mesh nodes inside, see Task.field_region.
+    None for the whole mesh.
+    :return: An array describing the field gradient figure, NaN on masked nodes and on the nodes next to them. The
+    tangential gradient is taken as 0 on the axis.
+    """
+    if lat_field_axis not in ('x', 'y'):
+        raise ValueError("Gradient calculation: lat_field_axis accepts x, y, xy or xyt.")
+    if region is None:
+        rows, columns = slice(None), slice(None)
+        x_field, y_field = task.x_field, task.y_field
+    else:
+        rows, columns, x_field, y_field = task.field_region(*region)
+    lat_field = y_field if lat_field_axis == 'y' else x_field
+    # node coordinates instead of a fixed step, so that non-uniform meshes are handled too.
+    return lateral_gradient(lat_field, task.mesh.x_linspace[columns], task.mesh.y_linspace[rows], gradient_axes,
+                            radial_field=y_field, axis_limit=False)
 
 
 def fom_cylindrical_cell(task, length, diameter, xsteps=51, ysteps=51):
@@ -50,18 +97,44 @@ def fom_cylindrical_cell(task, length, diameter, xsteps=51, ysteps=51):
     xg, yg = np.meshgrid(ls_x, ls_y)
     x_list = xg.flatten()
     y_list = yg.flatten()
+    mask = task.mesh.mask
+    if mask is not None:
+        rows = np.abs(task.mesh.y_linspace) <= diameter / 2
+        columns = np.abs(task.mesh.x_linspace) <= length / 2
+        if not np.all(mask[np.ix_(rows, columns)]):
+            raise ValueError("FOM calculation: the cell contains masked nodes.")
     center_field = task.center_field
-    weights = abs(y_list) / sum(abs(y_list))
     gradient_interpolator = task.make_gradient_interpolator()
     gradients = gradient_interpolator(np.vstack((x_list, y_list)).T) / center_field[0]
-    return 1 / (5e-4 / np.sum(gradients * weights))
+    return gradient_fom(gradients, np.abs(y_list))
 
 
 def _check_param(param):
     pass
 
 
-def parameter_scan(func, parx=None, pary=None, parz=None, fom_func=fom_cylindrical_cell, processes=1):
+def _checkpointed(func, store):
+    """
+    Wraps a scan function so that its results are read from and appended to a checkpoint, keyed by parameter tuple.
+    """
+    def evaluate(*parameters):
+        key = tuple(float(parameter) for parameter in parameters)
+        if key not in store:
+            store.add(key, func(*parameters))
+        return store[key]
+    return evaluate
+
+
+def parameter_scan(func, parx=None, pary=None, parz=None, fom_func=fom_cylindrical_cell, processes=1,
+                   checkpoint=None):
+    """
+    Evaluates func on the grid of up to 3 parameters.
+    :param checkpoint: path of a checkpoint file or a Checkpoint. Every result is appended to it as soon as it is
+    computed, and parameters found in it are not evaluated again, so a scan that died resumes where it stopped.
+    """
+    if checkpoint is not None:
+        with open_checkpoint(checkpoint) as store:
+            return parameter_scan(_checkpointed(func, store), parx, pary, parz, fom_func, processes)
     if parx is None and pary is None and parz is None:
         raise ValueError("parameter scan: at least 1 parameter required")
 
@@ -99,3 +172,93 @@ def parameter_scan(func, parx=None, pary=None, parz=None, fom_func=fom_cylindric
 
     else:
         raise ValueError("Parameter scan: invalid combination of parameters received")
+
+
+def _simplex_sizes(points, simplices):
+    """
+    Edge-length scale of every simplex, the d-th root of its volume.
+    """
+    corners = points[simplices]
+    edges = corners[:, 1:] - corners[:, :1]
+    dimension = points.shape[1]
+    volume = np.abs(np.linalg.det(edges)) / math.factorial(dimension)
+    return volume ** (1 / dimension)
+
+
+def adaptive_parameter_scan(func, parx=None, pary=None, parz=None, budget=100, initial=5, best_weight=1.0,
+                            checkpoint=None):
+    """
+    Parameter scan that starts from a coarse grid and spends the remaining budget where a linear interpolation of
+    the FOM is least trustworthy. The samples are triangulated (intervals in 1-D) in parameter space scaled to the
+    unit box, and the next sample goes to the centroid of the simplex with the largest score
+    size * (FOM variation over its corners + best_weight * closeness of its lowest corner to the best FOM), both
+    relative to the FOM spread of all samples, closeness decaying exponentially over a tenth of that spread.
+    :param func: function of 1 to 3 parameters returning the FOM, lower is better, as for parameter_scan.
+    :param parx: (start, stop, num) of the first parameter, as for np.linspace. num only sets the output grid.
+    :param pary: same for the second parameter, or None.
+    :param parz: same for the third parameter, or None.
+    :param budget: largest number of func calls, including the initial grid.
+    :param initial: points per parameter of the initial grid.
+    :param best_weight: weight of refining towards the best FOM against refining where the FOM varies.
+    :param checkpoint: path of a checkpoint file or a Checkpoint, see parameter_scan. The samples only depend on the
+    values before them, so a resumed scan retraces the same points.
+    :return: dict with points ((N, d) samples), values ((N, ) FOM), fom (linear interpolation on the output grid),
+    grids (meshgrids of the output grid, ordered as the returns of parameter_scan) and best ((point, FOM)).
+    """
+    if checkpoint is not None:
+        with open_checkpoint(checkpoint) as store:
+            return adaptive_parameter_scan(_checkpointed(func, store), parx, pary, parz, budget, initial, best_weight)
+    ranges = [p for p in (parx, pary, parz) if p is not None]
+    if len(ranges) == 0 or parx is None or (parz is not None and pary is None):
+        raise ValueError("Adaptive parameter scan: invalid combination of parameters received")
+    dimension = len(ranges)
+    if initial < 2 or initial ** dimension > budget:
+        raise ValueError("Adaptive parameter scan: the initial grid needs at least 2 points per parameter and has to "
+                         "fit in the budget.")
+    low = np.array([p[0] for p in ranges], dtype=float)
+    span = np.array([p[1] - p[0] for p in ranges], dtype=float)
+
+    unit = [np.asarray(point, dtype=float) for point in product(np.linspace(0, 1, initial), repeat=dimension)]
+    values = [func(*(low + span * point)) for point in unit]
+    while len(unit) < budget:
+        points = np.asarray(unit)
+        fom = np.asarray(values, dtype=float)
+        if dimension == 1:
+            order = np.argsort(points[:, 0])
+            simplices = np.stack([order[:-1], order[1:]], axis=1)
+            sizes = np.diff(points[order, 0])
+        else:
+            simplices = Delaunay(points).simplices
+            sizes = _simplex_sizes(points, simplices)
+        spread = np.ptp(fom) if np.ptp(fom) > 0 else 1.0
+        corner_values = fom[simplices]
+        variation = np.ptp(corner_values, axis=1) / spread
+        closeness = np.exp(-(np.min(corner_values, axis=1) - np.min(fom)) / (0.1 * spread))
+        score = sizes * (variation + best_weight * closeness)
+        target = np.argmax(score)
+        if sizes[target] < 1e-9:
+            break
+        centroid = np.mean(points[simplices[target]], axis=0)
+        unit.append(centroid)
+        values.append(func(*(low + span * centroid)))
+
+    points = low + span * np.asarray(unit)
+    values = np.asarray(values, dtype=float)
+    axes = [np.linspace(*p) for p in ranges]
+    if dimension == 1:
+        grids = (axes[0], )
+        order = np.argsort(points[:, 0])
+        fom = np.interp(axes[0], points[order, 0], values[order])
+    else:
+        if dimension == 2:
+            grids = tuple(np.meshgrid(axes[0], axes[1]))
+        else:
+            y_grid, z_grid, x_grid = np.meshgrid(axes[1], axes[2], axes[0])
+            grids = (x_grid, y_grid, z_grid)
+        fom = griddata(points, values, tuple(grids), method='linear')
+    best = int(np.argmin(values))
+    return {'points': points,
+            'values': values,
+            'fom': fom,
+            'grids': grids,
+            'best': (points[best], values[best])}
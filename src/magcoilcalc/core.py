@@ -1,17 +1,30 @@
 from magcoilcalc._mpl_wrap import *
 import abc
+import copy
+import hashlib
+import pickle
 import numpy as np
-import magcoilcalc._off_axis_loop as loop_calculator
 from scipy.interpolate import RegularGridInterpolator
+import magcoilcalc._off_axis_loop as loop_calculator
 from magcoilcalc.calculations import find_gradient
 from itertools import product
 from magcoilcalc._signals import logger
-from matplotlib.pyplot import Circle, Polygon, Line2D
+from magcoilcalc._settings import VEC_BLOCK_SIZE
+from magcoilcalc._memo import enable_kernel_memo, disable_kernel_memo, kernel_memo_info, get_kernel_memo
+from magcoilcalc._checkpoint import Checkpoint, open_checkpoint
+from matplotlib.pyplot import Polygon, Line2D
+from matplotlib.collections import EllipseCollection
 import magcoilcalc._current_sheet as sheet_calculator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 try:
     import multiprocessing
 except ImportError:
     multiprocessing = None
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
 
 
 class SourceBaseClass(object):
@@ -28,6 +41,187 @@ class SourceBaseClass(object):
         return
 
 
+def _loops_b_field_vec(loops, x_mesh, y_mesh):
+    """
+    Field of a loop table on an array of points, summed over the loops in blocks to bound memory use.
+    :param loops: (L, 3) array of [x, r, current], x and r in mm, current in amps.
+    :param x_mesh: x coordinates in mm, array of any shape.
+    :param y_mesh: y coordinates in mm, same shape as x_mesh.
+    :return: x and y fields in Tesla, shaped like x_mesh.
+    """
+    x_mesh = np.asarray(x_mesh, dtype=float)
+    y_mesh = np.asarray(y_mesh, dtype=float)
+    bx_mesh = np.zeros(x_mesh.shape)
+    by_mesh = np.zeros(x_mesh.shape)
+    block = max(1, VEC_BLOCK_SIZE // max(x_mesh.size, 1))
+    for start in range(0, len(loops), block):
+        chunk = loops[start: start + block]
+        # field_radial masks r == 0 elementwise, so every argument has to be broadcast to full size.
+        current, a, x, r = np.broadcast_arrays(chunk[:, 2], chunk[:, 1] / 1000,
+                                               (x_mesh[..., None] - chunk[:, 0]) / 1000, y_mesh[..., None] / 1000)
+        bx_mesh += np.sum(loop_calculator.field_axial(current, a, x, r), axis=-1)
+        by_mesh += np.sum(loop_calculator.field_radial(current, a, x, r), axis=-1)
+    return bx_mesh, by_mesh
+
+
+def _uniform_step(coordinates, rtol=1e-9):
+    """
+    :return: the step of evenly spaced coordinates, None if they are not evenly spaced.
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    if coordinates.size < 2:
+        return None
+    steps = np.diff(coordinates)
+    if steps[0] == 0 or not np.allclose(steps, steps[0], rtol=rtol, atol=0):
+        return None
+    return steps[0]
+
+
+def _unit_loop_responses(radii, x_offsets, y):
+    """
+    Unit-current fields of loops standing at x = 0, each on its own grid, in blocks to bound memory use.
+    :param radii: (m, ) loop radii in mm.
+    :param x_offsets: (m, w) x coordinates in mm of the grid of each loop.
+    :param y: (ny, ) y coordinates in mm shared by all grids.
+    :return: x and y fields in Tesla, (m, ny, w) arrays.
+    """
+    m, w = x_offsets.shape
+    bx = np.empty((m, y.size, w))
+    by = np.empty((m, y.size, w))
+    block = max(1, VEC_BLOCK_SIZE // max(y.size * w, 1))
+    for start in range(0, m, block):
+        chunk = slice(start, start + block)
+        current, a, x, r = np.broadcast_arrays(1.0, radii[chunk, None, None] / 1000,
+                                               x_offsets[chunk, None, :] / 1000, y[None, :, None] / 1000)
+        bx[chunk] = loop_calculator.field_axial(current, a, x, r)
+        by[chunk] = loop_calculator.field_radial(current, a, x, r)
+    return bx, by
+
+
+def _memo_loops_b_field(memo, loops, x, y):
+    """
+    Field of a loop table on the grid meshgrid(x, y) from unit-current loop responses kept in memo. With evenly
+    spaced x, loops standing at x[0] + (k + f) * dx for whole k within the grid share the pitched response of their
+    radius a and fraction f, stored once over twice the grid width and sliced at every k. A pitched response costs
+    as much as two loops evaluated directly, so it is computed and stored at once for groups of two or more loops,
+    and for a single loop once it comes back at another k. Loops that come back at the same place get a response of
+    their own, which costs no more than evaluating them. Loops met for the first time are evaluated directly, so
+    geometries that never come back cost about as much as without the memo. Missing responses are computed in
+    vectorized passes, and responses used by this run are not evicted for each other.
+    :param memo: _KernelMemo.
+    :param loops: (L, 3) array of [x, r, current], x and r in mm, current in amps.
+    :param x: (nx, ) x coordinates in mm.
+    :param y: (ny, ) y coordinates in mm.
+    :return: x and y fields in Tesla, (ny, nx) arrays.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    loops = np.asarray(loops, dtype=float).reshape(-1, 3)
+    nx = x.size
+    mesh_key = hashlib.sha1(x.tobytes() + b'|' + y.tobytes()).hexdigest()
+    x_field = np.zeros((y.size, nx))
+    y_field = np.zeros((y.size, nx))
+    memo.new_generation()
+    dx = _uniform_step(x)
+    shift = np.zeros(len(loops), dtype=int)
+    fraction = np.zeros(len(loops))
+    aligned = np.zeros(len(loops), dtype=bool)
+    if dx is not None:
+        grid_position = (loops[:, 0] - x[0]) / dx
+        shift = np.floor(grid_position).astype(int)
+        fraction = np.round(grid_position - shift, 12)
+        shift[fraction >= 1] += 1
+        fraction[fraction >= 1] = 0.0
+        aligned = (shift >= 0) & (shift < nx)
+    _, group_index, group_size = np.unique(np.column_stack([aligned, loops[:, 1], np.where(aligned, fraction, 0)]),
+                                           axis=0, return_inverse=True, return_counts=True)
+    group_index = group_index.reshape(-1)
+    grouped = aligned & (group_size[group_index] > 1)
+
+    def pitched_key(index):
+        return mesh_key, loops[index, 1], fraction[index]
+
+    def position_key(index):
+        return mesh_key, loops[index, 1], loops[index, 0], None
+
+    # members of every pitched response, by the index of their first loop, and responses to compute.
+    pitched = dict()
+    new_pitched = []
+    for g in np.unique(group_index[grouped]):
+        members = np.flatnonzero(group_index == g)
+        pitched[members[0]] = [memo.get(pitched_key(members[0])), members]
+        if pitched[members[0]][0] is None:
+            new_pitched.append(members[0])
+    new_positioned = []
+    direct = []
+    for index in np.flatnonzero(~grouped):
+        if aligned[index]:
+            response = memo.get(pitched_key(index), count_miss=False)
+            if response is not None:
+                pitched[index] = [response, [index]]
+                continue
+        response = memo.get(position_key(index))
+        if response is not None:
+            x_field += loops[index, 2] * response[0]
+            y_field += loops[index, 2] * response[1]
+            continue
+        if aligned[index]:
+            previous = memo.remember(pitched_key(index), shift[index])
+        else:
+            previous = memo.remember(position_key(index))
+        if previous is None:
+            direct.append(index)
+        elif aligned[index] and previous != shift[index]:
+            pitched[index] = [None, [index]]
+            new_pitched.append(index)
+        else:
+            new_positioned.append(index)
+
+    if new_pitched:
+        offsets = (np.arange(-(nx - 1), nx)[None, :] - fraction[new_pitched, None]) * dx
+        for index, response in zip(new_pitched, zip(*_unit_loop_responses(loops[new_pitched, 1], offsets, y))):
+            pitched[index][0] = response
+            memo.put(pitched_key(index), response, 2 * response[0].nbytes, keep_current=True)
+    for (rx, ry), members in pitched.values():
+        currents = np.bincount(shift[members], weights=loops[members, 2], minlength=nx)
+        for k in np.flatnonzero(currents):
+            window = slice(nx - 1 - k, 2 * nx - 1 - k)
+            x_field += currents[k] * rx[:, window]
+            y_field += currents[k] * ry[:, window]
+    if new_positioned:
+        offsets = x[None, :] - loops[new_positioned, 0, None]
+        for index, response in zip(new_positioned, zip(*_unit_loop_responses(loops[new_positioned, 1], offsets, y))):
+            memo.put(position_key(index), response, 2 * response[0].nbytes, keep_current=True)
+            x_field += loops[index, 2] * response[0]
+            y_field += loops[index, 2] * response[1]
+    if direct:
+        x_mesh, y_mesh = np.meshgrid(x, y)
+        bx, by = _loops_b_field_vec(loops[direct], x_mesh, y_mesh)
+        x_field += bx
+        y_field += by
+    return x_field, y_field
+
+
+def _draw_loop_markers(ax, centers, diameter):
+    """
+    Draws one red circle per loop cross section as a single collection, which stays fast for thousands of loops.
+    :param ax: matplotlib axes.
+    :param centers: (N, 2) array of (x, y) circle centers in mm.
+    :param diameter: circle diameter in mm.
+    :return: the EllipseCollection.
+    """
+    centers = np.asarray(centers)
+    size = np.full(len(centers), diameter)
+    style = dict(units='xy', offsets=centers, facecolors='none', edgecolors='r')
+    try:
+        markers = EllipseCollection(size, size, np.zeros(len(centers)), offset_transform=ax.transData, **style)
+    except (TypeError, AttributeError):
+        # matplotlib < 3.6
+        markers = EllipseCollection(size, size, np.zeros(len(centers)), transOffset=ax.transData, **style)
+    ax.add_collection(markers, autolim=False)
+    return markers
+
+
 class CurrentLoop(SourceBaseClass):
     def __init__(self, x_span: (list, float, int), radius: (list, float, int), nturns: int, current: float,
                  layers: int = 1, layer_thickness: float = 1.0, current_multiplier: float = 1.0):
@@ -48,6 +242,7 @@ class CurrentLoop(SourceBaseClass):
         self._layer_thickness = None
         self._current_multiplier = None
         self._current_loops = None
+        self._layer_index = None
         self._current_loops_up_to_date = False
         self.x_span = x_span
         self.radius = radius
@@ -180,6 +375,7 @@ class CurrentLoop(SourceBaseClass):
         turns_per_layer = self.nturns // self.layers
         extra_turn_layers = self.nturns % self.layers
         coil_layers = []
+        layer_index = []
         for i in range(0, self.layers):
             if i < extra_turn_layers:
                 turns = turns_per_layer + 1
@@ -189,15 +385,34 @@ class CurrentLoop(SourceBaseClass):
             y = np.linspace(self.start[1], self.end[1], turns) + i * self.layer_thickness
             this_layer = np.vstack([x, y, np.ones(turns) * self.current]).T
             coil_layers.append(this_layer)
+            layer_index.append(np.full(turns, i))
         current_loops = np.vstack(coil_layers)
         self._current_loops = current_loops
+        self._layer_index = np.concatenate(layer_index)
         self._current_loops_up_to_date = True
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the loop list is rebuilt on access, pickles of the same coil are the same whether it was used or not.
+        state['_current_loops'] = None
+        state['_layer_index'] = None
+        state['_current_loops_up_to_date'] = False
+        return state
+
     def get_loop_list(self):
         if not self._current_loops_up_to_date:
             self.recalculate_loop_list()
         return self._current_loops
 
+    def get_layer_index(self):
+        """
+        Winding layer of every loop, 0 for the innermost layer.
+        :return: (L, ) int array matching the rows of get_loop_list.
+        """
+        if not self._current_loops_up_to_date:
+            self.recalculate_loop_list()
+        return self._layer_index
+
     def b_field(self, xp, yp):
         """
         Calculate the field at [xp, yp]
@@ -222,16 +437,7 @@ class CurrentLoop(SourceBaseClass):
         :param y_mesh: (M, N) array, usually from np.meshgrid
         :return: ((M, N), (M, N)) arrays of x and y fields.
         """
-        loops = self.get_loop_list()
-        ones_xy = np.ones(x_mesh.shape)
-        ones_z = np.ones(loops.shape[0])
-        a = ones_xy[..., None] * loops[:, 1] / 1000
-        x = (x_mesh[..., None] * ones_z - ones_xy[..., None] * loops[:, 0]) / 1000
-        r = y_mesh[..., None] * ones_z / 1000
-        current = ones_xy[..., None] * loops[:, 2]
-        bx_mesh = np.sum(loop_calculator.field_axial(current, a, x, r), axis=2)
-        by_mesh = np.sum(loop_calculator.field_radial(current, a, x, r), axis=2)
-        return bx_mesh, by_mesh
+        return _loops_b_field_vec(self.get_loop_list(), x_mesh, y_mesh)
 
     def draw_source(self, ax):
         source = self
@@ -247,12 +453,7 @@ class CurrentLoop(SourceBaseClass):
                        color=[0.4, 0.4, 0.4, 0.25],
                        zorder=0)
         ax.add_artist(poly)
-        for loop in c1:
-            circle = Circle((loop[0], loop[1]), dia / 2, color='r', fill=None)
-            ax.add_artist(circle)
-        for loop in c2:
-            circle = Circle((loop[0], loop[1]), dia / 2, color='r',  fill=None)
-            ax.add_artist(circle)
+        _draw_loop_markers(ax, np.vstack([c1, c2])[:, :2], dia)
 
 
 class CurrentSheet(SourceBaseClass):
@@ -360,6 +561,531 @@ class CurrentSheet(SourceBaseClass):
         ax.add_artist(lower_line)
 
 
+class LoopArray(SourceBaseClass):
+    def __init__(self, x, radius, current):
+        """
+        Independent current loops stored as three contiguous columns instead of one object per loop.
+        Scalars are broadcast against arrays, so LoopArray(x, 100, 1.0) places unit-current loops of radius 100 at x.
+        :param x: x positions of the loops, in mm.
+        :param radius: radii of the loops, in mm.
+        :param current: current in each loop, in amps.
+        """
+        x, radius, current = np.broadcast_arrays(np.atleast_1d(np.asarray(x, dtype=float)),
+                                                 np.atleast_1d(np.asarray(radius, dtype=float)),
+                                                 np.atleast_1d(np.asarray(current, dtype=float)))
+        if x.ndim != 1:
+            raise ValueError("LoopArray: x, radius and current have to be scalars or 1-D arrays.")
+        self._columns = np.empty((3, x.shape[0]))
+        self._columns[0] = x
+        self._columns[1] = radius
+        self._columns[2] = current
+
+    @classmethod
+    def from_loop_list(cls, loops):
+        """
+        Builds a LoopArray from a loop list as returned by get_loop_list.
+        :param loops: (N, 3) array of [x, r, current].
+        :return: LoopArray.
+        """
+        loops = np.asarray(loops, dtype=float).reshape(-1, 3)
+        return cls(loops[:, 0], loops[:, 1], loops[:, 2])
+
+    @classmethod
+    def from_sources(cls, sources):
+        """
+        Merges the loops of every source into a single LoopArray.
+        :param sources: list of sources implementing get_loop_list.
+        :return: LoopArray.
+        """
+        return cls.from_loop_list(np.vstack([source.get_loop_list() for source in sources]))
+
+    def __copy__(self):
+        return LoopArray(self.x, self.radius, self.currents)
+
+    def __eq__(self, other):
+        if not type(other) == type(self):
+            return False
+        else:
+            return np.array_equal(self._columns, other._columns)
+
+    def __len__(self):
+        return self._columns.shape[1]
+
+    @property
+    def x(self):
+        """
+        x positions of the loops, writable view.
+        :return: (N, ) array in mm.
+        """
+        return self._columns[0]
+
+    @x.setter
+    def x(self, value):
+        self._columns[0] = value
+
+    @property
+    def radius(self):
+        """
+        Radii of the loops, writable view.
+        :return: (N, ) array in mm.
+        """
+        return self._columns[1]
+
+    @radius.setter
+    def radius(self, value):
+        self._columns[1] = value
+
+    @property
+    def currents(self):
+        """
+        Current in each loop, writable view.
+        :return: (N, ) array in amps.
+        """
+        return self._columns[2]
+
+    @currents.setter
+    def currents(self, value):
+        self._columns[2] = value
+
+    def update(self, index=slice(None), x=None, radius=None, current=None):
+        """
+        Updates positions and/or currents of the selected loops in place.
+        :param index: anything that indexes a 1-D numpy array, defaults to all loops.
+        :param x: new x positions in mm.
+        :param radius: new radii in mm.
+        :param current: new currents in amps.
+        :return: None
+        """
+        for row, value in enumerate((x, radius, current)):
+            if value is not None:
+                self._columns[row, index] = value
+
+    def get_loop_list(self):
+        """
+        The loops as a (N, 3) view of [x, r, current] - no copy is made.
+        :return: (N, 3) array.
+        """
+        return self._columns.T
+
+    def b_field(self, xp, yp):
+        """
+        Calculate the field at [xp, yp]
+        :param xp: x coords, in mm.
+        :param yp: y coords, in mm.
+        :return: Field in Tesla.
+        """
+        bx, br = _loops_b_field_vec(self.get_loop_list(), xp, yp)
+        return bx[()], br[()]
+
+    def b_field_vec(self, x_mesh, y_mesh):
+        """
+        Calculates field on a (M, N) 2-D meshgrid in a vectorized manner.
+        :param x_mesh: (M, N) array, usually from np.meshgrid
+        :param y_mesh: (M, N) array, usually from np.meshgrid
+        :return: ((M, N), (M, N)) arrays of x and y fields.
+        """
+        return _loops_b_field_vec(self.get_loop_list(), x_mesh, y_mesh)
+
+    def draw_source(self, ax):
+        _draw_loop_markers(ax, np.concatenate([np.vstack([self.x, self.radius]).T,
+                                               np.vstack([self.x, -self.radius]).T]), 1.0)
+
+
+def _gauss_legendre_order(distance, half_width, tolerance, max_order):
+    """
+    Number of Gauss-Legendre nodes needed to integrate a loop kernel over [-half_width, half_width] to tolerance,
+    from the Bernstein ellipse bound rho ** (-2 n) with the kernel singularity at the given distance.
+    :param distance: distance from the evaluation points to the integration interval, array.
+    :param half_width: half width of the interval.
+    :param tolerance: relative error target.
+    :param max_order: cap on the number of nodes.
+    :return: int array shaped like distance.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.asarray(distance, dtype=float) / half_width
+        rho = t + np.sqrt(t ** 2 + 1)
+        order = np.ceil(np.log(1 / tolerance) / (2 * np.log(rho)))
+    order = np.nan_to_num(order, nan=max_order, posinf=max_order)
+    return np.clip(order, 1, max_order).astype(int)
+
+
+class RectangularCoil(SourceBaseClass):
+    def __init__(self, x_span: (list, float, int), radius: list, nturns: int, current: float,
+                 tolerance: float = 1e-6, max_order: int = 16):
+        """
+        A winding pack of rectangular cross section with uniform current density, integrated with Gauss-Legendre
+        quadrature instead of turn by turn. The quadrature order is picked per evaluation point from its distance to
+        the winding.
+        :param x_span: [x1, x2] axial extent of the winding in mm.
+        :param radius: [r_inner, r_outer] radial extent of the winding in mm.
+        :param nturns: number of turns.
+        :param current: current in amps.
+        :param tolerance: relative quadrature error target.
+        :param max_order: maximum number of quadrature nodes along each axis.
+        """
+        self._x_span = None
+        self._radius = None
+        self._nturns = None
+        self._current = None
+        self._loop_lists = dict()
+        self.x_span = x_span
+        self.radius = radius
+        self.nturns = nturns
+        self.current = current
+        self.tolerance = tolerance
+        self.max_order = max_order
+
+    def __copy__(self):
+        return RectangularCoil(self.x_span, self.radius, self.nturns, self.current, self.tolerance, self.max_order)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # quadrature nodes are rebuilt on access, pickles of the same coil are the same whether it was used or not.
+        state['_loop_lists'] = dict()
+        return state
+
+    def __eq__(self, other):
+        if not type(other) == type(self):
+            return False
+        else:
+            return all([
+                all(self.x_span == other.x_span),
+                all(self.radius == other.radius),
+                self.nturns == other.nturns,
+                self.current == other.current
+                ])
+
+    @property
+    def x_span(self):
+        return np.asarray(self._x_span)
+
+    @x_span.setter
+    def x_span(self, value):
+        try:
+            _ = value[1]
+            self._x_span = value
+        except (TypeError, IndexError, ValueError):
+            self._x_span = [value, value]
+        self._loop_lists = dict()
+
+    @property
+    def radius(self):
+        return np.asarray(self._radius)
+
+    @radius.setter
+    def radius(self, value):
+        try:
+            _ = value[1]
+            self._radius = value
+        except (TypeError, IndexError, ValueError):
+            self._radius = [value, value]
+        self._loop_lists = dict()
+
+    @property
+    def start(self):
+        """
+        (x, y) coordinates of the inner corner at x_span[0].
+        :return: (x, y) in mm.
+        """
+        return np.asarray([self._x_span[0], self._radius[0]])
+
+    @property
+    def end(self):
+        """
+        (x, y) coordinates of the inner corner at x_span[1].
+        :return: (x, y) in mm.
+        """
+        return np.asarray([self._x_span[1], self._radius[0]])
+
+    @property
+    def nturns(self):
+        return self._nturns
+
+    @nturns.setter
+    def nturns(self, value):
+        if value >= 1:
+            self._nturns = int(value)
+            self._loop_lists = dict()
+        else:
+            raise ValueError("Magnet: cannot define a source with less than 1 turn.")
+
+    @property
+    def current(self):
+        """
+        Current in the coil, amps.
+        :return: float.
+        """
+        return self._current
+
+    @current.setter
+    def current(self, value):
+        self._current = value
+        self._loop_lists = dict()
+
+    def get_loop_list(self, order=None):
+        """
+        Quadrature nodes of the winding as equivalent loops.
+        :param order: (x nodes, r nodes), or a single int for both. Defaults to max_order on both axes.
+        :return: [x, r, current], x and r in mm, current in amps.
+        """
+        if order is None:
+            order = self.max_order
+        try:
+            nx, nr = order
+        except TypeError:
+            nx, nr = order, order
+        key = (int(nx), int(nr))
+        if key not in self._loop_lists:
+            ux, wx = np.polynomial.legendre.leggauss(key[0])
+            ur, wr = np.polynomial.legendre.leggauss(key[1])
+            x0, x1 = self.x_span
+            r0, r1 = self.radius
+            x = (x0 + x1) / 2 + ux * (x1 - x0) / 2
+            r = (r0 + r1) / 2 + ur * (r1 - r0) / 2
+            xg, rg = np.meshgrid(x, r)
+            # weights of each axis sum up to 2
+            current = np.outer(wr, wx) / 4 * self.nturns * self.current
+            self._loop_lists[key] = np.vstack([xg.ravel(), rg.ravel(), current.ravel()]).T
+        return self._loop_lists[key]
+
+    def _orders(self, x_mesh, y_mesh):
+        x0, x1 = np.sort(self.x_span)
+        r0, r1 = np.sort(self.radius)
+        dx = np.maximum(np.maximum(x0 - x_mesh, x_mesh - x1), 0)
+        dr = np.maximum(np.maximum(r0 - np.abs(y_mesh), np.abs(y_mesh) - r1), 0)
+        distance = np.sqrt(dx ** 2 + dr ** 2)
+        nx = _gauss_legendre_order(distance, (x1 - x0) / 2, self.tolerance, self.max_order)
+        nr = _gauss_legendre_order(distance, (r1 - r0) / 2, self.tolerance, self.max_order)
+        return nx, nr
+
+    def b_field(self, xp, yp):
+        """
+        Calculate the field at [xp, yp]
+        :param xp: x coords, in mm.
+        :param yp: y coords, in mm.
+        :return: Field in Tesla.
+        """
+        bx, br = self.b_field_vec(np.asarray(xp, dtype=float), np.asarray(yp, dtype=float))
+        return bx[()], br[()]
+
+    def b_field_vec(self, x_mesh, y_mesh):
+        """
+        Calculates field on a (M, N) 2-D meshgrid, grouping the points by the quadrature order they need.
+        :param x_mesh: (M, N) array, usually from np.meshgrid
+        :param y_mesh: (M, N) array, usually from np.meshgrid
+        :return: ((M, N), (M, N)) arrays of x and y fields.
+        """
+        x_mesh = np.asarray(x_mesh, dtype=float)
+        y_mesh = np.asarray(y_mesh, dtype=float)
+        bx_mesh = np.zeros(x_mesh.shape)
+        by_mesh = np.zeros(x_mesh.shape)
+        nx, nr = self._orders(x_mesh, y_mesh)
+        orders, groups = np.unique(np.stack([nx.ravel(), nr.ravel()]), axis=1, return_inverse=True)
+        groups = groups.ravel()
+        for group, order in enumerate(orders.T):
+            mask = (groups == group).reshape(x_mesh.shape)
+            bx, by = _loops_b_field_vec(self.get_loop_list(order), x_mesh[mask], y_mesh[mask])
+            bx_mesh[mask] = bx
+            by_mesh[mask] = by
+        return bx_mesh, by_mesh
+
+    def draw_source(self, ax):
+        (x0, x1), (r0, r1) = self.x_span, self.radius
+        for sign in (1, -1):
+            area = Polygon(((x0, sign * r0), (x1, sign * r0), (x1, sign * r1), (x0, sign * r1)),
+                           color=[0.8, 0.2, 0.2, 0.4], zorder=0)
+            ax.add_artist(area)
+
+
+def lump_loop_list(loops, cell_size):
+    """
+    Merges the loops falling in the same cell_size x cell_size bin of the (x, r) plane into one equivalent loop. The
+    equivalent loop carries the total current at the current-weighted mean x, and its radius preserves the dipole
+    moment of the merged loops. Loops of opposite current sign are binned apart, so that cancelling currents do not
+    leave a loop without current in place of their moment.
+    :param loops: (N, 3) array of [x, r, current].
+    :param cell_size: bin size in mm. Loops are returned unchanged if not positive.
+    :return: (M, 3) array of [x, r, current], M <= N.
+    """
+    loops = np.asarray(loops, dtype=float)
+    if cell_size <= 0 or len(loops) < 2:
+        return loops
+    bins = np.floor((loops[:, :2] - loops[:, :2].min(axis=0)) / cell_size).astype(np.int64)
+    bins = np.column_stack([bins, np.sign(loops[:, 2]).astype(np.int64)])
+    _, groups = np.unique(bins, axis=0, return_inverse=True)
+    groups = groups.ravel()
+    weights = np.abs(loops[:, 2])
+    weight_sum = np.bincount(groups, weights)
+    keep = weight_sum > 0
+    weight_sum = weight_sum[keep]
+    x = np.bincount(groups, weights * loops[:, 0])[keep] / weight_sum
+    r = np.sqrt(np.bincount(groups, weights * loops[:, 1] ** 2)[keep] / weight_sum)
+    current = np.bincount(groups, loops[:, 2])[keep]
+    return np.vstack([x, r, current]).T
+
+
+def lump_sources(sources, mesh, tolerance):
+    """
+    Replaces CurrentLoop and LoopArray sources by LoopArrays of fewer, equivalent loops. The bin size for each
+    source starts from the distance between its loops and the mesh bounds, and is then adjusted until the field error
+    measured at check points on the mesh bounds closest to the windings stays below the tolerance.
+    :param sources: list of sources, others than CurrentLoop and LoopArray are passed through.
+    :param mesh: Mesh the field will be evaluated on.
+    :param tolerance: allowed field error, relative to the largest field of the lumped sources at the check points.
+    :return: (list of sources, achieved relative error at the check points)
+    """
+    x_lo, x_hi = np.sort(mesh.x_range)
+    y_lo, y_hi = np.sort(mesh.y_range)
+    r_lo = 0 if y_lo <= 0 <= y_hi else min(abs(y_lo), abs(y_hi))
+    r_hi = max(abs(y_lo), abs(y_hi))
+    lumpable = [i for i, source in enumerate(sources) if isinstance(source, (CurrentLoop, LoopArray))]
+    if len(lumpable) == 0:
+        return list(sources), 0.0
+    loop_lists = {i: np.asarray(sources[i].get_loop_list()) for i in lumpable}
+
+    check_x = [x_lo, x_hi, x_lo, x_hi, (x_lo + x_hi) / 2]
+    check_r = [r_lo, r_lo, r_hi, r_hi, (r_lo + r_hi) / 2]
+    for loops in loop_lists.values():
+        for corner_x, corner_r in product(loops[:, 0][[0, -1]], loops[:, 1][[0, -1]]):
+            check_x.append(np.clip(corner_x, x_lo, x_hi))
+            check_r.append(np.clip(corner_r, r_lo, r_hi))
+        check_x.append(np.clip(np.mean(loops[:, 0]), x_lo, x_hi))
+        check_r.append(np.clip(np.mean(loops[:, 1]), r_lo, r_hi))
+    check_x = np.asarray(check_x)
+    check_r = np.asarray(check_r)
+
+    exact = {i: np.asarray(_loops_b_field_vec(loops, check_x, check_r)) for i, loops in loop_lists.items()}
+    exact_total = np.sum(list(exact.values()), axis=0)
+    scale = np.max(np.hypot(*exact_total))
+    source_tolerance = tolerance / len(lumpable)
+
+    def measure(i, cell_size):
+        lumped = lump_loop_list(loop_lists[i], cell_size)
+        return lumped, np.max(np.hypot(*(np.asarray(_loops_b_field_vec(lumped, check_x, check_r)) - exact[i]))) / scale
+
+    output = list(sources)
+    lumped_total = exact_total.copy()
+    for i in lumpable:
+        loops = loop_lists[i]
+        dx = max(loops[:, 0].min() - x_hi, x_lo - loops[:, 0].max(), 0)
+        dr = max(loops[:, 1].min() - r_hi, r_lo - loops[:, 1].max(), 0)
+        cell_size = np.hypot(dx, dr) * np.sqrt(12 * source_tolerance)
+        best = loops
+        if cell_size > 0:
+            lumped, error = measure(i, cell_size)
+            # grow the bins while the error allows, otherwise shrink them until it does.
+            factor = 2 if error <= source_tolerance else 0.5
+            for _ in range(8):
+                if error <= source_tolerance:
+                    best = lumped
+                    if factor < 1:
+                        break
+                elif factor > 1:
+                    break
+                cell_size *= factor
+                lumped, error = measure(i, cell_size)
+        output[i] = LoopArray.from_loop_list(best)
+        lumped_total += np.asarray(_loops_b_field_vec(best, check_x, check_r)) - exact[i]
+    return output, np.max(np.hypot(*(lumped_total - exact_total))) / scale
+
+
+def _sources_b_field_vec(sources, x_mesh, y_mesh):
+    """
+    Total field of a list of sources on an array of points. Sources without b_field_vec are evaluated point by point.
+    :param sources: list of sources.
+    :param x_mesh: x coordinates in mm, array of any shape.
+    :param y_mesh: y coordinates in mm, same shape as x_mesh.
+    :return: x and y fields in Tesla, shaped like x_mesh.
+    """
+    x_field = np.zeros(np.shape(x_mesh))
+    y_field = np.zeros(np.shape(x_mesh))
+    for source in sources:
+        try:
+            bxs, bys = source.b_field_vec(x_mesh, y_mesh)
+            x_field += bxs
+            y_field += bys
+        except AttributeError:
+            for index in np.ndindex(*x_field.shape):
+                bx, by = source.b_field(x_mesh[index], y_mesh[index])
+                x_field[index] += bx
+                y_field[index] += by
+    return x_field, y_field
+
+
+def _circuit_current(source):
+    """
+    Current a source is driven with: its scalar current, or 1 A for sources that only know per-loop currents.
+    :param source: source.
+    :return: float, in amps.
+    """
+    current = getattr(source, 'current', None)
+    if current is None or np.ndim(current) != 0:
+        return 1.0
+    return current
+
+
+def _circuit_loops(sources, wire_radius=None):
+    """
+    Stacks the loops of every source, with the number of turns each loop stands for in its circuit.
+    :param sources: list of sources implementing get_loop_list.
+    :param wire_radius: wire radius in mm, or None for the per-source defaults of inductance_matrix.
+    :return: (loops (L, 3), circuit index (L, ), turns (L, ), wire radius in mm (L, ), circuit currents (n, ))
+    """
+    loop_lists, circuits, turns, radii, currents = [], [], [], [], []
+    for index, source in enumerate(sources):
+        try:
+            loops = np.asarray(source.get_loop_list(), dtype=float)
+        except AttributeError:
+            raise TypeError("Inductance: all sources have to provide loop lists, got %s." % type(source).__name__)
+        current = _circuit_current(source)
+        if current == 0:
+            raise ValueError("Inductance: cannot infer the turns of a source carrying no current.")
+        if wire_radius is not None:
+            radius = np.full(len(loops), float(wire_radius))
+        elif isinstance(source, CurrentLoop):
+            radius = np.full(len(loops), source.layer_thickness / 2)
+        elif isinstance(source, RectangularCoil):
+            area = np.abs(np.diff(source.x_span) * np.diff(source.radius))[0]
+            radius = np.sqrt(area * np.abs(loops[:, 2]) / np.sum(np.abs(loops[:, 2])) / np.pi)
+        else:
+            raise ValueError("Inductance: wire_radius required for %s sources." % type(source).__name__)
+        loop_lists.append(loops)
+        circuits.append(np.full(len(loops), index))
+        turns.append(loops[:, 2] / current)
+        radii.append(radius)
+        currents.append(current)
+    return (np.vstack(loop_lists), np.concatenate(circuits), np.concatenate(turns), np.concatenate(radii),
+            np.asarray(currents, dtype=float))
+
+
+def _mutual_inductance_block(loops_a, radius_a, loops_b, radius_b):
+    """
+    Loop-to-loop mutual inductances between two loop tables. Loops closer than their wire radius count as the same
+    conductor and get the self inductance instead.
+    :return: (La, Lb) array in Henry.
+    """
+    a = loops_a[:, 1, None] / 1000
+    b = loops_b[None, :, 1] / 1000
+    d = (loops_a[:, 0, None] - loops_b[None, :, 0]) / 1000
+    wire = (radius_a[:, None] + radius_b[None, :]) / 2000
+    same = np.hypot(a - b, d) < wire
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mutual = loop_calculator.mutual_inductance(a, b, d)
+    return np.where(same, loop_calculator.self_inductance(np.sqrt(a * b), wire), mutual)
+
+
+def _masked_b_field_vec(sources, x_mesh, y_mesh, mask=None):
+    """
+    Like _sources_b_field_vec, but only evaluates the points where mask is True and leaves the others as NaN.
+    """
+    if mask is None:
+        return _sources_b_field_vec(sources, x_mesh, y_mesh)
+    x_field = np.full(x_mesh.shape, np.nan)
+    y_field = np.full(x_mesh.shape, np.nan)
+    x_field[mask], y_field[mask] = _sources_b_field_vec(sources, x_mesh[mask], y_mesh[mask])
+    return x_field, y_field
+
+
 class SourceCollection(SourceBaseClass):
     def __init__(self, sources):
         self._sources = []
@@ -387,17 +1113,102 @@ class SourceCollection(SourceBaseClass):
             by += byp
         return bx, by
 
+    def b_field_vec(self, x_mesh, y_mesh):
+        """
+        Calculates field on a (M, N) 2-D meshgrid, vectorized for every source that supports it.
+        :param x_mesh: (M, N) array, usually from np.meshgrid
+        :param y_mesh: (M, N) array, usually from np.meshgrid
+        :return: ((M, N), (M, N)) arrays of x and y fields.
+        """
+        return _sources_b_field_vec(self._sources, x_mesh, y_mesh)
+
+    def inductance_matrix(self, wire_radius=None, block_size=1024):
+        """
+        Self and mutual inductances of the sources, each source being one circuit driven by its own current.
+        Loop-to-loop mutual inductances are computed block by block over one triangle of the symmetric matrix and
+        summed up with the number of turns each loop stands for.
+        :param wire_radius: wire radius in mm for the self inductance of each turn. Defaults to half the layer
+        thickness for CurrentLoops and to the cross section of each quadrature node for RectangularCoils.
+        :param block_size: number of loops per block.
+        :return: (n, n) array in Henry.
+        """
+        loops, circuits, turns, radii, _ = _circuit_loops(self._sources, wire_radius)
+        weights = np.zeros((len(loops), len(self._sources)))
+        weights[np.arange(len(loops)), circuits] = turns
+        matrix = np.zeros((len(self._sources), len(self._sources)))
+        for i in range(0, len(loops), block_size):
+            rows = slice(i, i + block_size)
+            for j in range(i, len(loops), block_size):
+                columns = slice(j, j + block_size)
+                block = _mutual_inductance_block(loops[rows], radii[rows], loops[columns], radii[columns])
+                contribution = weights[rows].T @ block @ weights[columns]
+                matrix += contribution
+                if j != i:
+                    matrix += contribution.T
+        return matrix
+
+    def axial_forces(self, per_turn=False, block_size=None):
+        """
+        Axial force on each source from the radial field of all the other sources, F = -2 pi r I Br summed over the
+        loops of the source. Forces within a source cancel out and are left out.
+        :param per_turn: also return the force on every loop of every source.
+        :param block_size: number of target loops evaluated at once, bounded by VEC_BLOCK_SIZE by default.
+        :return: (n, ) array of net forces in Newtons, positive along +x. With per_turn, also a list of per-loop
+        force arrays, one per source.
+        """
+        try:
+            loop_lists = [np.asarray(source.get_loop_list(), dtype=float) for source in self._sources]
+        except AttributeError:
+            raise TypeError("Force calculation: all sources have to provide loop lists.")
+        loops = np.vstack(loop_lists)
+        circuits = np.concatenate([np.full(len(l), i) for i, l in enumerate(loop_lists)])
+        if block_size is None:
+            block_size = max(1, VEC_BLOCK_SIZE // len(loops))
+        br = np.zeros(len(loops))
+        for start in range(0, len(loops), block_size):
+            targets = slice(start, start + block_size)
+            current, a, x, r = np.broadcast_arrays(loops[:, 2], loops[:, 1] / 1000,
+                                                   (loops[targets, 0, None] - loops[:, 0]) / 1000,
+                                                   loops[targets, 1, None] / 1000)
+            contribution = loop_calculator.field_radial(current, a, x, r)
+            contribution[circuits[targets, None] == circuits] = 0
+            br[targets] = np.sum(contribution, axis=1)
+        force = -2 * np.pi * loops[:, 1] / 1000 * loops[:, 2] * br
+        net = np.bincount(circuits, force, minlength=len(self._sources))
+        if per_turn:
+            return net, np.split(force, np.cumsum([len(l) for l in loop_lists])[:-1])
+        return net
+
+    def stored_energy(self, wire_radius=None):
+        """
+        Magnetic energy stored in the sources at their currents.
+        :param wire_radius: see inductance_matrix.
+        :return: energy in Joules.
+        """
+        currents = np.asarray([_circuit_current(source) for source in self._sources], dtype=float)
+        return 0.5 * currents @ self.inductance_matrix(wire_radius) @ currents
+
 
 class Mesh(object):
-    def __init__(self, x_range=None, y_range=None, x_steps=None, y_steps=None):
+    def __init__(self, x_range=None, y_range=None, x_steps=None, y_steps=None, mask=None):
+        """
+        :param x_range: (start, end) of x in mm.
+        :param y_range: (start, end) of y in mm.
+        :param x_steps: number of nodes along x.
+        :param y_steps: number of nodes along y.
+        :param mask: optional (y_steps, x_steps) boolean array, or function of (x_mesh, y_mesh) returning one. Only
+        nodes where it is True are evaluated, the others are left as NaN.
+        """
         self._x_range = None
         self._y_range = None
         self._x_steps = None
         self._y_steps = None
+        self._mask = None
         self.x_range = x_range
         self.y_range = y_range
         self.x_steps = x_steps
         self.y_steps = y_steps
+        self.mask = mask
 
     def get_matrix(self):
         """
@@ -408,6 +1219,48 @@ class Mesh(object):
         y = np.linspace(self.y_range[0], self.y_range[1], self.y_steps)
         return np.meshgrid(x, y, indexing='xy')
 
+    @property
+    def mask(self):
+        """
+        Nodes to be evaluated.
+        :return: (m, n) boolean array, or None if every node is evaluated.
+        """
+        if callable(self._mask):
+            return np.asarray(self._mask(*self.get_matrix()), dtype=bool)
+        return self._mask
+
+    @mask.setter
+    def mask(self, value):
+        if value is None or callable(value):
+            self._mask = value
+        else:
+            value = np.asarray(value, dtype=bool)
+            if value.shape != self.get_matrix()[0].shape:
+                raise ValueError("Mesh: mask has to have the shape of the mesh (y steps, x steps).")
+            self._mask = value
+
+    def exclude_sources(self, sources, margin=0.0):
+        """
+        Masks out the nodes lying inside the loops of the given sources, e.g. inside the windings.
+        :param sources: list of sources providing loop lists, others are ignored.
+        :param margin: extra margin around the windings in mm.
+        :return: None
+        """
+        x_mesh, y_mesh = self.get_matrix()
+        mask = np.ones(x_mesh.shape, dtype=bool) if self.mask is None else self.mask.copy()
+        for source in sources:
+            try:
+                loops = np.asarray(source.get_loop_list())
+            except AttributeError:
+                continue
+            mask &= ~((x_mesh >= loops[:, 0].min() - margin) & (x_mesh <= loops[:, 0].max() + margin) &
+                      (np.abs(y_mesh) >= loops[:, 1].min() - margin) & (np.abs(y_mesh) <= loops[:, 1].max() + margin))
+        self._mask = mask
+
+    @property
+    def is_uniform(self):
+        return True
+
     @property
     def x_mesh(self):
         return self.get_matrix()[0]
@@ -489,6 +1342,289 @@ class Mesh(object):
         return self.pixel_bounds[1]
 
 
+class RectilinearMesh(Mesh):
+    def __init__(self, x_coordinates, y_coordinates, mask=None):
+        """
+        Mesh with arbitrary, increasing node coordinates along each axis, for example clustered around the coils or
+        the cell.
+        :param x_coordinates: (n, ) node x coordinates in mm.
+        :param y_coordinates: (m, ) node y coordinates in mm.
+        :param mask: see Mesh.
+        """
+        self._x_coordinates = np.asarray(x_coordinates, dtype=float)
+        self._y_coordinates = np.asarray(y_coordinates, dtype=float)
+        for coordinates in (self._x_coordinates, self._y_coordinates):
+            if coordinates.ndim != 1 or len(coordinates) < 2 or np.any(np.diff(coordinates) <= 0):
+                raise ValueError("Mesh: at least 2 strictly increasing coordinates expected on each axis.")
+        self._mask = None
+        self.mask = mask
+
+    @classmethod
+    def from_mesh(cls, mesh, mask=None):
+        return cls(mesh.x_linspace, mesh.y_linspace, mask)
+
+    @property
+    def x_range(self):
+        return self._x_coordinates[[0, -1]]
+
+    @property
+    def y_range(self):
+        return self._y_coordinates[[0, -1]]
+
+    @property
+    def x_steps(self):
+        return len(self._x_coordinates)
+
+    @property
+    def y_steps(self):
+        return len(self._y_coordinates)
+
+    @property
+    def x_step(self):
+        if not self.is_uniform:
+            raise ValueError("Mesh: no single x step on a non-uniform mesh, use x_linspace.")
+        return super().x_step
+
+    @property
+    def y_step(self):
+        if not self.is_uniform:
+            raise ValueError("Mesh: no single y step on a non-uniform mesh, use y_linspace.")
+        return super().y_step
+
+    @property
+    def is_uniform(self):
+        return all(np.allclose(np.diff(c), np.diff(c)[0], rtol=1e-9, atol=0)
+                   for c in (self._x_coordinates, self._y_coordinates))
+
+    @property
+    def x_linspace(self):
+        return self._x_coordinates
+
+    @property
+    def y_linspace(self):
+        return self._y_coordinates
+
+    def get_matrix(self):
+        return np.meshgrid(self._x_coordinates, self._y_coordinates, indexing='xy')
+
+    @staticmethod
+    def _edges(coordinates):
+        middle = (coordinates[1:] + coordinates[:-1]) / 2
+        return np.concatenate([[2 * coordinates[0] - middle[0]], middle, [2 * coordinates[-1] - middle[-1]]])
+
+    @property
+    def pixel_bounds(self):
+        """
+        Pixel boundaries half way between nodes, for matplotlib.pcolor.
+        :return: [(m+1, n+1), (m+1, n+1)] shaped arrays.
+        """
+        return np.meshgrid(self._edges(self._x_coordinates), self._edges(self._y_coordinates))
+
+
+class FieldInterpolator(object):
+    def __init__(self, x, y, *fields, mask=None):
+        """
+        Bilinear interpolator for fields sampled on a rectilinear grid. On evenly spaced axes cell indices are found
+        arithmetically, otherwise by bisection. All fields are interpolated in the same pass.
+        :param x: (n, ) increasing x coordinates, e.g. Mesh.x_linspace.
+        :param y: (m, ) increasing y coordinates, e.g. Mesh.y_linspace.
+        :param fields: one or more (m, n) arrays sampled on meshgrid(x, y).
+        :param mask: (m, n) boolean array, False for nodes without a field, e.g. Mesh.mask. Points in a cell with such
+        a corner raise a ValueError instead of interpolating NaN.
+        """
+        self._x = np.asarray(x, dtype=float)
+        self._y = np.asarray(y, dtype=float)
+        self._x_uniform = self._is_uniform(self._x)
+        self._y_uniform = self._is_uniform(self._y)
+        self._values = np.stack(fields, axis=-1)
+        self._mask = None if mask is None else np.asarray(mask, dtype=bool)
+
+    @staticmethod
+    def _is_uniform(coordinates):
+        step = (coordinates[-1] - coordinates[0]) / (len(coordinates) - 1)
+        return np.allclose(np.diff(coordinates), step, rtol=1e-9, atol=0)
+
+    @staticmethod
+    def _cell_coordinates(coordinates, axis, uniform):
+        size = len(axis)
+        if uniform:
+            f = (coordinates - axis[0]) / (axis[-1] - axis[0]) * (size - 1)
+        else:
+            i = np.clip(np.searchsorted(axis, coordinates, side='right') - 1, 0, size - 2)
+            f = i + (coordinates - axis[i]) / (axis[i + 1] - axis[i])
+        if np.any(f < -1e-9) or np.any(f > size - 1 + 1e-9):
+            raise ValueError("Interpolator: one of the requested points is out of bounds.")
+        i = np.clip(np.floor(f).astype(int), 0, size - 2)
+        return i, (f - i)[..., None]
+
+    def __call__(self, points, magnitude=False):
+        """
+        Interpolates all fields at the given points.
+        :param points: (..., 2) array of (x, y) coordinates. A single (x, y) pair is treated as one point.
+        :param magnitude: also return the norm of the interpolated fields.
+        :return: tuple of (..., ) arrays, one per field, followed by the norm if requested.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim == 1:
+            points = points[None]
+        i, tx = self._cell_coordinates(points[..., 0], self._x, self._x_uniform)
+        j, ty = self._cell_coordinates(points[..., 1], self._y, self._y_uniform)
+        if self._mask is not None:
+            mask = self._mask
+            if not np.all(mask[j, i] & mask[j, i + 1] & mask[j + 1, i] & mask[j + 1, i + 1]):
+                raise ValueError("Interpolator: one of the requested points is masked, a neighbouring node has no "
+                                 "field.")
+        values = self._values
+        result = (values[j, i] * (1 - tx) * (1 - ty) + values[j, i + 1] * tx * (1 - ty) +
+                  values[j + 1, i] * (1 - tx) * ty + values[j + 1, i + 1] * tx * ty)
+        output = tuple(np.moveaxis(result, -1, 0))
+        if magnitude:
+            output += (np.sqrt(np.sum(result ** 2, axis=-1)), )
+        return output
+
+    def field_values(self, index):
+        """
+        :param index: index of the field.
+        :return: (m, n) array of the field on the grid.
+        """
+        return self._values[..., index]
+
+    def component(self, index):
+        """
+        Single-field view with the call signature and attributes of scipy's RegularGridInterpolator.
+        :param index: index of the field.
+        :return: _FieldComponent.
+        """
+        return _FieldComponent(self, index)
+
+
+class _FieldComponent(object):
+    bounds_error = True
+    fill_value = np.nan
+
+    def __init__(self, interpolator, index, method='linear'):
+        """
+        One field of a FieldInterpolator, standing in for RegularGridInterpolator((x, y), field.T). Linear queries use
+        the bilinear interpolator, other methods a RegularGridInterpolator built on first use.
+        :param interpolator: FieldInterpolator.
+        :param index: index of the field.
+        :param method: default method, any method of RegularGridInterpolator.
+        """
+        self._interpolator = interpolator
+        self._index = index
+        self.method = method
+        self._scipy_interpolator = None
+
+    @property
+    def grid(self):
+        return self._interpolator._x, self._interpolator._y
+
+    @property
+    def values(self):
+        return self._interpolator.field_values(self._index).T
+
+    def __call__(self, xi, method=None):
+        """
+        :param xi: (..., 2) array of (x, y) coordinates. A single (x, y) pair is treated as one point.
+        :param method: interpolation method, defaults to the method of this view.
+        :return: (..., ) array.
+        """
+        method = self.method if method is None else method
+        if method == 'linear':
+            return self._interpolator(xi)[self._index]
+        if self._scipy_interpolator is None:
+            self._scipy_interpolator = RegularGridInterpolator(self.grid, self.values, method=self.method)
+        result = self._scipy_interpolator(xi, method=method)
+        if self._interpolator._mask is not None and not np.all(np.isfinite(result)):
+            raise ValueError("Interpolator: one of the requested points is masked, a neighbouring node has no field.")
+        return result
+
+
+class _TiledField(object):
+    def __init__(self, sources, mesh, tile_shape):
+        """
+        Field of a Task in lazy mode. The mesh is divided into tiles that are solved on first use and kept, nodes of
+        unsolved tiles hold NaN.
+        :param sources: sources to evaluate.
+        :param mesh: Mesh.
+        :param tile_shape: (rows, columns) of mesh nodes per tile.
+        """
+        self._sources = sources
+        self._x_mesh, self._y_mesh = mesh.get_matrix()
+        self._mask = mesh.mask
+        self.tile_shape = (max(1, int(tile_shape[0])), max(1, int(tile_shape[1])))
+        shape = self._x_mesh.shape
+        # both components in one array, so that x and y fields and the interpolator share the solved tiles.
+        self.values = np.full(shape + (2, ), np.nan)
+        self.solved = np.zeros((-(-shape[0] // self.tile_shape[0]), -(-shape[1] // self.tile_shape[1])), dtype=bool)
+
+    @property
+    def complete(self):
+        return bool(np.all(self.solved))
+
+    def _solve_tiles(self, tiles):
+        rows, columns = self.tile_shape
+        for ti, tj in tiles:
+            if self.solved[ti, tj]:
+                continue
+            tile = (slice(ti * rows, (ti + 1) * rows), slice(tj * columns, (tj + 1) * columns))
+            self.values[tile + (0, )], self.values[tile + (1, )] = _masked_b_field_vec(
+                self._sources, self._x_mesh[tile], self._y_mesh[tile], None if self._mask is None else self._mask[tile])
+            self.solved[ti, tj] = True
+
+    def solve_all(self):
+        self._solve_tiles(zip(*np.nonzero(~self.solved)))
+
+    def solve_block(self, rows, columns):
+        """
+        Solves the tiles overlapping a block of nodes.
+        :param rows: slice of node rows, with start and stop.
+        :param columns: slice of node columns, with start and stop.
+        """
+        tile_rows = range(rows.start // self.tile_shape[0], -(-rows.stop // self.tile_shape[0]))
+        tile_columns = range(columns.start // self.tile_shape[1], -(-columns.stop // self.tile_shape[1]))
+        self._solve_tiles(product(tile_rows, tile_columns))
+
+    def solve_cells(self, i, j):
+        """
+        Solves the tiles holding the corner nodes of interpolation cells.
+        :param i: cell column indices, any shape.
+        :param j: cell row indices, same shape.
+        """
+        i = np.ravel(i)
+        j = np.ravel(j)
+        ti = np.concatenate([j, j + 1, j, j + 1]) // self.tile_shape[0]
+        tj = np.concatenate([i, i, i + 1, i + 1]) // self.tile_shape[1]
+        tiles = np.unique(np.stack([ti, tj], axis=-1), axis=0)
+        self._solve_tiles(map(tuple, tiles))
+
+
+class _TiledFieldInterpolator(FieldInterpolator):
+    def __init__(self, x, y, tiles, mask=None):
+        """
+        FieldInterpolator over a _TiledField, solving the tiles around the requested points before interpolating.
+        """
+        self._x = np.asarray(x, dtype=float)
+        self._y = np.asarray(y, dtype=float)
+        self._x_uniform = self._is_uniform(self._x)
+        self._y_uniform = self._is_uniform(self._y)
+        self._values = tiles.values
+        self._mask = None if mask is None else np.asarray(mask, dtype=bool)
+        self._tiles = tiles
+
+    def __call__(self, points, magnitude=False):
+        if not self._tiles.complete:
+            points = np.asarray(points, dtype=float)
+            i, _ = self._cell_coordinates(points[..., 0], self._x, self._x_uniform)
+            j, _ = self._cell_coordinates(points[..., 1], self._y, self._y_uniform)
+            self._tiles.solve_cells(i, j)
+        return super().__call__(points, magnitude)
+
+    def field_values(self, index):
+        self._tiles.solve_all()
+        return super().field_values(index)
+
+
 def _slice_list(entries, processes=4):
     count = len(entries)
     per_proc = count // processes
@@ -505,6 +1641,56 @@ def _slice_list(entries, processes=4):
     return output
 
 
+def _split_loop_sources(sources):
+    """
+    Stacks the loops of the CurrentLoop and LoopArray sources into one table and keeps the other sources apart.
+    :return: ((L, 3) array of [x, r, current], list of the other sources)
+    """
+    loop_types = (CurrentLoop, LoopArray)
+    loops = [np.asarray(source.get_loop_list(), dtype=float).reshape(-1, 3) for source in sources
+             if isinstance(source, loop_types)]
+    others = [source for source in sources if not isinstance(source, loop_types)]
+    return (np.vstack(loops) if loops else np.zeros((0, 3))), others
+
+
+def _picklable_mesh(mesh):
+    """
+    The mesh itself, or a shallow copy with its mask function evaluated to a boolean array, since functions such as
+    lambdas cannot be sent to worker processes.
+    """
+    if mesh is None or not callable(mesh._mask):
+        return mesh
+    mask = mesh.mask
+    mesh = copy.copy(mesh)
+    mesh._mask = mask
+    return mesh
+
+
+class TaskSpec(object):
+    def __init__(self, loops, sources, mesh):
+        """
+        Compact, picklable description of a Task for transfer to worker processes: the loops of its CurrentLoop and
+        LoopArray sources as one table, its other sources and its mesh. Fields and interpolators are left behind.
+        :param loops: (L, 3) array of [x, r, current], x and r in mm, current in amps.
+        :param sources: list of the other sources.
+        :param mesh: Mesh, or None for the mesh a worker was started with, see run_sources_on_mesh. A mask function
+        is evaluated to a boolean array.
+        """
+        self.loops = np.ascontiguousarray(loops, dtype=float).reshape(-1, 3)
+        self.sources = list(sources)
+        self.mesh = _picklable_mesh(mesh)
+
+    def to_task(self, mesh=None):
+        """
+        :param mesh: Mesh used when the spec has none.
+        :return: unsolved Task with the loops as a single LoopArray.
+        """
+        sources = list(self.sources)
+        if len(self.loops):
+            sources.append(LoopArray.from_loop_list(self.loops))
+        return Task(sources, self.mesh if self.mesh is not None else mesh)
+
+
 class Task(object):
     def __init__(self, sources=None, mesh=None):
         self.done = False
@@ -513,8 +1699,10 @@ class Task(object):
         self._x_field = None
         self._y_field = None
         self._center_field = None
-        self._x_field_interpolator = None
-        self._y_field_interpolator = None
+        self._field_interpolator = None
+        self._tiles = None
+        self.lumping_error = None
+        self.plan = None
         if sources is not None:
             try:
                 for source in sources:
@@ -525,6 +1713,34 @@ class Task(object):
         if mesh is not None:
             self.set_mesh(mesh)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # lazy members are rebuilt on access, there is no point in pickling them.
+        state['_field_interpolator'] = None
+        state['_center_field'] = None
+        return state
+
+    def to_spec(self):
+        """
+        :return: TaskSpec of this task, without its fields.
+        """
+        return TaskSpec(*_split_loop_sources(self._sources), self._mesh)
+
+    def fingerprint(self):
+        """
+        Digest of the loops, other sources and mesh of this task, the same for tasks describing the same problem.
+        Keys the results of run_tasks in checkpoints.
+        :return: hex string.
+        """
+        spec = self.to_spec()
+        digest = hashlib.sha1(spec.loops.tobytes())
+        for coordinates in (self.mesh.x_linspace, self.mesh.y_linspace):
+            digest.update(b'|' + np.asarray(coordinates, dtype=float).tobytes())
+        if self.mesh.mask is not None:
+            digest.update(b'|' + np.asarray(self.mesh.mask, dtype=bool).tobytes())
+        digest.update(b'|' + pickle.dumps(spec.sources))
+        return digest.hexdigest()
+
     def add_source(self, source):
         try:
             assert isinstance(source, SourceBaseClass)
@@ -556,22 +1772,67 @@ class Task(object):
         else:
             raise TypeError("Set mesh: Wrong type supplied: expected mesh.")
 
-    def run(self, processes: int = 1):
+    def run(self, processes: int = 1, lump_tolerance: (float, None) = None, threads: int = 1, engine: str = 'direct',
+            tree_tolerance: float = 1e-4, lazy: bool = False, tile_shape=(32, 32)):
         """
-        User-facing wrapper for single-process and multi-process run methods.
+        User-facing wrapper for single-process, multi-process and multi-thread run methods.
         :param processes: Number of processes: 1 for single-threaded
+        :param lump_tolerance: If given, merge adjacent loops of CurrentLoop and LoopArray sources as long as the
+        relative field error on the mesh bounds stays below this value, see lump_sources. The error actually
+        achieved is stored in lumping_error.
+        :param threads: Number of threads evaluating row tiles of the mesh in-process. Cannot be combined with
+        processes.
+        :param engine: 'direct' sums every loop on every node, 'fft' convolves evenly pitched windings along x, see
+        _run_fft, 'treecode' replaces distant loop clusters by equivalent loops, see _run_treecode. The fft and
+        treecode engines run in a single process. Direct runs in a single process and thread use the kernel memo when
+        it is enabled, see enable_kernel_memo. 'auto' runs direct with the processes, threads and tile size chosen by
+        magcoilcalc.planner.plan_run from the calibration of this machine, measured on first use. The chosen plan is
+        stored in plan.
+        :param tree_tolerance: field error of the treecode engine relative to the largest field on the mesh.
+        :param lazy: do not solve the mesh now, but tile by tile when the field is used, see _run_lazy. Direct engine
+        in a single process and thread only.
+        :param tile_shape: (rows, columns) of mesh nodes per tile in lazy mode.
         :return: None
         """
+        if engine not in ('direct', 'fft', 'treecode', 'auto'):
+            raise ValueError("Task run: unknown engine %s." % engine)
         if processes < 1:
             raise ValueError("Task run: number of processes cannot be smaller than 1")
-        if processes == 1:
-            self._run_sp()
+        if threads < 1:
+            raise ValueError("Task run: number of threads cannot be smaller than 1")
+        if processes > 1 and threads > 1:
+            raise ValueError("Task run: use either multiple processes or multiple threads, not both.")
+        sources = None
+        if lump_tolerance is not None and not self.done:
+            sources, self.lumping_error = lump_sources(self._sources, self.mesh, lump_tolerance)
+        if engine == 'auto' and (processes > 1 or threads > 1):
+            raise ValueError("Task run: the auto engine chooses processes and threads itself.")
+        if engine in ('fft', 'treecode') and (processes > 1 or threads > 1):
+            raise ValueError("Task run: the %s engine runs in a single process and thread." % engine)
+        if lazy and (engine not in ('direct', 'auto') or processes > 1 or threads > 1):
+            raise ValueError("Task run: lazy runs use the direct engine in a single process and thread.")
+        tile_rows = None
+        if engine == 'auto' and not lazy and not self.done:
+            from magcoilcalc.planner import plan_run
+            plan = plan_run(self.mesh, self._sources if sources is None else sources)
+            processes, threads, tile_rows = plan['processes'], plan['threads'], plan['tile_rows']
+            self.plan = plan
+        if lazy:
+            self._run_lazy(tile_shape, sources)
+        elif engine == 'fft':
+            self._run_fft(sources)
+        elif engine == 'treecode':
+            self._run_treecode(tree_tolerance, sources)
+        elif threads > 1:
+            self._run_threads(threads, sources, tile_rows)
+        elif processes == 1:
+            self._run_sp(sources)
         else:
             if multiprocessing is not None:
-                self._run_mp(processes=processes)
+                self._run_mp(processes=processes, sources=sources)
             else:
                 logger.log_event("Multiprocessing module disabled - falling back to single-threaded calculation")
-                self._run_sp()
+                self._run_sp(sources)
 
     def _run_sp_legacy(self):
         """
@@ -598,36 +1859,165 @@ class Task(object):
                         br = loop_calculator.field_radial(current, a, x, r)
                         x_field[i][j] += bx
                         y_field[i][j] += br
-        self.done = True
-        self._x_field = x_field
-        self._y_field = y_field
-        self._x_field_interpolator, self._y_field_interpolator = self._make_field_interpolator()
-        self._center_field = self.calculate_center_field()
+        self._store_fields(x_field, y_field)
 
-    def _run_sp(self):
+    def _run_sp(self, sources=None):
         logger.clear_timer(1)
         if self.done:
             return
+        if sources is None:
+            sources = self._sources
+        x_mesh, y_mesh = self._mesh.get_matrix()
+        memo = get_kernel_memo()
+        if memo is None:
+            x_field, y_field = _masked_b_field_vec(sources, x_mesh, y_mesh, self._mesh.mask)
+        else:
+            x_field, y_field = self._memo_b_field(memo, sources)
+        logger.timestamp(1, "SP run complete")
+        self._store_fields(x_field, y_field)
+
+    def _memo_b_field(self, memo, sources):
+        """
+        Fields on the whole mesh with the loops of CurrentLoop and LoopArray sources taken from the kernel memo, see
+        enable_kernel_memo. Other sources are evaluated directly. Masked nodes are set to NaN.
+        :return: x and y fields in Tesla.
+        """
+        loops, others = _split_loop_sources(sources)
+        x_field, y_field = _memo_loops_b_field(memo, loops, self._mesh.x_linspace, self._mesh.y_linspace)
+        if others:
+            x_mesh, y_mesh = self._mesh.get_matrix()
+            bx, by = _sources_b_field_vec(others, x_mesh, y_mesh)
+            x_field += bx
+            y_field += by
+        mask = self._mesh.mask
+        if mask is not None:
+            x_field[~mask] = np.nan
+            y_field[~mask] = np.nan
+        return x_field, y_field
+
+    def _run_threads(self, threads, sources=None, tile_rows=None):
+        """
+        Splits the mesh into tiles of rows evaluated concurrently by a thread pool. The scipy elliptic integrals
+        release the GIL, so this scales without the spawn and pickling costs of _run_mp.
+        :param threads: number of worker threads.
+        :param sources: sources to evaluate, defaults to the sources of this task.
+        :param tile_rows: mesh rows per tile, defaults to about 4 tiles per thread.
+        :return: None
+        """
+        logger.clear_timer(2)
+        if self.done:
+            return
+        if sources is None:
+            sources = self._sources
         x_mesh, y_mesh = self._mesh.get_matrix()
+        mask = self._mesh.mask
         x_field = np.zeros(x_mesh.shape)
         y_field = np.zeros(x_mesh.shape)
-        for source in self.sources:
-            try:
-                bxs, bys = source.b_field_vec(x_mesh, y_mesh)
-                x_field += bxs
-                y_field += bys
-            except AttributeError:
-                for i in range(x_mesh.shape[0]):
-                    for j in range(x_mesh.shape[1]):
-                        bx, by = source.b_field(x_mesh[i][j], y_mesh[i][j])
-                        x_field[i][j] += bx
-                        y_field[i][j] += by
+        rows = x_mesh.shape[0]
+        if tile_rows is None:
+            tile_rows = max(1, -(-rows // (4 * threads)))
+
+        def solve_tile(start):
+            tile = slice(start, start + tile_rows)
+            # numpy error states are per thread, the one set in _off_axis_loop does not reach the workers.
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_field[tile], y_field[tile] = _masked_b_field_vec(sources, x_mesh[tile], y_mesh[tile],
+                                                                   None if mask is None else mask[tile])
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(solve_tile, range(0, rows, tile_rows)))
+        logger.timestamp(2, "threaded run complete")
+        self._store_fields(x_field, y_field)
+
+    def _run_fft(self, sources=None):
+        """
+        Solver for meshes with evenly spaced x nodes. The loops of CurrentLoop and LoopArray sources that stand on
+        the x grid are superposed per radius by FFT convolution of a single loop response, see
+        magcoilcalc._fft_solver. Other loops and sources are evaluated directly. Masked nodes are computed as well,
+        since whole rows are convolved, and set to NaN afterwards.
+        :param sources: sources to evaluate, defaults to the sources of this task.
+        :return: None
+        """
+        from magcoilcalc._fft_solver import fft_loops_b_field
+        logger.clear_timer(3)
+        if self.done:
+            return
+        if sources is None:
+            sources = self._sources
+        x = np.asarray(self._mesh.x_linspace, dtype=float)
+        y = np.asarray(self._mesh.y_linspace, dtype=float)
+        if _uniform_step(x) is None:
+            raise ValueError("Task run: the fft engine needs evenly spaced x nodes.")
+        loops, others = _split_loop_sources(sources)
+        x_field, y_field = fft_loops_b_field(loops, x, y)
+        if others:
+            x_mesh, y_mesh = self._mesh.get_matrix()
+            bx, by = _sources_b_field_vec(others, x_mesh, y_mesh)
+            x_field += bx
+            y_field += by
+        mask = self._mesh.mask
+        if mask is not None:
+            x_field[~mask] = np.nan
+            y_field[~mask] = np.nan
+        logger.timestamp(3, "FFT run complete")
+        self._store_fields(x_field, y_field)
+
+    def _run_treecode(self, tolerance, sources=None):
+        """
+        Hierarchical solver for magnets with many loops on dense meshes. The loops of CurrentLoop and LoopArray
+        sources are clustered, and clusters far from a tile of mesh nodes are evaluated through a few equivalent
+        loops, see magcoilcalc._treecode. Other sources are evaluated directly.
+        :param tolerance: field error relative to the largest field on the mesh.
+        :param sources: sources to evaluate, defaults to the sources of this task.
+        :return: None
+        """
+        from magcoilcalc._treecode import treecode_b_field
+        logger.clear_timer(4)
+        if self.done:
+            return
+        if sources is None:
+            sources = self._sources
+        x_mesh, y_mesh = self._mesh.get_matrix()
+        mask = self._mesh.mask
+        if mask is None:
+            mask = np.ones(x_mesh.shape, dtype=bool)
+        loops, others = _split_loop_sources(sources)
+        x_field, y_field = _masked_b_field_vec(others, x_mesh, y_mesh, mask)
+        bx, by = treecode_b_field(loops, x_mesh[mask], y_mesh[mask], tolerance)
+        x_field[mask] += bx
+        y_field[mask] += by
+        logger.timestamp(4, "treecode run complete")
+        self._store_fields(x_field, y_field)
+
+    def _run_lazy(self, tile_shape, sources=None):
+        """
+        Marks the task as done without solving anything. The mesh is divided into tiles, and a tile is solved when it
+        is first needed: x_field and y_field solve every tile, field_at and x_field_at only the tiles around the
+        requested points, field_region only the tiles overlapping the region. Solved tiles are kept, so a task that
+        is probed at a few points or shown over a window never pays for the rest of the mesh.
+        :param tile_shape: (rows, columns) of mesh nodes per tile.
+        :param sources: sources to evaluate, defaults to the sources of this task.
+        :return: None
+        """
+        if self.done:
+            return
+        if sources is None:
+            sources = self._sources
+        tiles = _TiledField(sources, self._mesh, tile_shape)
+        self._store_fields(tiles.values[..., 0], tiles.values[..., 1])
+        self._tiles = tiles
+
+    def _store_fields(self, x_field, y_field):
         self.done = True
-        logger.timestamp(1, "SP run complete")
         self._x_field = x_field
         self._y_field = y_field
-        self._x_field_interpolator, self._y_field_interpolator = self._make_field_interpolator()
-        self._center_field = self.calculate_center_field()
+        self._field_interpolator = None
+        self._center_field = None
+        self._tiles = None
+
+    def _solve_all_tiles(self):
+        if self._tiles is not None and not self._tiles.complete:
+            self._tiles.solve_all()
 
     @staticmethod
     def _mp_process_run(ij_list, x_mesh, y_mesh, loop_list):
@@ -647,21 +2037,29 @@ class Task(object):
             y_field[i][j] += np.sum(br)
         return x_field, y_field
 
-    def _run_mp(self, processes):
+    def _run_mp(self, processes, sources=None):
         logger.clear_timer(0)
         if self.done:
             return
+        if sources is None:
+            sources = self._sources
         x_mesh, y_mesh = self._mesh.get_matrix()
         x_field = np.zeros(x_mesh.shape)
         y_field = np.zeros(x_mesh.shape)
         i = range(0, x_mesh.shape[0])
         j = range(0, x_mesh.shape[1])
         try:
-            current_loops = np.vstack([source.get_loop_list() for source in self._sources])
+            current_loops = np.vstack([source.get_loop_list() for source in sources])
         except AttributeError:
-            raise TypeError("multi-process run: having more than 1 processes on one Task object requires all sources to be \
-                            CurrentLoops")
-        split_ij = _slice_list(list(product(i, j)), processes)
+            raise TypeError("multi-process run: having more than 1 processes on one Task object requires all sources "
+                            "to be CurrentLoops")
+        ij_list = list(product(i, j))
+        mask = self._mesh.mask
+        if mask is not None:
+            ij_list = [(i, j) for i, j in ij_list if mask[i, j]]
+            x_field[~mask] = np.nan
+            y_field[~mask] = np.nan
+        split_ij = _slice_list(ij_list, processes)
         logger.timestamp(0, "Slicing done")
         pool = multiprocessing.Pool(processes=processes)
         logger.timestamp(0, "processes spawned")
@@ -672,16 +2070,32 @@ class Task(object):
             x_field += result[0]
             y_field += result[1]
 
-        self.done = True
-        self._x_field = x_field
-        self._y_field = y_field
-        self._x_field_interpolator, self._y_field_interpolator = self._make_field_interpolator()
-        self._center_field = self.calculate_center_field()
+        self._store_fields(x_field, y_field)
         logger.timestamp(0, "all done")
 
+    def inductance_matrix(self, wire_radius=None, block_size=1024):
+        """
+        Inductance matrix of the sources in this task, see SourceCollection.inductance_matrix.
+        :return: (n, n) array in Henry.
+        """
+        return SourceCollection(self._sources).inductance_matrix(wire_radius, block_size)
+
+    def axial_forces(self, per_turn=False):
+        """
+        Axial force on each source of this task, see SourceCollection.axial_forces.
+        :return: (n, ) array in Newtons, and per-loop forces if per_turn.
+        """
+        return SourceCollection(self._sources).axial_forces(per_turn)
+
+    def stored_energy(self, wire_radius=None):
+        """
+        Magnetic energy stored in the sources of this task, see SourceCollection.stored_energy.
+        :return: energy in Joules.
+        """
+        return SourceCollection(self._sources).stored_energy(wire_radius)
+
     def calculate_center_field(self, xc=0, yc=0):
-        fx = self.x_field_at([xc, yc])
-        fy = self.y_field_at([xc, yc])
+        fx, fy = self.field_at([xc, yc])
         return fx, fy
 
     @property
@@ -697,6 +2111,7 @@ class Task(object):
         if not self.done:
             raise ValueError("field not solved yet.")
         else:
+            self._solve_all_tiles()
             return self._x_field
 
     @property
@@ -708,6 +2123,7 @@ class Task(object):
         if not self.done:
             raise ValueError("field not solved yet.")
         else:
+            self._solve_all_tiles()
             return self._y_field
 
     @property
@@ -753,34 +2169,75 @@ class Task(object):
     def center_field(self):
         if not self.done:
             raise ValueError("field not solved yet.")
-        else:
-            return self._center_field
+        if self._center_field is None:
+            self._center_field = self.calculate_center_field()
+        return self._center_field
+
+    def field_at(self, points, magnitude=False):
+        """
+        Interpolates both field components at a batch of points. Points next to masked nodes raise a ValueError.
+        :param points: (..., 2) array of (x, y) in mm.
+        :param magnitude: also return |B|.
+        :return: (bx, by) or (bx, by, |B|) arrays in Tesla.
+        """
+        return self._get_field_interpolator()(points, magnitude)
 
     @property
     def x_field_at(self):
-        return self._x_field_interpolator
+        return self._get_field_interpolator().component(0)
 
     @property
     def y_field_at(self):
-        return self._y_field_interpolator
+        return self._get_field_interpolator().component(1)
+
+    def _get_field_interpolator(self):
+        if not self.done:
+            raise ValueError("field not solved yet.")
+        if self._field_interpolator is None:
+            if self._tiles is not None:
+                self._field_interpolator = _TiledFieldInterpolator(self.mesh.x_linspace, self.mesh.y_linspace,
+                                                                   self._tiles, mask=self.mesh.mask)
+            else:
+                self._field_interpolator = FieldInterpolator(self.mesh.x_linspace, self.mesh.y_linspace,
+                                                             self._x_field, self._y_field, mask=self.mesh.mask)
+        return self._field_interpolator
 
-    def _make_field_interpolator(self):
+    def region_slices(self, x_range, y_range):
+        """
+        Mesh nodes inside a rectangular region.
+        :param x_range: (x_min, x_max) in mm.
+        :param y_range: (y_min, y_max) in mm.
+        :return: (rows, columns) slices of the node arrays.
+        """
         x = self.mesh.x_linspace
         y = self.mesh.y_linspace
-        xi = RegularGridInterpolator((x, y), self._x_field.T)
-        yi = RegularGridInterpolator((x, y), self._y_field.T)
-
-        return xi, yi
+        columns = slice(int(np.searchsorted(x, min(x_range), side='left')),
+                        int(np.searchsorted(x, max(x_range), side='right')))
+        rows = slice(int(np.searchsorted(y, min(y_range), side='left')),
+                     int(np.searchsorted(y, max(y_range), side='right')))
+        if rows.stop - rows.start < 2 or columns.stop - columns.start < 2:
+            raise ValueError("Field region: at least 2 mesh nodes per axis required inside the region.")
+        return rows, columns
+
+    def field_region(self, x_range, y_range):
+        """
+        Fields on the mesh nodes inside a rectangular region. In lazy mode only the tiles overlapping the region are
+        solved.
+        :param x_range: (x_min, x_max) in mm.
+        :param y_range: (y_min, y_max) in mm.
+        :return: (rows, columns) slices of the region, x and y fields on it in Tesla.
+        """
+        if not self.done:
+            raise ValueError("field not solved yet.")
+        rows, columns = self.region_slices(x_range, y_range)
+        if self._tiles is not None:
+            self._tiles.solve_block(rows, columns)
+        return rows, columns, self._x_field[rows, columns], self._y_field[rows, columns]
 
     def make_gradient_interpolator(self, lat_field_axis='y', gradient_axes="xyt"):
-        # TODO: figure out if RegularGridInterpolator REALLY takes ij indexing instead of xy
         g = find_gradient(self, lat_field_axis=lat_field_axis, gradient_axes=gradient_axes)
-        x = self.mesh.x_linspace
-        y = self.mesh.y_linspace
-        # x = self.x_mesh.ravel()
-        # y = self.y_mesh.ravel()
-        # return LinearNDInterpolator((x, y), g.ravel())
-        return RegularGridInterpolator((x, y), g.T)
+        # the gradient is NaN on masked nodes and next to them.
+        return FieldInterpolator(self.mesh.x_linspace, self.mesh.y_linspace, g, mask=np.isfinite(g)).component(0)
 
 
 def run_task(mesh: Mesh, sources: [CurrentLoop], processes=1):
@@ -796,49 +2253,159 @@ def run_task(mesh: Mesh, sources: [CurrentLoop], processes=1):
     return cal
 
 
-def run_sources_on_mesh(mesh, sources_list, processes=1):
+def run_sources_on_mesh(mesh, sources_list, processes=1, reduce=None):
     """
-    Run multiple sets of sources on the mesh, supports multiprocessing.
+    Run multiple sets of sources on the mesh, supports multiprocessing. Workers receive the mesh once when they start
+    and every set of sources as a TaskSpec.
     :param mesh: Mesh to be used in calculations.
     :param sources_list: a LIST of LISTS of sources, like:
     [[mag1_1, mag1_2, mag1_3],
      [mag2_2, mag2_2, mag2_3],
      ...]
     :param processes: Number of parallel processes to run.
-    :return: A list of finished Tasks.
+    :param reduce: see run_tasks.
+    :return: A list of finished Tasks, or of the reduced results.
     """
-    if multiprocessing is None and processes > 1:
+    specs = [TaskSpec(*_split_loop_sources(sources), None) for sources in sources_list]
+    if processes > 1 and multiprocessing is None:
         print("multiprocessing not working, falling back to single threaded operation")
-        result = []
-        for sources in sources_list:
-            task = Task(mesh=mesh, sources=sources)
-            task.run()
-            result.append(task)
-        return result
+    if processes == 1 or multiprocessing is None:
+        _set_worker_mesh(mesh)
+        results = [_run_spec(spec, reduce) for spec in specs]
     else:
-        pool = multiprocessing.Pool(processes=processes)
-        arglist = [[mesh, sources] for sources in sources_list]
-        return pool.starmap(run_task, arglist)
+        with multiprocessing.Pool(processes=processes, initializer=_set_worker_mesh,
+                                  initargs=(_picklable_mesh(mesh), )) as pool:
+            results = pool.starmap(_run_spec, [(spec, reduce) for spec in specs])
+    if reduce is not None:
+        return results
+    return [_solved_task(sources, mesh, fields) for sources, fields in zip(sources_list, results)]
+
 
+_worker_mesh = None
 
-def _run_this(task):
+
+def _set_worker_mesh(mesh):
+    global _worker_mesh
+    _worker_mesh = mesh
+
+
+def _run_spec(spec, reduce=None, shared=None):
+    """
+    Solves a TaskSpec in a worker.
+    :param spec: TaskSpec, a spec without mesh uses the mesh the worker was started with.
+    :param reduce: None to return the fields, 'center_field', or a function of the solved Task.
+    :param shared: (name, shape) of a shared memory block the fields are written to instead of being returned.
+    :return: (x_field, y_field), the reduced result, or None with shared memory.
+    """
+    task = spec.to_task(_worker_mesh)
     task.run()
+    if shared is not None:
+        name, shape = shared
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            fields = np.ndarray((2, ) + shape, dtype=float, buffer=block.buf)
+            fields[0] = task.x_field
+            fields[1] = task.y_field
+            del fields
+        finally:
+            block.close()
+        return None
+    if reduce is None:
+        return task.x_field, task.y_field
+    if reduce == 'center_field':
+        return task.center_field
+    return reduce(task)
+
+
+def _solved_task(sources, mesh, fields):
+    task = Task(sources, mesh)
+    task._store_fields(*fields)
     return task
 
 
-def run_tasks(tasks: [Task], processes=1):
+def _run_indexed(arguments):
+    index, spec, reduce, shared = arguments
+    return index, _run_spec(spec, reduce, shared)
+
+
+def _reduce_fingerprint(reduce):
+    """
+    Digest of a reduce function with its bound arguments, which keys its results in checkpoints next to the task
+    fingerprint.
+    """
+    try:
+        return hashlib.sha1(pickle.dumps(reduce, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+    except (pickle.PicklingError, AttributeError, TypeError) as error:
+        raise ValueError("run tasks: reduce cannot be fingerprinted for the checkpoint, %s" % error) from error
+
+
+def run_tasks(tasks: [Task], processes=1, reduce=None, shared_fields=False, checkpoint=None):
     """
     Runs every task in a list of tasks, returns done list of done tasks.
     The original list of tasks REMAINS UNTOUCHED!
+    Tasks travel to the workers as TaskSpecs, and only what is asked for travels back.
     :param tasks: list of tasks
     :param processes: number of processes
-    :return: list of tasks(done)
+    :param reduce: None to return solved tasks, 'center_field' for the center field of each task, or a picklable
+    function of a solved Task, e.g. functools.partial(fom_cylindrical_cell, length=100, diameter=60), whose results
+    are returned instead.
+    :param shared_fields: return the fields through shared memory blocks instead of pickling them, for large meshes.
+    Cannot be combined with reduce or checkpoint.
+    :param checkpoint: path of a checkpoint file or a Checkpoint. Every finished task is appended to it under its
+    fingerprint as soon as it is done, and tasks found in it are not run again, so a batch that died resumes where it
+    stopped. Results of reduce functions are keyed by a digest of the pickled function, so partials with other
+    arguments are run again.
+    :return: list of tasks(done), or of the reduced results.
     """
-    if multiprocessing is None and processes > 1:
-        print("multiprocessing not working, falling back to single threaded calculation")
-        for task in tasks:
-            task.run()
-        return tasks
-    else:
-        pool = multiprocessing.Pool(processes=processes)
-        return pool.map(_run_this, tasks)
+    if reduce is not None and shared_fields:
+        raise ValueError("run tasks: reduced results cannot be returned through shared memory.")
+    if shared_fields and shared_memory is None:
+        raise ValueError("run tasks: shared memory is not available.")
+    if shared_fields and checkpoint is not None:
+        raise ValueError("run tasks: checkpointed fields are pickled, shared memory cannot be used.")
+    specs = [task.to_spec() for task in tasks]
+    results = [None] * len(tasks)
+    blocks = [None] * len(tasks)
+    shared = [None] * len(tasks)
+    if shared_fields:
+        for index, task in enumerate(tasks):
+            shape = (task.mesh.y_steps, task.mesh.x_steps)
+            blocks[index] = shared_memory.SharedMemory(create=True, size=2 * int(np.prod(shape)) * 8)
+            shared[index] = (blocks[index].name, shape)
+    try:
+        with open_checkpoint(checkpoint) if checkpoint is not None else nullcontext() as store:
+            pending = range(len(tasks))
+            if store is not None:
+                kind = reduce if reduce is None or isinstance(reduce, str) else _reduce_fingerprint(reduce)
+                keys = [(task.fingerprint(), kind) for task in tasks]
+                pending = [index for index, key in enumerate(keys) if key not in store]
+                for index, key in enumerate(keys):
+                    if key in store:
+                        results[index] = store[key]
+            arguments = [(index, specs[index], reduce, shared[index]) for index in pending]
+
+            def finish(index, result):
+                results[index] = result
+                if store is not None:
+                    store.add(keys[index], result)
+
+            if processes > 1 and multiprocessing is None:
+                print("multiprocessing not working, falling back to single threaded calculation")
+            if processes == 1 or multiprocessing is None:
+                for argument in arguments:
+                    finish(*_run_indexed(argument))
+            elif arguments:
+                with multiprocessing.Pool(processes=processes) as pool:
+                    for index, result in pool.imap_unordered(_run_indexed, arguments):
+                        finish(index, result)
+        if reduce is not None:
+            return results
+        if shared_fields:
+            results = [np.ndarray((2, ) + shape, dtype=float, buffer=block.buf).copy()
+                       for block, (_, shape) in zip(blocks, shared)]
+        return [_solved_task(task.sources, task.mesh, fields) for task, fields in zip(tasks, results)]
+    finally:
+        for block in blocks:
+            if block is not None:
+                block.close()
+                block.unlink()
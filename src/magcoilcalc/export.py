@@ -0,0 +1,71 @@
+import numpy as np
+from numpy.lib.format import open_memmap
+from magcoilcalc._settings import VEC_BLOCK_SIZE
+from magcoilcalc.core import Task, SourceBaseClass, _sources_b_field_vec
+
+
+def _half_plane_function(field):
+    """
+    Turns a solved Task, a source or a list of sources into f(x, r) -> (bx, br) on arrays of points.
+    """
+    if isinstance(field, Task):
+        if not field.done:
+            raise ValueError("Cartesian export: Field not solved.")
+
+        def evaluate(x, r):
+            return field.field_at(np.stack([x, r], axis=-1))
+        return evaluate
+    if isinstance(field, SourceBaseClass):
+        field = [field]
+
+    def evaluate(x, r):
+        return _sources_b_field_vec(field, x, r)
+    return evaluate
+
+
+def cartesian_field(field, x, y, z, path=None, x_block=None):
+    """
+    Field of the axisymmetric problem on a 3-D Cartesian grid, with x along the magnet axis and y, z transverse. The
+    half-plane field (bx, br) is evaluated once per unique radius of the (y, z) grid and x slice, then br is rotated
+    into by = br * y / r and bz = br * z / r. The volume is written in x slabs, so with a path it is streamed to an
+    .npy file without ever being held in memory.
+    :param field: solved Task (interpolated, its mesh has to cover the radii), a source or a list of sources
+    (analytic).
+    :param x: (nx, ) x coordinates in mm.
+    :param y: (ny, ) y coordinates in mm.
+    :param z: (nz, ) z coordinates in mm.
+    :param path: .npy file to write, the volume is returned in memory if None.
+    :param x_block: x slices per slab, defaults to slabs of about VEC_BLOCK_SIZE values.
+    :return: (nx, ny, nz, 3) array of (bx, by, bz) in Tesla, a memory map of the file if path is given.
+    """
+    evaluate = _half_plane_function(field)
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    z = np.asarray(z, dtype=float).ravel()
+    shape = (x.size, y.size, z.size, 3)
+    if path is None:
+        output = np.zeros(shape)
+    else:
+        output = open_memmap(path, mode='w+', dtype=float, shape=shape)
+
+    y_grid, z_grid = np.meshgrid(y, z, indexing='ij')
+    r_grid = np.hypot(y_grid, z_grid)
+    radii, inverse = np.unique(r_grid, return_inverse=True)
+    inverse = inverse.reshape(r_grid.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos = np.where(r_grid > 0, y_grid / r_grid, 0.0)
+        sin = np.where(r_grid > 0, z_grid / r_grid, 0.0)
+    if x_block is None:
+        x_block = max(1, VEC_BLOCK_SIZE // (4 * y.size * z.size))
+
+    for start in range(0, x.size, x_block):
+        slab = slice(start, start + x_block)
+        x_mesh, r_mesh = np.meshgrid(x[slab], radii, indexing='ij')
+        bx, br = evaluate(x_mesh, r_mesh)
+        br = br[:, inverse]
+        output[slab, :, :, 0] = bx[:, inverse]
+        output[slab, :, :, 1] = br * cos
+        output[slab, :, :, 2] = br * sin
+    if path is not None:
+        output.flush()
+    return output
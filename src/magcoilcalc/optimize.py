@@ -0,0 +1,227 @@
+import time
+import numpy as np
+from scipy.optimize import lsq_linear, minimize
+from magcoilcalc.core import Task, Mesh, SourceBaseClass, RectangularCoil, _sources_b_field_vec
+from magcoilcalc.core import enable_kernel_memo, disable_kernel_memo, kernel_memo_info
+from magcoilcalc.calculations import fom_cylindrical_cell
+
+# Fidelity ladder of optimize_design, from coarse to fine. steps: mesh nodes over the cell, lump_tolerance: see
+# Task.run, max_order: cap on the quadrature order of RectangularCoil windings (None for their own), fom_steps: cell
+# sampling of fom_cylindrical_cell, tol: minimizer tolerance, simplex: initial Nelder-Mead simplex size relative to
+# the parameters.
+DEFAULT_FIDELITIES = ({'steps': (17, 11), 'lump_tolerance': 1e-3, 'max_order': 4, 'fom_steps': (13, 13),
+                       'tol': 1e-2, 'simplex': 0.05},
+                      {'steps': (33, 21), 'lump_tolerance': 1e-4, 'max_order': 8, 'fom_steps': (25, 25),
+                       'tol': 1e-3, 'simplex': 0.01},
+                      {'steps': (65, 41), 'lump_tolerance': None, 'max_order': None, 'fom_steps': (51, 51),
+                       'tol': 1e-4, 'simplex': 0.002})
+
+
+def _limit_order(sources, max_order):
+    """
+    The sources with the quadrature order of RectangularCoil windings capped, copying the windings that change.
+    :param max_order: largest quadrature order, None to keep the sources as they are.
+    """
+    if max_order is None:
+        return list(sources)
+    limited = []
+    for source in sources:
+        if isinstance(source, RectangularCoil) and source.max_order > max_order:
+            source = source.__copy__()
+            source.max_order = max_order
+        limited.append(source)
+    return limited
+
+
+def _region_points(region):
+    """
+    :param region: Mesh, whose nodes inside the mask are used, or (N, 2) array of (x, y) points in mm.
+    :return: x and y coordinates, (N, ) arrays in mm.
+    """
+    if isinstance(region, Mesh):
+        x_mesh, y_mesh = region.get_matrix()
+        mask = region.mask
+        if mask is not None:
+            return x_mesh[mask], y_mesh[mask]
+        return x_mesh.ravel(), y_mesh.ravel()
+    points = np.asarray(region, dtype=float).reshape(-1, 2)
+    return points[:, 0], points[:, 1]
+
+
+def _has_scalar_current(source):
+    current = getattr(source, 'current', None)
+    return current is not None and np.ndim(current) == 0
+
+
+def current_basis(sources, region):
+    """
+    Field of every source at unit current on a region, computed once so that the field of any set of currents is a
+    matrix product.
+    :param sources: list of sources with a scalar current.
+    :param region: Mesh or (N, 2) array of points in mm.
+    :return: (bx, by), each (N, n) in Tesla per amp.
+    """
+    x, y = _region_points(region)
+    bx = np.zeros((x.size, len(sources)))
+    by = np.zeros((x.size, len(sources)))
+    for index, source in enumerate(sources):
+        unit = source.__copy__()
+        unit.current = 1.0
+        bx[:, index], by[:, index] = _sources_b_field_vec([unit], x, y)
+    return bx, by
+
+
+def optimize_currents(sources, region, target_field=None, free=None, bounds=None, regularization=0.0,
+                      components='xy', weights=None):
+    """
+    Currents minimizing the deviation from a target field on a region. The field is linear in the currents, so this
+    is a linear least-squares problem over the unit-current field of each source, solved once instead of running a
+    Task per trial.
+    :param sources: list of sources, or a Task whose sources are used.
+    :param region: Mesh, whose nodes inside the mask are used, or (N, 2) array of (x, y) points in mm.
+    :param target_field: (bx, by) in Tesla, scalars or (N, ) arrays. Defaults to the x field the sources give at the
+    origin and no y field, a homogeneous field of the present strength.
+    :param free: indices of the sources whose current is optimized, defaults to every source with a scalar current.
+    The other sources keep their currents.
+    :param bounds: (lower, upper) currents in amps, scalars or one value per free source. None for no bounds.
+    :param regularization: Tikhonov weight on the free currents, in squared Tesla per squared amp.
+    :param components: field components fitted, 'x', 'y' or 'xy'.
+    :param weights: (N, ) weights of the points, uniform by default.
+    :return: dict with currents (per free source, amps), sources (copies with the new currents), free (indices),
+    rms_deviation and max_deviation (of the fitted components from the target, Tesla).
+    """
+    if isinstance(sources, Task):
+        sources = sources.sources
+    if isinstance(sources, SourceBaseClass):
+        sources = [sources]
+    if components not in ('x', 'y', 'xy'):
+        raise ValueError("Current optimization: components accepts x, y or xy, got %s." % components)
+    if free is None:
+        free = [i for i, source in enumerate(sources) if _has_scalar_current(source)]
+    free = list(free)
+    if not free:
+        raise ValueError("Current optimization: no source with a scalar current to optimize.")
+    fixed = [source for i, source in enumerate(sources) if i not in free]
+    x, y = _region_points(region)
+    if target_field is None:
+        target_field = (_sources_b_field_vec(sources, np.zeros(1), np.zeros(1))[0][0], 0.0)
+    target_x = np.broadcast_to(np.asarray(target_field[0], dtype=float), x.shape)
+    target_y = np.broadcast_to(np.asarray(target_field[1], dtype=float), x.shape)
+
+    basis_x, basis_y = current_basis([sources[i] for i in free], np.stack([x, y], axis=-1))
+    fixed_x, fixed_y = _sources_b_field_vec(fixed, x, y)
+    rows, rhs = [], []
+    if 'x' in components:
+        rows.append(basis_x)
+        rhs.append(target_x - fixed_x)
+    if 'y' in components:
+        rows.append(basis_y)
+        rhs.append(target_y - fixed_y)
+    if weights is not None:
+        root = np.sqrt(np.asarray(weights, dtype=float))
+        rows = [row * root[:, None] for row in rows]
+        rhs = [value * root for value in rhs]
+    if regularization > 0:
+        rows.append(np.sqrt(regularization) * np.eye(len(free)))
+        rhs.append(np.zeros(len(free)))
+    a = np.vstack(rows)
+    b = np.concatenate(rhs)
+
+    if bounds is None:
+        currents = np.linalg.lstsq(a, b, rcond=None)[0]
+    else:
+        lower = np.broadcast_to(np.asarray(bounds[0], dtype=float), (len(free), ))
+        upper = np.broadcast_to(np.asarray(bounds[1], dtype=float), (len(free), ))
+        currents = lsq_linear(a, b, bounds=(lower, upper)).x
+
+    new_sources = [source.__copy__() for source in sources]
+    for index, current in zip(free, currents):
+        new_sources[index].current = current
+    deviation = []
+    if 'x' in components:
+        deviation.append(basis_x @ currents + fixed_x - target_x)
+    if 'y' in components:
+        deviation.append(basis_y @ currents + fixed_y - target_y)
+    deviation = np.concatenate(deviation)
+    return {'currents': currents,
+            'sources': new_sources,
+            'free': free,
+            'rms_deviation': np.sqrt(np.mean(deviation ** 2)),
+            'max_deviation': np.max(np.abs(deviation))}
+
+
+def optimize_design(construct, x0, cell_length, cell_diameter, fidelities=DEFAULT_FIDELITIES, objective=None,
+                    method='Nelder-Mead', bounds=None, mesh_margin=0.1, memo=False):
+    """
+    Minimizes a design objective over the parameters of a construction function, raising the fidelity as the
+    optimizer converges. Every level starts from the optimum of the previous one, so the many early iterations run
+    on coarse meshes with lumped loops and low-order quadrature of RectangularCoil windings, and only the last steps
+    pay for the full resolution. Objective values are cached per level and parameter set.
+    :param construct: function of the parameters returning a list of sources or a Task, e.g. a template wrapper.
+    :param x0: starting parameters.
+    :param cell_length: cell length in mm, the mesh of every level spans the cell plus the margin.
+    :param cell_diameter: cell diameter in mm.
+    :param fidelities: levels from coarse to fine, dicts with steps (mesh nodes in x and y), lump_tolerance (None for
+    exact loops), max_order (quadrature order cap of RectangularCoil windings, None for none), fom_steps (cell
+    sampling of the default objective), tol (minimizer tolerance) and simplex (initial Nelder-Mead simplex size
+    relative to the parameters), see DEFAULT_FIDELITIES.
+    :param objective: function of a solved Task to minimize, defaults to fom_cylindrical_cell over the cell.
+    :param method: scipy.optimize.minimize method.
+    :param bounds: parameter bounds, passed to the minimizer.
+    :param mesh_margin: extra mesh span around the cell, relative to the cell size.
+    :param memo: enable the kernel memo during the run, unless it is enabled already. Off by default: every level of
+    DEFAULT_FIDELITIES has its own mesh and the windings move with the parameters, so responses are rarely found
+    again and the memo only adds its bookkeeping. It pays off for custom levels that keep a mesh and move windings
+    by whole mesh steps.
+    :return: dict with x and fun (the optimum and its objective at the finest level), levels (per level x, fun,
+    evaluations, cache hits and time in seconds) and evaluations (total Task runs).
+    """
+    x_half = cell_length / 2 * (1 + mesh_margin)
+    y_half = cell_diameter / 2 * (1 + mesh_margin)
+    memo_enabled_here = memo and kernel_memo_info() is None
+    if memo_enabled_here:
+        enable_kernel_memo()
+    x = np.atleast_1d(np.asarray(x0, dtype=float))
+    levels = []
+    try:
+        for fidelity in fidelities:
+            mesh = Mesh([-x_half, x_half], [-y_half, y_half], *fidelity['steps'])
+            fom_steps = fidelity.get('fom_steps', (51, 51))
+            cache = dict()
+            counts = {'evaluations': 0, 'hits': 0}
+
+            def evaluate(parameters):
+                key = tuple(np.round(parameters, 12))
+                if key in cache:
+                    counts['hits'] += 1
+                    return cache[key]
+                design = construct(*parameters)
+                sources = design.sources if isinstance(design, Task) else design
+                if isinstance(sources, SourceBaseClass):
+                    sources = [sources]
+                task = Task(_limit_order(sources, fidelity.get('max_order')), mesh)
+                task.run(lump_tolerance=fidelity.get('lump_tolerance'))
+                if objective is None:
+                    value = fom_cylindrical_cell(task, cell_length, cell_diameter, *fom_steps)
+                else:
+                    value = objective(task)
+                counts['evaluations'] += 1
+                cache[key] = float(value)
+                return cache[key]
+
+            options = dict()
+            if method == 'Nelder-Mead' and 'simplex' in fidelity:
+                step = fidelity['simplex'] * np.where(x != 0, np.abs(x), 1.0)
+                options['initial_simplex'] = np.vstack([x, x + np.diag(step)])
+            start = time.perf_counter()
+            result = minimize(evaluate, x, method=method, bounds=bounds, tol=fidelity.get('tol'), options=options)
+            x = np.atleast_1d(result.x)
+            levels.append({'x': x, 'fun': float(result.fun), 'evaluations': counts['evaluations'],
+                           'hits': counts['hits'], 'time': time.perf_counter() - start})
+    finally:
+        if memo_enabled_here:
+            disable_kernel_memo()
+    return {'x': x,
+            'fun': levels[-1]['fun'],
+            'levels': levels,
+            'evaluations': sum(level['evaluations'] for level in levels)}
@@ -0,0 +1,205 @@
+"""
+Execution planner for Task.run(engine='auto'). The cost of a direct run grows with loops x mesh points, and how fast
+each way of running it gets through that work depends on the machine: the vectorized kernel rate, how well threads
+scale on its cores and what a process pool costs to start. These are measured once by calibrate, kept in a JSON file,
+and plan_run picks the fastest of a single vectorized pass, row tiles on threads and a process pool, with tile size
+and worker count, from them.
+"""
+import json
+import os
+import time
+import numpy as np
+from magcoilcalc._settings import VEC_BLOCK_SIZE
+from magcoilcalc._signals import logger
+from magcoilcalc.core import Task, Mesh, LoopArray, _sources_b_field_vec, get_kernel_memo
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+# JSON file of the calibration, one per machine. Calibrations of another version or core count are measured again.
+CALIBRATION_PATH = os.environ.get('MAGCOILCALC_CALIBRATION',
+                                  os.path.join(os.path.expanduser('~'), '.magcoilcalc', 'calibration.json'))
+CALIBRATION_VERSION = 1
+# Smallest loop-point pairs per thread tile, below that the per-call overhead of the kernel dominates.
+MIN_TILE_PAIRS = 2 ** 16
+
+_calibration = None
+
+
+def _best_time(function, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _calibration_loops(count):
+    x = np.linspace(-50, 50, count)
+    return LoopArray.from_loop_list(np.stack([x, np.full(count, 60.0), np.ones(count)], axis=-1))
+
+
+def _pool_startup(processes):
+    with multiprocessing.Pool(processes=processes) as pool:
+        pool.map(abs, range(processes))
+
+
+def calibrate(path=None):
+    """
+    Measures the execution speeds the planner needs and saves them. Takes a few seconds.
+    :param path: JSON file to write, defaults to CALIBRATION_PATH. None of the file system is touched if False.
+    :return: dict with cpu_count, vector_time (seconds per loop-point pair of the vectorized kernel), vector_overhead
+    (seconds per kernel call), thread_speedup (threads -> speedup over one thread), process_startup (seconds to start
+    a pool of 2), mp_point_time and mp_pair_time (seconds per point and per loop-point pair of a worker process).
+    """
+    global _calibration
+    cpu_count = os.cpu_count() or 1
+    sources = [_calibration_loops(128)]
+    x = np.linspace(-40, 40, 4096)
+    y = np.full(x.size, 10.0)
+    vector_time = _best_time(lambda: _sources_b_field_vec(sources, x, y)) / (128 * x.size)
+    vector_overhead = _best_time(lambda: _sources_b_field_vec(sources[:1], x[:1], y[:1]), 20)
+
+    mesh = Mesh([-40, 40], [-20, 20], 129, 65)
+
+    def timed_run(**kwargs):
+        task = Task(sources, mesh)
+        return _best_time(lambda: (setattr(task, 'done', False), task.run(**kwargs)), 2)
+
+    thread_speedup = {1: 1.0}
+    if cpu_count > 1:
+        single = timed_run()
+        for threads in sorted({2, cpu_count}):
+            thread_speedup[threads] = single / timed_run(threads=threads)
+
+    process_startup = None
+    if multiprocessing is not None and cpu_count > 1:
+        process_startup = _best_time(lambda: _pool_startup(2), 2)
+    x_mesh, y_mesh = mesh.get_matrix()
+    points = [(i, j) for i in range(2) for j in range(128)]
+    times = []
+    for count in (16, 256):
+        loops = _calibration_loops(count).get_loop_list()
+        times.append(_best_time(lambda: Task._mp_process_run(points, x_mesh, y_mesh, loops), 2) / len(points))
+    mp_pair_time = max(times[1] - times[0], 0.0) / (256 - 16)
+    mp_point_time = max(times[0] - 16 * mp_pair_time, 0.0)
+
+    calibration = {'version': CALIBRATION_VERSION,
+                   'cpu_count': cpu_count,
+                   'vector_time': vector_time,
+                   'vector_overhead': vector_overhead,
+                   'thread_speedup': thread_speedup,
+                   'process_startup': process_startup,
+                   'mp_point_time': mp_point_time,
+                   'mp_pair_time': mp_pair_time,
+                   'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+    if path is not False:
+        path = CALIBRATION_PATH if path is None else path
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as file:
+                json.dump(calibration, file, indent=2)
+        except OSError as error:
+            logger.log_event("Planner: calibration not saved, %s" % error)
+    _calibration = (path, calibration)
+    return calibration
+
+
+def load_calibration(path=None, recalibrate=False):
+    """
+    Calibration of this machine, read from the file when it exists and matches, measured and saved otherwise. Kept
+    in memory after the first call.
+    :param path: JSON file, defaults to CALIBRATION_PATH.
+    :param recalibrate: measure again even if a calibration exists.
+    :return: dict, see calibrate.
+    """
+    global _calibration
+    path = CALIBRATION_PATH if path is None else path
+    if not recalibrate:
+        if _calibration is not None and _calibration[0] == path:
+            return _calibration[1]
+        try:
+            with open(path) as file:
+                calibration = json.load(file)
+            calibration['thread_speedup'] = {int(k): v for k, v in calibration['thread_speedup'].items()}
+            if calibration.get('version') == CALIBRATION_VERSION and calibration['cpu_count'] == os.cpu_count():
+                _calibration = (path, calibration)
+                return calibration
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+    return calibrate(path)
+
+
+def _thread_speedup(calibration, threads):
+    """
+    Speedup of a number of threads, interpolated between the measured counts.
+    """
+    measured = sorted(calibration['thread_speedup'].items())
+    counts = [count for count, _ in measured]
+    speedups = [speedup for _, speedup in measured]
+    return float(np.interp(threads, counts, speedups))
+
+
+def _loop_count(sources):
+    """
+    :return: number of loops (sources without a loop list count as one), whether every source has a loop list.
+    """
+    count = 0
+    all_loops = True
+    for source in sources:
+        try:
+            count += len(source.get_loop_list())
+        except AttributeError:
+            count += 1
+            all_loops = False
+    return count, all_loops
+
+
+def plan_run(mesh, sources, calibration=None):
+    """
+    Picks how a direct run of sources on a mesh is executed. The estimates are: one vectorized pass takes
+    pairs * vector_time plus vector_overhead per kernel block; threads divide that by their measured speedup, with
+    row tiles of at least MIN_TILE_PAIRS pairs and about 4 tiles per thread; a pool of n processes takes its startup
+    time plus points * (mp_point_time + loops * mp_pair_time) / n. Runs with the kernel memo enabled stay in a single
+    pass, which uses the memo.
+    :param mesh: Mesh.
+    :param sources: list of sources.
+    :param calibration: calibration dict, see calibrate. Loaded with load_calibration if None.
+    :return: dict with processes, threads and tile_rows to run with, estimate (seconds) and estimates (seconds per
+    option tried, keyed by 'vectorized', 'threads-n' and 'processes-n').
+    """
+    if calibration is None:
+        calibration = load_calibration()
+    loops, all_loops = _loop_count(sources)
+    rows, columns = mesh.y_steps, mesh.x_steps
+    mask = mesh.mask
+    points = rows * columns if mask is None else int(np.count_nonzero(mask))
+    pairs = loops * points
+    single = pairs * calibration['vector_time'] + \
+        np.ceil(pairs / VEC_BLOCK_SIZE) * calibration['vector_overhead']
+    estimates = {'vectorized': single}
+    options = {'vectorized': (1, 1, None)}
+    if get_kernel_memo() is None:
+        for threads in range(2, calibration['cpu_count'] + 1):
+            tile_rows = max(-(-rows // (4 * threads)), -(-MIN_TILE_PAIRS // max(loops * columns, 1)))
+            tiles = -(-rows // tile_rows)
+            # with fewer tiles than threads the extra threads idle.
+            busy = min(threads, tiles)
+            key = 'threads-%d' % threads
+            estimates[key] = single / _thread_speedup(calibration, busy) + tiles * calibration['vector_overhead']
+            options[key] = (1, threads, tile_rows)
+        if all_loops and calibration.get('process_startup') is not None and multiprocessing is not None:
+            for processes in range(2, calibration['cpu_count'] + 1):
+                key = 'processes-%d' % processes
+                estimates[key] = calibration['process_startup'] * processes / 2 + \
+                    points * (calibration['mp_point_time'] + loops * calibration['mp_pair_time']) / processes
+                options[key] = (processes, 1, None)
+    best = min(estimates, key=estimates.get)
+    processes, threads, tile_rows = options[best]
+    return {'processes': processes,
+            'threads': threads,
+            'tile_rows': tile_rows,
+            'estimate': estimates[best],
+            'estimates': estimates}
@@ -1,6 +1,6 @@
 import matplotlib.pyplot as plt
 import numpy as np
-from magcoilcalc.core import Task, CurrentLoop, Mesh
+from magcoilcalc.core import Task, CurrentLoop, Mesh, RectilinearMesh
 from matplotlib.pyplot import Rectangle
 from magcoilcalc.calculations import find_gradient
 from matplotlib.colors import LogNorm, Normalize
@@ -17,11 +17,61 @@ def draw_cell_boundary(ax, width, height, x_offset=0, y_offset=0):
 def draw_mesh_boundary(mesh: Mesh, ax):
     width = mesh.x_range[1] - mesh.x_range[0]
     height = mesh.y_range[1] - mesh.y_range[0]
-    r = Rectangle((-width/2, -height/2), width, height,
+    r = Rectangle((mesh.x_range[0], mesh.y_range[0]), width, height,
                   fill=False, linewidth=0.5, edgecolor='black', linestyle='--', zorder=20)
     ax.add_artist(r)
 
 
+def _decimation(mesh: Mesh, max_cells=None):
+    """
+    Node stride keeping a drawn field map under max_cells cells.
+    :return: int, 1 without decimation.
+    """
+    if max_cells is None or mesh.x_steps * mesh.y_steps <= max_cells:
+        return 1
+    return int(np.ceil(np.sqrt(mesh.x_steps * mesh.y_steps / max_cells)))
+
+
+def draw_field_map(ax, mesh: Mesh, field, max_cells=None, centered=True, **kwargs):
+    """
+    Draws a field sampled on the mesh nodes with one colored cell per node, as pcolor does, but as a single image
+    (uniform meshes) or quad mesh (rectilinear meshes).
+    :param ax: matplotlib axes.
+    :param mesh: Mesh the field is sampled on.
+    :param field: (y_steps, x_steps) array.
+    :param max_cells: draw every n-th node only, so that at most this many cells are drawn. None draws all.
+    :param centered: cells centered on the nodes, as pcolor on the pixel bounds. If False, every cell spans from its
+    node to the next one and the last row and column are left out, as pcolor on the node coordinates.
+    :param kwargs: passed to imshow or pcolormesh, e.g. norm and cmap.
+    :return: AxesImage or QuadMesh.
+    """
+    stride = _decimation(mesh, max_cells)
+    x = mesh.x_linspace[::stride]
+    y = mesh.y_linspace[::stride]
+    field = np.asarray(field)[::stride, ::stride]
+    if centered:
+        x_edges = RectilinearMesh._edges(x) if x.size > 1 else x + [-0.5, 0.5]
+        y_edges = RectilinearMesh._edges(y) if y.size > 1 else y + [-0.5, 0.5]
+    else:
+        x_edges, y_edges, field = x, y, field[:-1, :-1]
+    if mesh.is_uniform:
+        return ax.imshow(field, extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]),
+                         origin='lower', interpolation='nearest', aspect='auto', **kwargs)
+    return ax.pcolormesh(x_edges, y_edges, field, **kwargs)
+
+
+def _region_mesh(cal: Task, region=None):
+    """
+    Mesh of the nodes inside a region of a task.
+    :param region: ((x_min, x_max), (y_min, y_max)) in mm, None for the whole mesh.
+    :return: Mesh.
+    """
+    if region is None:
+        return cal.mesh
+    rows, columns = cal.region_slices(*region)
+    return RectilinearMesh(cal.mesh.x_linspace[columns], cal.mesh.y_linspace[rows])
+
+
 def draw_source(ax, source: CurrentLoop):
     source.draw_source(ax)
     # c1 = np.asarray(source.get_loop_list())
@@ -44,7 +94,8 @@ def draw_source(ax, source: CurrentLoop):
 
 
 def draw_normalized_gradient(cal: Task, cmap='inferno', norm=None, field_axis='y', gradient_axes='xyt', vmin=0.0001,
-                             vmax=0.01, ax=None, colorbar=True, cell_length=100, cell_diameter=60):
+                             vmax=0.01, ax=None, colorbar=True, cell_length=100, cell_diameter=60, max_cells=None,
+                             region=None):
     if norm is None:
         norm = LogNorm(vmin=vmin, vmax=vmax)
 
@@ -54,12 +105,17 @@ def draw_normalized_gradient(cal: Task, cmap='inferno', norm=None, field_axis='y
         f = ax.figure
     for source in cal.sources:
         draw_source(ax, source)
-    gradient = find_gradient(cal, lat_field_axis=field_axis, gradient_axes=gradient_axes) / cal.center_field[0]
-    contour_plot = ax.contour(cal.x_mesh, cal.y_mesh, np.abs(gradient), [2e-4, 5e-4, 1e-3, 2e-3, 0.005],
+    gradient = find_gradient(cal, lat_field_axis=field_axis, gradient_axes=gradient_axes, region=region) / \
+        cal.center_field[0]
+    mesh = _region_mesh(cal, region)
+    x_mesh, y_mesh = mesh.get_matrix()
+    stride = _decimation(mesh, max_cells)
+    contour_plot = ax.contour(x_mesh[::stride, ::stride], y_mesh[::stride, ::stride],
+                              np.abs(gradient[::stride, ::stride]), [2e-4, 5e-4, 1e-3, 2e-3, 0.005],
                               colors='w', zorder=10)
     # to avoid values smaller than vmin not being able to render
     gradient[gradient < norm.vmin] = norm.vmin
-    color_plot = ax.pcolor(cal.x_pixel_bounds, cal.y_pixel_bounds, np.abs(gradient), norm=norm, cmap=cmap)
+    color_plot = draw_field_map(ax, mesh, np.abs(gradient), max_cells, norm=norm, cmap=cmap)
     ax.clabel(contour_plot, fontsize=10, inline=1, fmt='%.4f')
     ax.axis('equal')
     draw_cell_boundary(ax, cell_length, cell_diameter)
@@ -77,7 +133,8 @@ def draw_normalized_gradient(cal: Task, cmap='inferno', norm=None, field_axis='y
 
 
 def draw_intensity(cal: Task, cmap='inferno', norm=None, field_axis='x', vmin=0.98,
-                             vmax=1.02, ax=None, colorbar=True, cell_length=100, cell_diameter=60):
+                             vmax=1.02, ax=None, colorbar=True, cell_length=100, cell_diameter=60, max_cells=None,
+                             region=None):
     if norm is None:
         norm = Normalize()
     if ax is None:
@@ -86,16 +143,18 @@ def draw_intensity(cal: Task, cmap='inferno', norm=None, field_axis='x', vmin=0.
         f = ax.figure
     for source in cal.sources:
         draw_source(ax, source)
-    if field_axis == 'x':
-        field = cal.x_field
-    elif field_axis == 'y':
-        field = cal.y_field
-    else:
+    if field_axis not in ('x', 'y'):
         raise ValueError("Intensity plot: only x or y accepted for field axis, got %s " % field_axis)
+    if region is None:
+        x_field, y_field = cal.x_field, cal.y_field
+    else:
+        _, _, x_field, y_field = cal.field_region(*region)
+    field = x_field if field_axis == 'x' else y_field
     norm.vmin = cal.center_field[0] * vmin
     norm.vmax = cal.center_field[0] * vmax
 
-    color_plot = ax.pcolor(cal.x_mesh, cal.y_mesh, field, norm=norm, cmap=cmap)
+    color_plot = draw_field_map(ax, _region_mesh(cal, region), field, max_cells, centered=False, norm=norm,
+                                cmap=cmap)
     ax.axis('equal')
     draw_cell_boundary(ax, cell_length, cell_diameter)
     draw_mesh_boundary(cal.mesh, ax)
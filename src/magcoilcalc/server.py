@@ -0,0 +1,224 @@
+"""
+Long-running evaluation service on localhost. Designs use the record format of magcoilcalc.batch and requests are
+JSON objects POSTed to:
+    /solve  {"design": {...}, "mesh": {...}, "fields": false}  -> center field, and the field maps if fields is true
+    /probe  {"design": {...}, "mesh": {...}, "points": [[x, y], ...]}  -> bx, by at the points
+    /fom    {"design": {...}, "mesh": {...}, "cell": [length, diameter]}  -> fom and center field
+GET /status returns cache statistics. A mesh is {"x_range": [x1, x2], "y_range": [y1, y2], "steps": [nx, ny]}, the
+server default is used when it is left out.
+"""
+import argparse
+import hashlib
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+from magcoilcalc.batch import build_sources
+from magcoilcalc.core import Mesh, Task, _sources_b_field_vec, _circuit_current
+from magcoilcalc.calculations import fom_cylindrical_cell
+from magcoilcalc._memo import _LRUCache
+
+
+class EvaluationService(object):
+    def __init__(self, mesh=None, workers=4, cache_bytes=512 * 2 ** 20, mesh_cache_bytes=64 * 2 ** 20):
+        """
+        Keeps meshes, per-source unit-current field maps and solved tasks cached between requests. A design is
+        assembled from the cached field maps of its sources scaled by their currents, so designs that share
+        sources, or only change currents, reuse earlier work. Solved tasks are only ever read once published.
+        :param mesh: default Mesh for requests without one.
+        :param workers: threads computing the field maps of new sources.
+        :param cache_bytes: memory budget shared by the field map and task caches, in bytes.
+        :param mesh_cache_bytes: memory budget of the mesh cache (node coordinate matrices), in bytes. Field maps of
+        an evicted mesh are found again once it is requested again.
+        """
+        self.default_mesh = mesh if mesh is not None else Mesh([-100, 100], [-50, 50], 51, 31)
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._meshes = _LRUCache(mesh_cache_bytes)
+        self._mesh_lock = threading.Lock()
+        self._bases = _LRUCache(cache_bytes / 2)
+        self._tasks = _LRUCache(cache_bytes / 2)
+
+    def close(self):
+        self._pool.shutdown()
+
+    def _mesh(self, spec):
+        """
+        :return: (key, mesh, x_mesh, y_mesh), cached per mesh spec.
+        """
+        if spec is None:
+            mesh = self.default_mesh
+            spec = {'x_range': mesh.x_range, 'y_range': mesh.y_range, 'steps': [mesh.x_steps, mesh.y_steps]}
+        key = json.dumps([list(map(float, spec['x_range'])), list(map(float, spec['y_range'])),
+                          list(map(int, spec['steps']))])
+        with self._mesh_lock:
+            entry = self._meshes.get(key)
+            if entry is None:
+                mesh = Mesh(spec['x_range'], spec['y_range'], int(spec['steps'][0]), int(spec['steps'][1]))
+                entry = (key, mesh) + tuple(mesh.get_matrix())
+                self._meshes.put(key, entry, entry[2].nbytes + entry[3].nbytes)
+            return entry
+
+    @staticmethod
+    def _unit_source(source):
+        """
+        :return: (copy of the source at unit circuit current, circuit current, cache key or None)
+        """
+        unit = source.__copy__()
+        current = _circuit_current(source)
+        if getattr(source, 'current', None) is not None and np.ndim(source.current) == 0:
+            unit.current = 1.0
+        try:
+            loops = np.ascontiguousarray(unit.get_loop_list(), dtype=float)
+        except AttributeError:
+            return unit, current, None
+        digest = hashlib.sha1(loops.tobytes())
+        digest.update(repr((type(source).__name__, getattr(source, 'tolerance', None),
+                            getattr(source, 'max_order', None))).encode())
+        return unit, current, digest.hexdigest()
+
+    def _basis(self, source, mesh_entry):
+        mesh_key, _, x_mesh, y_mesh = mesh_entry
+        unit, current, key = self._unit_source(source)
+        basis = None if key is None else self._bases.get((mesh_key, key))
+        if basis is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                basis = _sources_b_field_vec([unit], x_mesh, y_mesh)
+            if key is not None:
+                self._bases.put((mesh_key, key), basis, basis[0].nbytes * 2)
+        return current, basis
+
+    def task(self, design, mesh_spec=None):
+        """
+        Solved task of a design, from the cache if the same design was solved on the same mesh before.
+        :param design: design record, see magcoilcalc.batch.build_sources.
+        :param mesh_spec: mesh dict, or None for the default mesh.
+        :return: solved Task, not to be modified.
+        """
+        mesh_entry = self._mesh(mesh_spec)
+        key = (mesh_entry[0], json.dumps(design, sort_keys=True))
+        task = self._tasks.get(key)
+        if task is not None:
+            return task
+        sources = build_sources(design)
+        futures = [self._pool.submit(self._basis, source, mesh_entry) for source in sources]
+        x_field = np.zeros(mesh_entry[2].shape)
+        y_field = np.zeros(mesh_entry[2].shape)
+        for future in futures:
+            current, (bx, by) = future.result()
+            x_field += current * bx
+            y_field += current * by
+        task = Task(sources, mesh_entry[1])
+        task._store_fields(x_field, y_field)
+        # build the lazy members before publishing, so that readers never write to a shared task.
+        _ = task.center_field
+        task._get_field_interpolator()
+        self._tasks.put(key, task, x_field.nbytes * 2)
+        return task
+
+    def solve(self, design, mesh=None, fields=False):
+        task = self.task(design, mesh)
+        result = {'center_field': [float(component[0]) for component in task.center_field]}
+        if fields:
+            result['x_field'] = task.x_field.tolist()
+            result['y_field'] = task.y_field.tolist()
+        return result
+
+    def probe(self, design, points, mesh=None):
+        bx, by = self.task(design, mesh).field_at(np.asarray(points, dtype=float).reshape(-1, 2))
+        return {'bx': bx.tolist(), 'by': by.tolist()}
+
+    def fom(self, design, cell, mesh=None):
+        task = self.task(design, mesh)
+        return {'fom': float(fom_cylindrical_cell(task, cell[0], cell[1])),
+                'center_field': [float(component[0]) for component in task.center_field]}
+
+    def status(self):
+        return {'meshes': {'entries': len(self._meshes), 'bytes': self._meshes.nbytes, 'hits': self._meshes.hits,
+                           'misses': self._meshes.misses},
+                'bases': {'entries': len(self._bases), 'bytes': self._bases.nbytes, 'hits': self._bases.hits,
+                          'misses': self._bases.misses},
+                'tasks': {'entries': len(self._tasks), 'bytes': self._tasks.nbytes, 'hits': self._tasks.hits,
+                          'misses': self._tasks.misses}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._reply(200, self.service.status())
+        else:
+            self._reply(404, {'error': "unknown path %s" % self.path})
+
+    def do_POST(self):
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            design, mesh = request['design'], request.get('mesh')
+            if self.path == '/solve':
+                result = self.service.solve(design, mesh, request.get('fields', False))
+            elif self.path == '/probe':
+                result = self.service.probe(design, request['points'], mesh)
+            elif self.path == '/fom':
+                result = self.service.fom(design, request['cell'], mesh)
+            else:
+                self._reply(404, {'error': "unknown path %s" % self.path})
+                return
+        except Exception as e:
+            self._reply(400, {'error': "%s: %s" % (type(e).__name__, e)})
+            return
+        self._reply(200, result)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=8765):
+    """
+    HTTP server answering requests with the given service, one thread per request.
+    :param service: EvaluationService.
+    :param host: interface to bind, localhost by default.
+    :param port: port, 0 for any free port.
+    :return: ThreadingHTTPServer, start it with serve_forever().
+    """
+    handler = type('Handler', (_Handler, ), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='magcoilcalc-server', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--cache-mb', type=float, default=512)
+    parser.add_argument('--mesh-cache-mb', type=float, default=64)
+    parser.add_argument('--x-range', nargs=2, type=float, default=[-100, 100], metavar=('X1', 'X2'))
+    parser.add_argument('--y-range', nargs=2, type=float, default=[-50, 50], metavar=('Y1', 'Y2'))
+    parser.add_argument('--steps', nargs=2, type=int, default=[51, 31], metavar=('NX', 'NY'))
+    args = parser.parse_args(argv)
+    service = EvaluationService(Mesh(args.x_range, args.y_range, args.steps[0], args.steps[1]), args.workers,
+                                int(args.cache_mb * 2 ** 20), int(args.mesh_cache_mb * 2 ** 20))
+    server = make_server(service, args.host, args.port)
+    print("magcoilcalc server listening on %s:%d" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from magcoilcalc.core import CurrentLoop
+from magcoilcalc.core import CurrentLoop, RectangularCoil
 
 
 def compensated_solenoid(length=300, d0=200, turns_main=420, turns_comp=63, wire_diameter=0.66, layers_main=1,
@@ -24,7 +24,7 @@ def compensated_solenoid(length=300, d0=200, turns_main=420, turns_comp=63, wire
     return [mag_0, mag_left, mag_right]
 
 
-def helmholtz_coil(r=300, coil_width=20.0, coil_thickness=5.0, current=1, turns=300):
+def helmholtz_coil(r=300, coil_width=20.0, coil_thickness=5.0, current=1, turns=300, quadrature=False):
     """
     Constructs a Helmholtz coil pair. Only 9 turns of current is actually simulated, with current scaled accordingly.
     :param r: Radius of coil.
@@ -32,9 +32,14 @@ def helmholtz_coil(r=300, coil_width=20.0, coil_thickness=5.0, current=1, turns=
     :param coil_thickness: Thickness of coil winding.
     :param current: Current fed to coils.
     :param turns: Number of turns on each coil.
+    :param quadrature: Integrate each winding pack as a RectangularCoil instead of using 9 loops.
     :return: A list of magnets
     """
     dr = coil_width / 2
+    if quadrature:
+        radius = [r - coil_thickness / 2, r + coil_thickness / 2]
+        return [RectangularCoil([-r / 2 - dr, -r / 2 + dr], radius, turns, current),
+                RectangularCoil([r / 2 - dr, r / 2 + dr], radius, turns, current)]
     mag_0 = CurrentLoop([-r / 2 - dr, -r / 2 + dr], r - coil_thickness / 2, 9, current * turns / 9, 3, coil_thickness / 2)
     mag_1 = CurrentLoop([r / 2 - dr, r / 2 + dr], r - coil_thickness / 2, 9, current * turns / 9, 3, coil_thickness / 2)
 
@@ -42,7 +47,7 @@ def helmholtz_coil(r=300, coil_width=20.0, coil_thickness=5.0, current=1, turns=
 
 
 def three_coils(half_length=259.8, r_side=300, r_center=300, coil_width=20.0, coil_thickness=5.0, current=1, turns_side=300,
-                turns_center=180):
+                turns_center=180, quadrature=False):
     """
     Constructs a coil group with two identical side coils and one center coil with the same bobbin diameter.
     Each coil is simplified into 9 current loops to accelerate calculation.
@@ -54,8 +59,15 @@ def three_coils(half_length=259.8, r_side=300, r_center=300, coil_width=20.0, co
     :param current: Current to be fed into the coils. All 3 coils have the same current.
     :param turns_side: Winding turns on the side coils.
     :param turns_center: Winding turns on the center coil.
+    :param quadrature: Integrate each winding pack as a RectangularCoil instead of using 9 loops.
     :return: A list of sources
     """
+    if quadrature:
+        dr = coil_width / 2
+        side_radius = [r_side, r_side + coil_thickness]
+        return [RectangularCoil([-half_length - dr, -half_length + dr], side_radius, turns_side, current),
+                RectangularCoil([half_length - dr, half_length + dr], side_radius, turns_side, current),
+                RectangularCoil([-dr, dr], [r_center, r_center + coil_thickness], turns_center, current)]
     current_side_sim = current * turns_side / 9
     current_center_sim = current * turns_center / 9
     mag1 = CurrentLoop([-half_length - coil_width / 2, -half_length + coil_width / 2], r_side, 9, current_side_sim, 3, coil_thickness / 2)
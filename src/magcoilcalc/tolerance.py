@@ -0,0 +1,162 @@
+import numpy as np
+from scipy.stats import norm
+import magcoilcalc._off_axis_loop as loop_calculator
+from magcoilcalc._settings import VEC_BLOCK_SIZE
+from magcoilcalc.core import Task, SourceBaseClass, CurrentLoop
+from magcoilcalc.calculations import lateral_gradient, gradient_fom
+
+
+def _loop_tables(sources):
+    """
+    Stacks the loops of every source.
+    :return: (loops (L, 3), source index (L, ), layer index (L, ))
+    """
+    loop_lists, source_index, layer_index = [], [], []
+    for index, source in enumerate(sources):
+        try:
+            loops = np.asarray(source.get_loop_list(), dtype=float).reshape(-1, 3)
+        except AttributeError:
+            raise TypeError("Tolerance analysis: all sources have to provide loop lists, got %s."
+                            % type(source).__name__)
+        loop_lists.append(loops)
+        source_index.append(np.full(len(loops), index))
+        if isinstance(source, CurrentLoop):
+            layer_index.append(source.get_layer_index())
+        else:
+            layer_index.append(np.zeros(len(loops), dtype=int))
+    return np.vstack(loop_lists), np.concatenate(source_index), np.concatenate(layer_index)
+
+
+def _batched_loops_b_field(loops, x, y):
+    """
+    Field of many loop tables on the same points, with samples, points and loops broadcast together in blocks of at
+    most VEC_BLOCK_SIZE elements.
+    :param loops: (S, L, 3) array of [x, r, current] per sample, x and r in mm, current in amps.
+    :param x: (P, ) x coordinates in mm.
+    :param y: (P, ) y coordinates in mm.
+    :return: x and y fields in Tesla, (S, P) arrays.
+    """
+    samples, count = loops.shape[:2]
+    bx = np.zeros((samples, x.size))
+    by = np.zeros((samples, x.size))
+    sample_block = max(1, VEC_BLOCK_SIZE // max(x.size * count, 1))
+    loop_block = max(1, VEC_BLOCK_SIZE // max(x.size * sample_block, 1))
+    for s in range(0, samples, sample_block):
+        for start in range(0, count, loop_block):
+            chunk = loops[s: s + sample_block, start: start + loop_block]
+            current, a, dx, r = np.broadcast_arrays(chunk[:, None, :, 2], chunk[:, None, :, 1] / 1000,
+                                                    (x[None, :, None] - chunk[:, None, :, 0]) / 1000,
+                                                    y[None, :, None] / 1000)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                bx[s: s + sample_block] += np.sum(loop_calculator.field_axial(current, a, dx, r), axis=-1)
+                by[s: s + sample_block] += np.sum(loop_calculator.field_radial(current, a, dx, r), axis=-1)
+    return bx, by
+
+
+def _summary(values, confidence):
+    z = norm.ppf(0.5 + confidence / 2)
+    mean = np.mean(values)
+    std = np.std(values, ddof=1)
+    half_width = z * std / np.sqrt(len(values))
+    return {'mean': mean,
+            'std': std,
+            'mean_interval': (mean - half_width, mean + half_width),
+            'interval': tuple(np.percentile(values, [50 * (1 - confidence), 50 * (1 + confidence)]))}
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """
+    Wilson score interval of a binomial proportion, which stays inside [0, 1] and behaves for proportions near 0
+    and 1.
+    :return: (lower, upper)
+    """
+    z = norm.ppf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (p + z ** 2 / (2 * trials)) / denominator
+    half_width = z / denominator * np.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2))
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def tolerance_analysis(sources, length, diameter, samples=1000, position_sigma=0.0, radius_sigma=0.0,
+                       layer_thickness_sigma=0.0, current_ripple=0.0, fom_limit=None, confidence=0.95, xsteps=51,
+                       ysteps=26, seed=None, sample_block=64):
+    """
+    Monte Carlo analysis of winding errors. The loop tables of the sources are perturbed in bulk, each sample block
+    is evaluated on the cell points in batched kernel calls, and the center field and FOM of every sample are kept.
+    Errors are normal with the given standard deviations: every turn is displaced along x on its own, while radius,
+    layer thickness and current errors are shared by all turns of a source.
+    :param sources: list of sources providing loop lists, or a Task whose sources are used.
+    :param length: cell length in mm.
+    :param diameter: cell diameter in mm.
+    :param samples: number of perturbed designs, at least 2.
+    :param position_sigma: turn position error along x, mm.
+    :param radius_sigma: former radius error of each source, mm.
+    :param layer_thickness_sigma: layer thickness error of each source, mm, grows with the layer index.
+    :param current_ripple: relative current error of each source.
+    :param fom_limit: designs with a FOM up to this value pass, for the yield. No yield if None.
+    :param confidence: confidence level of the intervals.
+    :param xsteps: grid points along the cell length.
+    :param ysteps: grid points along the cell radius, from the axis to diameter / 2.
+    :param seed: seed of the random generator.
+    :param sample_block: samples perturbed and evaluated together.
+    :return: dict with center_field and fom (arrays over the samples), nominal (center_field and fom of the
+    unperturbed sources), summary (mean, std, mean_interval and percentile interval of each), and yield with
+    yield_interval (Wilson score interval) if fom_limit is given.
+    """
+    if isinstance(sources, Task):
+        sources = sources.sources
+    if isinstance(sources, SourceBaseClass):
+        sources = [sources]
+    if samples < 2:
+        raise ValueError("Tolerance analysis: at least 2 samples required.")
+    loops, source_index, layer_index = _loop_tables(sources)
+    rng = np.random.default_rng(seed)
+    radius_error = rng.normal(0, radius_sigma, (samples, len(sources))) if radius_sigma else None
+    thickness_error = rng.normal(0, layer_thickness_sigma, (samples, len(sources))) if layer_thickness_sigma \
+        else None
+    current_error = rng.normal(0, current_ripple, (samples, len(sources))) if current_ripple else None
+
+    # cell grid in the half plane with one halo node on every side, so that gradients are central differences.
+    dx = length / (xsteps - 1)
+    dr = diameter / 2 / (ysteps - 1)
+    x = np.linspace(-length / 2 - dx, length / 2 + dx, xsteps + 2)
+    r = np.arange(-1, ysteps + 1) * dr
+    x_mesh, r_mesh = np.meshgrid(x, r)
+    # the origin comes first, for the center field.
+    x_points = np.concatenate([[0.0], x_mesh.ravel()])
+    y_points = np.concatenate([[0.0], r_mesh.ravel()])
+    weights = np.abs(r[1:-1, None])
+
+    def evaluate(tables):
+        bx, by = _batched_loops_b_field(tables, x_points, y_points)
+        b0 = bx[:, 0]
+        by = by[:, 1:].reshape(-1, r.size, x.size)
+        g = lateral_gradient(by, x, r)[:, 1:-1, 1:-1] / b0[:, None, None]
+        return b0, gradient_fom(g, weights, axis=(1, 2))
+
+    nominal_center, nominal_fom = evaluate(loops[None])
+    center_field = np.zeros(samples)
+    fom = np.zeros(samples)
+    for start in range(0, samples, sample_block):
+        block = slice(start, min(start + sample_block, samples))
+        tables = np.repeat(loops[None], block.stop - block.start, axis=0)
+        if position_sigma:
+            tables[:, :, 0] += rng.normal(0, position_sigma, tables.shape[:2])
+        if radius_error is not None:
+            tables[:, :, 1] += radius_error[block][:, source_index]
+        if thickness_error is not None:
+            tables[:, :, 1] += thickness_error[block][:, source_index] * layer_index
+        if current_error is not None:
+            tables[:, :, 2] *= 1 + current_error[block][:, source_index]
+        center_field[block], fom[block] = evaluate(tables)
+
+    result = {'center_field': center_field,
+              'fom': fom,
+              'nominal': {'center_field': nominal_center[0], 'fom': nominal_fom[0]},
+              'summary': {'center_field': _summary(center_field, confidence), 'fom': _summary(fom, confidence)}}
+    if fom_limit is not None:
+        passed = int(np.sum(fom <= fom_limit))
+        result['yield'] = passed / samples
+        result['yield_interval'] = wilson_interval(passed, samples, confidence)
+    return result
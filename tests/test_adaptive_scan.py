@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from magcoilcalc.calculations import adaptive_parameter_scan, parameter_scan
+
+
+def test_adaptive_scan_2d():
+    calls = []
+
+    def fom(x, y):
+        calls.append((x, y))
+        return np.hypot(x - 0.31, y + 0.22) + 0.2 * np.tanh((x + 0.5) * 20)
+
+    result = adaptive_parameter_scan(fom, (-1, 1, 41), (-1, 1, 31), budget=80)
+    assert len(calls) == 80 and result['points'].shape == (80, 2)
+    full, xg, yg = parameter_scan(fom, (-1, 1, 41), (-1, 1, 31))
+    assert result['fom'].shape == full.shape and np.allclose(result['grids'][0], xg)
+    point, value = result['best']
+    assert np.hypot(point[0] - 0.31, point[1] + 0.22) < 0.05
+    assert value <= np.min(full) + 0.05
+    assert np.max(np.abs(result['fom'] - full)) < 0.2
+
+
+def test_adaptive_scan_1d_3d():
+    result = adaptive_parameter_scan(lambda x: (x - 2.3) ** 2, (0, 5, 101), budget=25)
+    assert abs(result['best'][0][0] - 2.3) < 0.05
+    assert result['fom'].shape == (101, )
+    result = adaptive_parameter_scan(lambda x, y, z: (x - 0.5) ** 2 + y ** 2 + (z - 0.2) ** 2, (0, 1, 5), (-1, 1, 6),
+                                     (0, 1, 7), budget=40, initial=3)
+    assert result['fom'].shape == (7, 6, 5)
+    assert not np.any(np.isnan(result['fom']))
+    with pytest.raises(ValueError):
+        adaptive_parameter_scan(lambda x: x, (0, 1, 5), budget=3)
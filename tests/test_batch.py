@@ -0,0 +1,39 @@
+import json
+import magcoilcalc
+import magcoilcalc.batch
+
+
+def write_designs(path):
+    designs = [{'id': 'helmholtz', 'template': 'helmholtz_coil', 'params': {'r': 250}},
+               {'id': 'loops', 'loops': [[-50, 100, 1.0], [50, 100, 1.0]]},
+               {'sources': [{'x_span': [-60, 60], 'radius': 80, 'nturns': 40, 'current': 1.0, 'layers': 2}]},
+               {'id': 'bad', 'template': 'no_such_template'}]
+    with open(path, 'w') as f:
+        for design in designs:
+            f.write(json.dumps(design) + '\n')
+        f.write('\n{not json\n')
+
+
+def test_batch_main(tmp_path):
+    write_designs(tmp_path / 'designs.jsonl')
+    magcoilcalc.batch.main([str(tmp_path / 'designs.jsonl'), '-o', str(tmp_path / 'results.jsonl'),
+                            '--steps', '21', '11', '--cell', '100', '60'])
+    results = [json.loads(line) for line in open(tmp_path / 'results.jsonl')]
+    assert [r['id'] for r in results] == ['helmholtz', 'loops', 'line 3', 'bad', 'line 6']
+    assert results[0]['center_field'][0] > 0
+    assert results[0]['fom'] > 0
+    assert set(results[1]['timings']) == {'build', 'solve', 'fom'}
+    assert 'error' in results[3]
+    assert 'error' in results[4]
+
+
+def test_batch_processes():
+    mesh = magcoilcalc.Mesh([-100, 100], [-50, 50], 11, 11)
+    records = [{'id': i, 'template': 'helmholtz_coil', 'params': {'r': 200 + i}} for i in range(6)]
+    serial = list(magcoilcalc.batch.run_batch(records, mesh, 100, 60))
+    ordered = list(magcoilcalc.batch.run_batch(iter(records), mesh, 100, 60, processes=2, max_pending=2))
+    unordered = list(magcoilcalc.batch.run_batch(iter(records), mesh, processes=2, ordered=False))
+    assert [r['center_field'] for r in ordered] == [r['center_field'] for r in serial]
+    assert [r['fom'] for r in ordered] == [r['fom'] for r in serial]
+    assert all(r['fom'] is None for r in unordered)
+    assert sorted(r['id'] for r in unordered) == list(range(6))
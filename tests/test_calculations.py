@@ -1,5 +1,6 @@
 import magcoilcalc
 import magcoilcalc.calculations
+import numpy as np
 
 
 def test_fom():
@@ -10,3 +11,39 @@ def test_fom():
     a = magcoilcalc.Task([mag, mag2, mag3], mesh)
     a.run()
     magcoilcalc.calculations.fom_cylindrical_cell(a, 50, 30)
+
+
+def test_find_gradient_keeps_axis_convention():
+    mag = magcoilcalc.CurrentLoop([-150, 150], 100, 420, 1)
+    mesh = magcoilcalc.Mesh([-100, 100], [-50, 50], 61, 51)
+    a = magcoilcalc.Task([mag], mesh)
+    a.run()
+    # the gradient as find_gradient has always defined it, 0 tangential gradient on the axis.
+    gradient_y = np.gradient(a.y_field, mesh.y_step / 10, axis=0)
+    gradient_x = np.gradient(a.y_field, mesh.x_step / 10, axis=1)
+    y_mesh = a.y_mesh.copy()
+    y_mesh[y_mesh == 0] = 1
+    reference = np.sqrt(gradient_y ** 2 + gradient_x ** 2 + (a.y_field / y_mesh * 10) ** 2)
+    assert np.allclose(magcoilcalc.calculations.find_gradient(a), reference, rtol=1e-12, atol=0)
+    xg, yg = np.meshgrid(np.linspace(-25, 25, 51), np.linspace(-15, 15, 51))
+    weights = np.abs(yg.ravel()) / np.sum(np.abs(yg.ravel()))
+    gradients = a.make_gradient_interpolator()(np.vstack((xg.ravel(), yg.ravel())).T) / a.center_field[0]
+    assert np.isclose(magcoilcalc.calculations.fom_cylindrical_cell(a, 50, 30),
+                      np.sum(gradients * weights) / 5e-4, rtol=1e-12)
+    # the axis limit dBr / dr differs on the axis row only.
+    limit = magcoilcalc.calculations.lateral_gradient(a.y_field, mesh.x_linspace, mesh.y_linspace)
+    axis = mesh.y_linspace == 0
+    assert np.allclose(limit[~axis], reference[~axis], rtol=1e-12, atol=0)
+    assert np.all(limit[axis] > reference[axis])
+
+
+def test_lateral_gradient_batches_and_axis():
+    x = np.linspace(-10, 10, 11)
+    y = np.linspace(-5, 5, 11)
+    xg, yg = np.meshgrid(x, y)
+    br = np.stack([yg * 1e-3, yg * xg * 1e-4])
+    g = magcoilcalc.calculations.lateral_gradient(br, x, y)
+    assert np.allclose(g[1], magcoilcalc.calculations.lateral_gradient(br[1], x, y))
+    # Br = k * r gives dBr/dr = Br / r = k everywhere, including the axis.
+    assert np.allclose(g[0], np.sqrt(2) * 1e-2)
+    assert np.isclose(magcoilcalc.calculations.gradient_fom(np.full(4, 1e-3), [1, 2, 3, 4]), 2)
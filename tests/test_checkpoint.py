@@ -0,0 +1,89 @@
+import functools
+import pytest
+import magcoilcalc
+import magcoilcalc.calculations
+import numpy as np
+
+
+def test_checkpoint_drops_partial_record(tmp_path):
+    path = str(tmp_path / 'scan.ckpt')
+    with magcoilcalc.Checkpoint(path) as store:
+        store.add((1.0, ), 'a')
+        store.add((2.0, ), 'b')
+    with open(path, 'ab') as file:
+        file.write(b'\xff\x00\x00\x00\x00\x00\x00\x00partial')
+    with magcoilcalc.Checkpoint(path) as store:
+        assert len(store) == 2
+        store.add((3.0, ), 'c')
+    with magcoilcalc.Checkpoint(path) as store:
+        assert [store[(x, )] for x in (1.0, 2.0, 3.0)] == ['a', 'b', 'c']
+
+
+def test_parameter_scan_resumes(tmp_path):
+    path = str(tmp_path / 'scan.ckpt')
+    calls = []
+    preempt = [True]
+
+    def func(x, y):
+        calls.append((x, y))
+        if len(calls) == 5 and preempt[0]:
+            raise RuntimeError("preempted")
+        return x * y
+
+    try:
+        magcoilcalc.calculations.parameter_scan(func, (0, 1, 3), (0, 1, 3), checkpoint=path)
+    except RuntimeError:
+        pass
+    calls.clear()
+    preempt[0] = False
+    fom, xg, yg = magcoilcalc.calculations.parameter_scan(func, (0, 1, 3), (0, 1, 3), checkpoint=path)
+    assert len(calls) == 5
+    assert np.allclose(fom, xg * yg)
+
+
+def test_run_tasks_resumes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'tasks.ckpt')
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    tasks = [magcoilcalc.Task([magcoilcalc.CurrentLoop([-50, 50], [20 + i, 20 + i], 21, 1.2, 2)], mesh)
+             for i in range(3)]
+    fom = functools.partial(magcoilcalc.calculations.fom_cylindrical_cell, length=20, diameter=10)
+    first = magcoilcalc.run_tasks(tasks[:2], reduce=fom, checkpoint=path)
+    solved = []
+    original = magcoilcalc.core._run_spec
+
+    def counting(spec, reduce=None, shared=None):
+        solved.append(spec)
+        return original(spec, reduce, shared)
+
+    monkeypatch.setattr(magcoilcalc.core, '_run_spec', counting)
+    results = magcoilcalc.run_tasks(tasks, reduce=fom, checkpoint=path)
+    assert len(solved) == 1
+    assert results[:2] == first
+    done = magcoilcalc.run_tasks(tasks[:1], checkpoint=path)
+    assert len(solved) == 2
+    assert np.allclose(done[0].x_field, magcoilcalc.run_tasks(tasks[:1], checkpoint=path)[0].x_field)
+    assert len(solved) == 2
+    other = functools.partial(magcoilcalc.calculations.fom_cylindrical_cell, length=16, diameter=8)
+    assert magcoilcalc.run_tasks(tasks[:1], reduce=other, checkpoint=path)[0] != first[0]
+    assert len(solved) == 3
+    with pytest.raises(ValueError):
+        magcoilcalc.run_tasks(tasks[:1], reduce=lambda task: task.center_field, checkpoint=path)
+
+
+def test_fingerprint_ignores_source_caches(tmp_path):
+    path = str(tmp_path / 'coils.ckpt')
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    coils = [magcoilcalc.RectangularCoil([-50, 50], [40, 45], 100, 1.0),
+             magcoilcalc.SourceCollection([magcoilcalc.CurrentLoop([-50, 50], [30, 30], 21, 1.0)])]
+    task = magcoilcalc.Task(coils, mesh)
+    fingerprint = task.fingerprint()
+    task.run()
+    assert task.fingerprint() == fingerprint
+    first = magcoilcalc.run_tasks([task], reduce='center_field', checkpoint=path)
+    assert task.fingerprint() == fingerprint
+    again = magcoilcalc.Task(coils, mesh)
+    again.run()
+    with magcoilcalc.Checkpoint(path) as store:
+        assert len(store) == 1
+        assert (again.fingerprint(), 'center_field') in store
+    assert magcoilcalc.run_tasks([again], reduce='center_field', checkpoint=path) == first
@@ -0,0 +1,27 @@
+import magcoilcalc
+import numpy as np
+import os
+from magcoilcalc.export import cartesian_field
+
+
+def test_cartesian_field(tmp_path):
+    loop = magcoilcalc.CurrentLoop([-20, 20], 40, 21, 1.0, 2)
+    x = np.linspace(-10, 10, 5)
+    y = np.linspace(-15, 15, 7)
+    z = np.linspace(-15, 15, 6)
+    volume = cartesian_field(loop, x, y, z, x_block=2)
+    assert volume.shape == (5, 7, 6, 3)
+    for i, j, k in [(0, 0, 0), (2, 3, 1), (4, 6, 5), (1, 5, 2)]:
+        r = np.hypot(y[j], z[k])
+        bx, br = loop.b_field_vec(np.array([x[i]]), np.array([r]))
+        expected = [bx[0], br[0] * y[j] / r, br[0] * z[k] / r]
+        assert np.allclose(volume[i, j, k], expected)
+    # on the axis the transverse field vanishes
+    assert np.allclose(cartesian_field(loop, x, [0.0], [0.0])[..., 1:], 0)
+
+    task = magcoilcalc.Task(loop, magcoilcalc.Mesh([-10, 10], [0, 25], 81, 101))
+    task.run()
+    path = os.path.join(str(tmp_path), 'volume.npy')
+    streamed = cartesian_field(task, x, y, z, path=path)
+    assert np.allclose(np.load(path), streamed)
+    assert np.allclose(streamed, volume, rtol=1e-3, atol=1e-3 * np.max(np.abs(volume)))
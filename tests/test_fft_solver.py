@@ -0,0 +1,62 @@
+import magcoilcalc
+import numpy as np
+import pytest
+from magcoilcalc._fft_solver import fft_loops_b_field
+
+
+def test_fft_matches_direct():
+    loop = magcoilcalc.CurrentLoop([-100, 100], 30, 303, 1.0, 3)
+    sheet = magcoilcalc.CurrentSheet([-20, 20], 60, 10, 1.0)
+    mesh = magcoilcalc.Mesh([-50, 50], [-40, 40], 101, 41)
+    for sources in ([loop], [loop, sheet]):
+        direct = magcoilcalc.Task(sources, mesh)
+        direct.run()
+        fft = magcoilcalc.Task(sources, mesh)
+        fft.run(engine='fft')
+        finite = np.isfinite(direct.x_field)
+        assert np.array_equal(finite, np.isfinite(fft.x_field))
+        assert np.allclose(fft.x_field[finite], direct.x_field[finite], rtol=0,
+                           atol=1e-12 * np.max(np.abs(direct.x_field[finite])))
+        assert np.allclose(fft.y_field[finite], direct.y_field[finite], rtol=0,
+                           atol=1e-12 * np.max(np.abs(direct.y_field[finite])))
+
+
+def test_fft_unaligned_loops():
+    loops = np.array([[0.25, 20, 1.0], [3.0, 20, -2.0], [4.0, 25, 1.0]])
+    x = np.linspace(-10, 10, 21)
+    y = np.linspace(0, 10, 6)
+    x_mesh, y_mesh = np.meshgrid(x, y)
+    reference = magcoilcalc.LoopArray.from_loop_list(loops).b_field_vec(x_mesh, y_mesh)
+    assert np.allclose(fft_loops_b_field(loops, x, y), reference)
+    with pytest.raises(ValueError):
+        fft_loops_b_field(loops, np.array([0, 1, 3.0]), y)
+    task = magcoilcalc.Task(magcoilcalc.CurrentLoop([-10, 10], 20, 5, 1.0),
+                            magcoilcalc.RectilinearMesh([0, 1, 3.0], y))
+    with pytest.raises(ValueError):
+        task.run(engine='fft')
+    with pytest.raises(ValueError):
+        task.run(engine='fft', threads=2)
+
+
+def test_fft_offset_windings(monkeypatch):
+    mesh = magcoilcalc.Mesh([-50, 50], [-40, 40], 101, 41)
+    sources = [magcoilcalc.CurrentLoop([-99.5, 100.5], 30, 201, 1.0),
+               magcoilcalc.CurrentLoop([-80.25, 79.75], 45, 641, -0.5)]
+    direct = magcoilcalc.Task(sources, mesh)
+    direct.run()
+    calls = []
+
+    def counted(loops, x_mesh, y_mesh):
+        calls.append(len(loops))
+        return magcoilcalc.core._loops_b_field_vec(loops, x_mesh, y_mesh)
+
+    monkeypatch.setattr(magcoilcalc._fft_solver, '_loops_b_field_vec', counted)
+    fft = magcoilcalc.Task(sources, mesh)
+    fft.run(engine='fft')
+    # one unit response per radius and offset: 0.5 for the first winding, four quarter steps for the second, and
+    # no loop left to the direct sum
+    assert calls == [1] * 5
+    finite = np.isfinite(direct.x_field)
+    for fft_field, direct_field in ((fft.x_field, direct.x_field), (fft.y_field, direct.y_field)):
+        assert np.allclose(fft_field[finite], direct_field[finite], rtol=0,
+                           atol=1e-12 * np.max(np.abs(direct_field[finite])))
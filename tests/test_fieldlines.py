@@ -0,0 +1,36 @@
+import magcoilcalc
+import magcoilcalc.fieldlines
+import numpy as np
+from scipy.special import ellipk, ellipe
+
+
+def flux_function(a, x, r):
+    # r * A_phi of a unit loop of radius a, constant along its field lines.
+    m = 4 * a * r / ((a + r) ** 2 + x ** 2)
+    k = np.sqrt(m)
+    return r * np.sqrt(a / r) / k * ((1 - m / 2) * ellipk(m) - ellipe(m))
+
+
+def test_trace_single_loop():
+    loop = magcoilcalc.LoopArray(0, 50, 1.0)
+    seeds = np.array([[0, 10], [0, 20], [-10, 30], [5, 40]], dtype=float)
+    points, offsets = magcoilcalc.fieldlines.trace_field_lines(loop, seeds, tolerance=1e-6, max_length=60,
+                                                               bounds=((-100, 100), (1, 200)))
+    assert len(offsets) == 5
+    lines = magcoilcalc.fieldlines.split_lines(points, offsets)
+    for seed, line in zip(seeds, lines):
+        assert np.all(line[0] == seed)
+        assert len(line) > 2
+        psi = flux_function(50, line[:, 0], line[:, 1])
+        assert np.allclose(psi, psi[0], rtol=1e-5)
+
+
+def test_trace_on_task():
+    mesh = magcoilcalc.Mesh([-100, 100], [-50, 50], 101, 51)
+    task = magcoilcalc.Task(magcoilcalc.CurrentLoop([-150, 150], 100, 300, 1.0), mesh)
+    task.run()
+    points, offsets = magcoilcalc.fieldlines.trace_field_lines(task, [[-90, 0], [-90, 20]], direction=1)
+    lines = magcoilcalc.fieldlines.split_lines(points, offsets)
+    assert np.allclose(lines[0][:, 1], 0)
+    assert lines[0][-1, 0] > 99
+    assert np.all(np.diff(lines[1][:, 0]) > 0)
@@ -0,0 +1,32 @@
+import magcoilcalc
+import magcoilcalc.templates
+import numpy as np
+
+
+def test_force_between_loops():
+    # F = dM/dd * I1 * I2, from the mutual inductance
+    l1 = magcoilcalc.LoopArray(0, 50, 2.0)
+    l2 = magcoilcalc.LoopArray(20, 40, 3.0)
+    forces = magcoilcalc.SourceCollection([l1, l2]).axial_forces()
+    assert np.isclose(forces[0], -forces[1])
+    # parallel currents attract
+    assert forces[1] < 0
+    eps = 1e-3
+    mutual = [magcoilcalc.SourceCollection([l1, magcoilcalc.LoopArray(20 + d, 40, 3.0)]).inductance_matrix(1)[0, 1]
+              for d in (-eps, eps)]
+    # LoopArrays are circuits driven at 1 A with the loop currents as turns
+    expected = (mutual[1] - mutual[0]) / (2 * eps / 1000)
+    assert np.isclose(forces[1], expected, rtol=1e-4)
+
+
+def test_helmholtz_forces():
+    sources = magcoilcalc.templates.helmholtz_coil()
+    mesh = magcoilcalc.Mesh([-10, 10], [-10, 10], 3, 3)
+    task = magcoilcalc.Task(sources, mesh)
+    net, per_turn = task.axial_forces(per_turn=True)
+    assert np.isclose(net[0], -net[1])
+    assert net[0] > 0
+    assert len(per_turn) == 2
+    assert np.isclose(np.sum(per_turn[0]), net[0])
+    blocked = magcoilcalc.SourceCollection(sources).axial_forces(block_size=4)
+    assert np.allclose(blocked, net)
@@ -0,0 +1,31 @@
+import magcoilcalc
+import magcoilcalc.calculations
+import magcoilcalc.homogeneity
+import magcoilcalc.templates
+import numpy as np
+
+
+def test_tiles_agree():
+    sources = magcoilcalc.templates.helmholtz_coil()
+    s1 = magcoilcalc.homogeneity.homogeneity_statistics(sources, 100, 60, tile_rows=1)
+    s2 = magcoilcalc.homogeneity.homogeneity_statistics(sources, 100, 60, tile_rows=100)
+    for key in s1:
+        assert np.isclose(s1[key], s2[key])
+    assert np.isclose(s1['cell_volume'], np.pi * 30 ** 2 * 100)
+
+
+def test_statistics_against_full_map():
+    sources = magcoilcalc.templates.helmholtz_coil()
+    mesh = magcoilcalc.Mesh([-50, 50], [0, 30], 51, 16)
+    task = magcoilcalc.Task(sources, mesh)
+    task.run()
+    stats = magcoilcalc.homogeneity.homogeneity_statistics(task, 100, 60, 51, 16, threshold=5e-4)
+    b0 = task.center_field[0][0]
+    deviation = np.hypot(task.x_field - b0, task.y_field) / b0
+    assert np.isclose(stats['center_field'], b0)
+    assert np.isclose(stats['max_deviation'], np.max(deviation))
+    assert 0 < stats['homogeneous_fraction'] < 1
+    assert stats['rms_deviation'] < stats['max_deviation']
+    full_task = magcoilcalc.Task(sources, magcoilcalc.Mesh([-60, 60], [-40, 40], 61, 41))
+    full_task.run()
+    assert np.isclose(stats['fom'], magcoilcalc.calculations.fom_cylindrical_cell(full_task, 100, 60), rtol=0.2)
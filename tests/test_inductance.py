@@ -0,0 +1,45 @@
+import magcoilcalc
+import magcoilcalc._off_axis_loop as loop_calculator
+import numpy as np
+import pytest
+
+
+def test_mutual_inductance_kernel():
+    # far apart loops behave like dipoles
+    a, b, d = 0.01, 0.02, 1.0
+    dipole = 4e-7 * np.pi * np.pi * a ** 2 * b ** 2 / 2 / d ** 3
+    assert np.isclose(loop_calculator.mutual_inductance(a, b, d), dipole, rtol=1e-2)
+
+
+def test_inductance_matrix():
+    c1 = magcoilcalc.CurrentLoop([-60, -40], 50, 40, 2.0, 2, 1.0)
+    c2 = magcoilcalc.CurrentLoop([40, 60], 50, 40, 1.0, 2, 1.0)
+    c3 = magcoilcalc.LoopArray([0, 1], 30, [0.5, 0.5])
+    collection = magcoilcalc.SourceCollection([c1, c2, c3])
+    blocked = collection.inductance_matrix(wire_radius=0.5, block_size=7)
+    full = collection.inductance_matrix(wire_radius=0.5, block_size=1000)
+    assert np.allclose(blocked, full)
+    assert np.allclose(full, full.T)
+    assert np.all(np.diag(full) > 0)
+    assert np.allclose(collection.inductance_matrix(wire_radius=0.5)[:2, :2],
+                       magcoilcalc.SourceCollection([c1, c2]).inductance_matrix())
+    currents = np.array([2.0, 1.0, 1.0])
+    assert np.isclose(collection.stored_energy(0.5), 0.5 * currents @ full @ currents)
+    with pytest.raises(ValueError):
+        collection.inductance_matrix()
+
+
+def test_long_solenoid():
+    # L = mu0 N^2 A / l, within the finite length correction
+    solenoid = magcoilcalc.CurrentLoop([-500, 500], 20, 1000, 1.0)
+    mesh = magcoilcalc.Mesh([-10, 10], [-10, 10], 3, 3)
+    task = magcoilcalc.Task(solenoid, mesh)
+    expected = 4e-7 * np.pi * 1000 ** 2 * np.pi * 0.02 ** 2 / 1.0
+    assert np.isclose(task.inductance_matrix()[0, 0], expected, rtol=5e-2)
+
+
+def test_rectangular_coil_inductance():
+    rc = magcoilcalc.RectangularCoil([-10, 10], [95, 105], 800, 1.0)
+    cl = magcoilcalc.CurrentLoop([-9.75, 9.75], 95.25, 800, 1.0, layers=20, layer_thickness=0.5)
+    assert np.isclose(magcoilcalc.SourceCollection(rc).inductance_matrix(),
+                      magcoilcalc.SourceCollection(cl).inductance_matrix(), rtol=1e-2)
@@ -0,0 +1,51 @@
+import magcoilcalc
+import numpy as np
+import pytest
+from scipy.interpolate import RegularGridInterpolator
+
+
+def test_field_interpolator_matches_scipy():
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    task = magcoilcalc.Task([magcoilcalc.CurrentLoop([-30, 30], 25, 31, 1.0, 2)], mesh)
+    task.run()
+    rng = np.random.default_rng(0)
+    points = np.vstack([rng.uniform(-20, 20, 100), rng.uniform(-10, 10, 100)]).T
+    points[0] = [20, 10]
+    points[1] = [-20, -10]
+    bx, by, b = task.field_at(points, magnitude=True)
+    reference_x = RegularGridInterpolator((mesh.x_linspace, mesh.y_linspace), task.x_field.T)(points)
+    reference_y = RegularGridInterpolator((mesh.x_linspace, mesh.y_linspace), task.y_field.T)(points)
+    assert np.allclose(bx, reference_x)
+    assert np.allclose(by, reference_y)
+    assert np.allclose(b, np.hypot(reference_x, reference_y))
+    assert np.allclose(task.x_field_at(points), reference_x)
+    assert task.x_field_at([0, 0]).shape == (1, )
+    assert task.field_at(points.reshape(10, 10, 2))[1].shape == (10, 10)
+    with pytest.raises(ValueError):
+        task.field_at([21, 0])
+
+
+def test_component_keeps_scipy_interface():
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    task = magcoilcalc.Task([magcoilcalc.CurrentLoop([-30, 30], 25, 31, 1.0, 2)], mesh)
+    task.run()
+    reference = RegularGridInterpolator((mesh.x_linspace, mesh.y_linspace), task.y_field.T)
+    view = task.y_field_at
+    assert np.array_equal(view.grid[0], reference.grid[0]) and np.array_equal(view.grid[1], reference.grid[1])
+    assert np.array_equal(view.values, reference.values)
+    assert view.bounds_error
+    points = np.array([[1.3, 2.7], [-15.2, -8.1]])
+    for method in ('linear', 'nearest', 'cubic'):
+        assert np.allclose(view(points, method=method), reference(points, method=method))
+    lazy = magcoilcalc.Task([magcoilcalc.CurrentLoop([-30, 30], 25, 31, 1.0, 2)], mesh)
+    lazy.run(lazy=True, tile_shape=(4, 4))
+    assert np.allclose(lazy.y_field_at.values, reference.values)
+
+
+def test_interpolator_is_lazy():
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    task = magcoilcalc.Task([magcoilcalc.CurrentLoop([-30, 30], 25, 31, 1.0)], mesh)
+    task.run()
+    assert task._field_interpolator is None
+    _ = task.center_field
+    assert task._field_interpolator is not None
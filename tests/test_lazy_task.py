@@ -0,0 +1,41 @@
+import magcoilcalc
+import magcoilcalc.calculations
+import numpy as np
+import pytest
+
+
+def _task():
+    mesh = magcoilcalc.Mesh([-40, 40], [-20, 20], 41, 21)
+    mag = magcoilcalc.CurrentLoop([-50, 50], [25, 25], 41, 1.2, 2)
+    return magcoilcalc.Task([mag], mesh)
+
+
+def test_lazy_probe_solves_few_tiles():
+    eager = _task()
+    eager.run()
+    lazy = _task()
+    lazy.run(lazy=True, tile_shape=(8, 8))
+    assert lazy.done
+    assert not lazy._tiles.solved.any()
+    points = np.array([[0.0, 0.0], [10.3, -4.2]])
+    assert np.allclose(lazy.field_at(points), eager.field_at(points))
+    assert np.isclose(lazy.x_field_at([3.0, 1.0]), eager.x_field_at([3.0, 1.0]))
+    assert np.allclose(lazy.center_field, eager.center_field)
+    assert 0 < lazy._tiles.solved.sum() < lazy._tiles.solved.size
+    assert np.allclose(lazy.x_field, eager.x_field)
+    assert lazy._tiles.complete
+
+
+def test_lazy_region():
+    eager = _task()
+    eager.run()
+    lazy = _task()
+    lazy.run(lazy=True, tile_shape=(8, 8))
+    region = ((-10, 10), (-5, 5))
+    g = magcoilcalc.calculations.find_gradient(lazy, region=region)
+    rows, columns = lazy.region_slices(*region)
+    assert g.shape == (rows.stop - rows.start, columns.stop - columns.start)
+    assert not lazy._tiles.complete
+    assert np.allclose(g, magcoilcalc.calculations.find_gradient(eager, region=region))
+    with pytest.raises(ValueError):
+        _task().run(lazy=True, threads=2)
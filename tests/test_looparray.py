@@ -0,0 +1,39 @@
+import magcoilcalc
+import numpy as np
+
+
+def test_looparray_matches_currentloop():
+    mag = magcoilcalc.CurrentLoop([-50, 50], 40, 101, 1.5, 3, 1)
+    loops = magcoilcalc.LoopArray.from_loop_list(mag.get_loop_list())
+    assert len(loops) == 101
+    assert np.allclose(loops.b_field(10, 5), mag.b_field(10, 5))
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    t1 = magcoilcalc.Task([mag], mesh)
+    t2 = magcoilcalc.Task([loops], mesh)
+    t1.run()
+    t2.run()
+    assert np.allclose(t1.x_field, t2.x_field)
+    assert np.allclose(t1.y_field, t2.y_field)
+
+
+def test_looparray_in_place_update():
+    loops = magcoilcalc.LoopArray(np.linspace(-10, 10, 5), 30, 1.0)
+    assert loops.get_loop_list().shape == (5, 3)
+    loops.update(index=[0, 4], current=2.0)
+    assert np.all(loops.currents == [2, 1, 1, 1, 2])
+    loops.radius += 1
+    assert np.all(loops.get_loop_list()[:, 1] == 31)
+    copied = loops.__copy__()
+    assert copied == loops
+    copied.x[0] = 100
+    assert loops.x[0] == -10
+
+
+def test_looparray_mp():
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 11, 11)
+    loops = magcoilcalc.LoopArray(np.linspace(-30, 30, 20), 25, 1.0)
+    t1 = magcoilcalc.Task([loops], mesh)
+    t2 = magcoilcalc.Task([loops], mesh)
+    t1._run_sp()
+    t2._run_mp(processes=2)
+    assert np.allclose(t1.x_field, t2.x_field)
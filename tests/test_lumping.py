@@ -0,0 +1,34 @@
+import magcoilcalc
+import magcoilcalc.templates
+import numpy as np
+
+
+def test_lump_loop_list():
+    loops = np.array([[0, 10, 1], [0.5, 10, 1], [0, 12, 2], [5, 10, 1]], dtype=float)
+    lumped = magcoilcalc.lump_loop_list(loops, 1.0)
+    assert lumped.shape == (3, 3)
+    assert np.isclose(np.sum(lumped[:, 2]), 5)
+    assert np.allclose(lumped[0], [0.25, 10, 2])
+    assert magcoilcalc.lump_loop_list(loops, 0) is not None
+
+
+def test_lump_mixed_signs():
+    loops = np.array([[0, 10, 1], [0.2, 12, -1], [0.4, 10.5, 2]], dtype=float)
+    lumped = magcoilcalc.lump_loop_list(loops, 1.0)
+    assert lumped.shape == (2, 3)
+    assert np.isclose(np.sum(lumped[:, 2]), 2)
+    assert np.isclose(np.sum(lumped[:, 2] * lumped[:, 1] ** 2), np.sum(loops[:, 2] * loops[:, 1] ** 2))
+
+
+def test_task_lumping():
+    mesh = magcoilcalc.Mesh([-100, 100], [-50, 50], 41, 21)
+    sources = magcoilcalc.templates.compensated_solenoid()
+    exact = magcoilcalc.Task(sources, mesh)
+    lumped = magcoilcalc.Task(sources, mesh)
+    exact.run()
+    lumped.run(lump_tolerance=1e-4)
+    assert lumped.lumping_error <= 1e-4
+    lumped_sources, _ = magcoilcalc.lump_sources(sources, mesh, 1e-4)
+    assert len(lumped_sources[0].get_loop_list()) < 420
+    scale = np.max(np.hypot(exact.x_field, exact.y_field))
+    assert np.max(np.abs(exact.x_field - lumped.x_field)) < 2e-4 * scale
@@ -0,0 +1,64 @@
+import magcoilcalc
+import numpy as np
+
+
+def test_kernel_memo_reuse():
+    mesh = magcoilcalc.Mesh([-50, 50], [-30, 30], 51, 31)
+    masked = magcoilcalc.Mesh([-50, 50], [-30, 30], 51, 31, mask=lambda x, y: np.abs(y) < 20)
+    coils = [magcoilcalc.CurrentLoop([-40, -20], 35, 11, 1.0), magcoilcalc.CurrentLoop([60, 80], 35, 11, -2.0),
+             magcoilcalc.LoopArray([0.5, 3.0], [20, 25], [1.0, 2.0]), magcoilcalc.CurrentSheet([-5, 5], 45, 5, 1.0)]
+    references = []
+    for m in (mesh, masked):
+        task = magcoilcalc.Task(coils, m)
+        task.run()
+        references.append(task)
+    magcoilcalc.enable_kernel_memo()
+    try:
+        # only turns pitched on the x nodes share responses worth storing on first use. The loops outside the grid
+        # and the loose ones are evaluated directly until they are met again.
+        task = magcoilcalc.Task(coils, mesh)
+        task.run()
+        assert np.allclose(task.x_field, references[0].x_field, rtol=1e-12, atol=0)
+        memo = magcoilcalc.core.get_kernel_memo()
+        assert len(memo) > 0 and all(len(key) == 3 for key in memo._entries)
+        for _ in range(2):
+            for m, reference in zip((mesh, masked), references):
+                task = magcoilcalc.Task(coils, m)
+                task.run()
+                assert np.allclose(task.x_field, reference.x_field, equal_nan=True, rtol=1e-12, atol=0)
+                assert np.allclose(task.y_field, reference.y_field, equal_nan=True, rtol=1e-12, atol=1e-18)
+        info = magcoilcalc.kernel_memo_info()
+        assert info['hits'] > info['misses']
+        # the first coil shifted by whole steps reuses its responses.
+        misses = info['misses']
+        task = magcoilcalc.Task(magcoilcalc.CurrentLoop([-30, -10], 35, 11, 1.0), mesh)
+        task.run()
+        assert magcoilcalc.kernel_memo_info()['misses'] == misses
+        magcoilcalc.enable_kernel_memo(max_bytes=1)
+        task = magcoilcalc.Task(coils, mesh)
+        task.run()
+        assert len(magcoilcalc.core.get_kernel_memo()) == 1
+    finally:
+        magcoilcalc.disable_kernel_memo()
+    assert magcoilcalc.kernel_memo_info() is None
+
+
+def test_kernel_memo_keeps_current_run():
+    mesh = magcoilcalc.Mesh([-50, 50], [-30, 30], 51, 31)
+    # one response per coil, the turns stand on the x nodes.
+    coils = [magcoilcalc.CurrentLoop([-40, 40], 35 + i, 41, 1.0) for i in range(4)]
+    reference = magcoilcalc.Task(coils, mesh)
+    reference.run()
+    response_bytes = 2 * 31 * 101 * 8
+    magcoilcalc.enable_kernel_memo(max_bytes=3.5 * response_bytes)
+    try:
+        for _ in range(3):
+            task = magcoilcalc.Task(coils, mesh)
+            task.run()
+            assert np.allclose(task.x_field, reference.x_field, rtol=1e-12, atol=0)
+        memo = magcoilcalc.core.get_kernel_memo()
+        assert len(memo) == 3
+        # the stored responses are hit on every later run instead of evicting each other.
+        assert magcoilcalc.kernel_memo_info()['hits'] == 6
+    finally:
+        magcoilcalc.disable_kernel_memo()
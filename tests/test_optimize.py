@@ -0,0 +1,81 @@
+import magcoilcalc
+import magcoilcalc.templates
+import numpy as np
+from scipy.optimize import minimize
+from magcoilcalc.optimize import optimize_currents, current_basis
+
+
+def test_optimize_currents():
+    sources = magcoilcalc.templates.three_coils()
+    sources[2].current *= 0.8
+    region = magcoilcalc.Mesh([-60, 60], [-40, 40], 13, 9)
+    result = optimize_currents(sources, region)
+    b0 = magcoilcalc.Task(sources, magcoilcalc.Mesh([-1, 1], [-1, 1], 3, 3))
+    b0.run()
+    task = magcoilcalc.Task(result['sources'], region)
+    task.run()
+    assert np.isclose(np.sqrt(np.mean(np.concatenate([(task.x_field - b0.x_field[1, 1]).ravel(),
+                                                      task.y_field.ravel()]) ** 2)), result['rms_deviation'])
+
+    bx, by = current_basis(sources, region)
+
+    def cost(currents):
+        return np.sum((bx @ currents - b0.x_field[1, 1]) ** 2) + np.sum((by @ currents) ** 2)
+    reference = minimize(cost, np.array([source.current for source in sources]), method='BFGS', options={'gtol': 1e-20})
+    assert cost(result['currents']) <= cost(reference.x) * (1 + 1e-6)
+    assert cost(result['currents']) < cost(np.array([source.current for source in sources]))
+
+    bounded = optimize_currents(sources, region, bounds=(0, 25))
+    assert np.all(bounded['currents'] >= 0) and np.all(bounded['currents'] <= 25 + 1e-9)
+    ridge = optimize_currents(sources, region, regularization=1e-6)
+    assert np.linalg.norm(ridge['currents']) < np.linalg.norm(result['currents'])
+
+    fixed = optimize_currents(sources, np.array([[0, 0], [10, 5]]), target_field=(1e-3, 0), free=[2],
+                              components='x')
+    assert fixed['free'] == [2]
+    assert fixed['sources'][0].current == sources[0].current
+    assert fixed['sources'][2].current != sources[2].current
+
+
+def test_optimize_design():
+    from magcoilcalc.optimize import optimize_design
+    from magcoilcalc.calculations import fom_cylindrical_cell
+
+    def construct(separation):
+        return [magcoilcalc.CurrentLoop([-separation / 2 - 5, -separation / 2 + 5], 95, 20, 1.0, 4),
+                magcoilcalc.CurrentLoop([separation / 2 - 5, separation / 2 + 5], 95, 20, 1.0, 4)]
+    fidelities = ({'steps': (9, 7), 'lump_tolerance': 1e-3, 'fom_steps': (9, 9), 'tol': 1e-2, 'simplex': 0.05},
+                  {'steps': (21, 13), 'lump_tolerance': None, 'fom_steps': (21, 21), 'tol': 1e-4, 'simplex': 0.005})
+    result = optimize_design(construct, [60], 50, 30, fidelities=fidelities)
+    assert magcoilcalc.kernel_memo_info() is None
+    assert len(result['levels']) == 2
+    mesh = magcoilcalc.Mesh([-27.5, 27.5], [-16.5, 16.5], 21, 13)
+
+    def fine(parameters):
+        task = magcoilcalc.Task(construct(*parameters), mesh)
+        task.run()
+        return fom_cylindrical_cell(task, 50, 30, 21, 21)
+    reference = minimize(fine, [60], method='Nelder-Mead', tol=1e-4)
+    assert np.isclose(result['fun'], reference.fun, rtol=1e-3)
+    assert np.isclose(result['fun'], fine(result['x']))
+    memo_result = optimize_design(construct, [60], 50, 30, fidelities=fidelities, memo=True)
+    assert magcoilcalc.kernel_memo_info() is None
+    assert np.isclose(memo_result['fun'], result['fun'])
+    assert result['levels'][1]['evaluations'] < reference.nfev
+
+
+def test_optimize_design_low_order():
+    from magcoilcalc.optimize import optimize_design, _limit_order
+    coil = magcoilcalc.RectangularCoil([-5, 5], [90, 100], 40, 1.0)
+    assert _limit_order([coil], 4)[0].max_order == 4
+    assert coil.max_order == 16
+    assert _limit_order([coil], None)[0] is coil
+
+    def construct(separation):
+        return [magcoilcalc.RectangularCoil([-separation / 2 - 5, -separation / 2 + 5], [90, 100], 40, 1.0),
+                magcoilcalc.RectangularCoil([separation / 2 - 5, separation / 2 + 5], [90, 100], 40, 1.0)]
+    fidelities = ({'steps': (9, 7), 'max_order': 3, 'fom_steps': (9, 9), 'tol': 1e-2, 'simplex': 0.05},
+                  {'steps': (21, 13), 'max_order': None, 'fom_steps': (21, 21), 'tol': 1e-4, 'simplex': 0.005})
+    result = optimize_design(construct, [90], 50, 30, fidelities=fidelities)
+    assert len(result['levels']) == 2
+    assert np.isfinite(result['fun'])
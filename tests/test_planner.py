@@ -0,0 +1,44 @@
+import json
+import magcoilcalc
+import magcoilcalc.planner as planner
+import numpy as np
+import pytest
+
+CALIBRATION = {'version': planner.CALIBRATION_VERSION, 'cpu_count': 4, 'vector_time': 1e-8,
+               'vector_overhead': 1e-4, 'thread_speedup': {1: 1.0, 2: 1.9, 4: 3.5}, 'process_startup': 0.5,
+               'mp_point_time': 2e-5, 'mp_pair_time': 2e-8}
+
+
+def test_plan_choices():
+    sources = [magcoilcalc.CurrentLoop([-50, 50], [20, 20], 100, 1.0, 10)]
+    small = planner.plan_run(magcoilcalc.Mesh([-10, 10], [-10, 10], 5, 5), sources, CALIBRATION)
+    assert (small['processes'], small['threads']) == (1, 1)
+    large = planner.plan_run(magcoilcalc.Mesh([-10, 10], [-10, 10], 401, 401), sources, CALIBRATION)
+    assert large['threads'] == 4 and large['processes'] == 1
+    assert large['tile_rows'] * 401 * 1000 >= planner.MIN_TILE_PAIRS
+    assert large['estimate'] == min(large['estimates'].values())
+
+
+def test_calibration_persisted(tmp_path, monkeypatch):
+    path = str(tmp_path / 'calibration.json')
+    calibration = planner.calibrate(path)
+    with open(path) as file:
+        assert json.load(file)['vector_time'] == calibration['vector_time']
+    monkeypatch.setattr(planner, '_calibration', None)
+    monkeypatch.setattr(planner, 'calibrate', pytest.fail)
+    assert planner.load_calibration(path)['vector_time'] == calibration['vector_time']
+
+
+def test_auto_engine(monkeypatch, capsys):
+    monkeypatch.setattr(planner, '_calibration', (planner.CALIBRATION_PATH, CALIBRATION))
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 41, 21)
+    sources = [magcoilcalc.CurrentLoop([-50, 50], [20, 20], 21, 1.2, 4)]
+    auto = magcoilcalc.Task(sources, mesh)
+    auto.run(engine='auto')
+    assert capsys.readouterr().out == ''
+    assert auto.plan['processes'] == 1 and auto.plan['estimate'] > 0
+    direct = magcoilcalc.Task(sources, mesh)
+    direct.run()
+    assert np.allclose(auto.x_field, direct.x_field)
+    with pytest.raises(ValueError):
+        magcoilcalc.Task(sources, mesh).run(engine='auto', threads=2)
@@ -0,0 +1,74 @@
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import magcoilcalc
+import magcoilcalc.plotting
+import numpy as np
+
+
+def test_loop_markers_single_collection():
+    loop = magcoilcalc.CurrentLoop([-50, 50], 40, 101, 1.0, 3)
+    f, ax = plt.subplots()
+    magcoilcalc.plotting.draw_source(ax, loop)
+    assert len(ax.collections) == 1
+    assert len(ax.collections[0].get_offsets()) == 2 * len(loop.get_loop_list())
+    plt.close(f)
+
+
+def test_field_maps_decimated():
+    loop = magcoilcalc.CurrentLoop([-50, 50], 40, 51, 1.0)
+    task = magcoilcalc.Task(loop, magcoilcalc.Mesh([-30, 30], [-20, 20], 61, 41))
+    task.run()
+    image, f, ax = magcoilcalc.plotting.draw_intensity(task)
+    assert image.get_array().shape == (40, 60)
+    plt.close(f)
+    image, f, ax = magcoilcalc.plotting.draw_normalized_gradient(task, max_cells=700)
+    assert image.get_array().size <= 700
+    plt.close(f)
+
+    x = np.concatenate([np.linspace(-30, -10, 5), np.linspace(-9, 9, 19), np.linspace(10, 30, 5)])
+    task = magcoilcalc.Task(loop, magcoilcalc.RectilinearMesh(x, np.linspace(-20, 20, 21)))
+    task.run()
+    quads, f, ax = magcoilcalc.plotting.draw_intensity(task)
+    assert quads.get_array().size == 20 * 28
+    plt.close(f)
+    quads, f, ax = magcoilcalc.plotting.draw_normalized_gradient(task)
+    assert quads.get_array().size == 21 * 29
+    plt.close(f)
+
+
+def _cell_extent(artist):
+    try:
+        return np.asarray(artist.get_extent())
+    except AttributeError:
+        corners = artist.get_coordinates()
+        return np.array([corners[..., 0].min(), corners[..., 0].max(), corners[..., 1].min(), corners[..., 1].max()])
+
+
+def test_field_map_cells_match_pcolor():
+    loop = magcoilcalc.CurrentLoop([-50, 50], 40, 51, 1.0)
+    x = np.concatenate([np.linspace(-30, -10, 5), np.linspace(-9, 9, 19), np.linspace(10, 30, 5)])
+    for mesh in (magcoilcalc.Mesh([-30, 30], [-20, 20], 61, 41),
+                 magcoilcalc.RectilinearMesh(x, np.linspace(-20, 20, 21))):
+        task = magcoilcalc.Task(loop, mesh)
+        task.run()
+        f, ax = plt.subplots()
+        # draw_intensity keeps the cells of pcolor on the node coordinates, from each node to the next.
+        plot = magcoilcalc.plotting.draw_intensity(task, ax=ax, colorbar=False)[0]
+        reference = ax.pcolormesh(mesh.x_linspace, mesh.y_linspace, task.x_field[:-1, :-1])
+        assert np.allclose(_cell_extent(plot), _cell_extent(reference))
+        assert np.allclose(_cell_extent(plot), [*mesh.x_range, *mesh.y_range])
+        # draw_normalized_gradient keeps the cells of pcolor on the pixel bounds, centered on the nodes.
+        plot = magcoilcalc.plotting.draw_normalized_gradient(task, ax=ax, colorbar=False)[0]
+        reference = ax.pcolormesh(mesh.x_pixel_bounds, mesh.y_pixel_bounds, task.x_field)
+        assert np.allclose(_cell_extent(plot), _cell_extent(reference))
+        plt.close(f)
+
+
+def test_mesh_boundary_off_center():
+    mesh = magcoilcalc.Mesh([10, 70], [-5, 35], 7, 5)
+    f, ax = plt.subplots()
+    magcoilcalc.plotting.draw_mesh_boundary(mesh, ax)
+    box = ax.patches[-1]
+    assert np.allclose([box.get_x(), box.get_y(), box.get_width(), box.get_height()], [10, -5, 60, 40])
+    plt.close(f)
@@ -0,0 +1,33 @@
+import magcoilcalc
+import magcoilcalc.templates
+import numpy as np
+
+
+def test_rectangular_coil_matches_windings():
+    rc = magcoilcalc.RectangularCoil([-10, 10], [95, 105], 800, 1.0)
+    cl = magcoilcalc.CurrentLoop([-9.75, 9.75], 95.25, 800, 1.0, layers=20, layer_thickness=0.5)
+    mesh = magcoilcalc.Mesh([-60, 60], [-40, 40], 25, 17)
+    bx1, by1 = rc.b_field_vec(mesh.x_mesh, mesh.y_mesh)
+    bx2, by2 = cl.b_field_vec(mesh.x_mesh, mesh.y_mesh)
+    scale = np.max(np.abs(bx2))
+    assert np.max(np.abs(bx1 - bx2)) < 1e-4 * scale
+    assert np.max(np.abs(by1 - by2)) < 1e-4 * scale
+    assert np.allclose(rc.b_field(0, 0), cl.b_field(0, 0), rtol=1e-4)
+
+
+def test_rectangular_coil_orders():
+    rc = magcoilcalc.RectangularCoil([-10, 10], [95, 105], 100, 1.0, max_order=12)
+    assert rc.get_loop_list().shape == (144, 3)
+    assert np.isclose(np.sum(rc.get_loop_list((3, 2))[:, 2]), 100)
+    nx, nr = rc._orders(np.array([0.0, 0.0, 0.0]), np.array([0.0, 100.0, 75.0]))
+    assert nx[0] < nx[2] < nx[1] == 12
+
+
+def test_quadrature_template():
+    mesh = magcoilcalc.Mesh([-100, 100], [-50, 50], 21, 11)
+    t1 = magcoilcalc.Task(magcoilcalc.templates.helmholtz_coil(), mesh)
+    t2 = magcoilcalc.Task(magcoilcalc.templates.helmholtz_coil(quadrature=True), mesh)
+    t1.run()
+    t2.run()
+    assert np.allclose(t1.x_field, t2.x_field, rtol=1e-3)
+    magcoilcalc.templates.three_coils(quadrature=True)
@@ -0,0 +1,81 @@
+import magcoilcalc
+import magcoilcalc.calculations
+import magcoilcalc.plotting
+import numpy as np
+import pytest
+
+
+def test_rectilinear_mesh():
+    x = np.concatenate([np.linspace(-100, -20, 5), np.linspace(-15, 15, 13), np.linspace(20, 100, 5)])
+    y = np.linspace(-50, 50, 11)
+    mesh = magcoilcalc.RectilinearMesh(x, y)
+    assert not mesh.is_uniform
+    assert mesh.x_steps == 23
+    assert tuple(mesh.x_range) == (-100, 100)
+    assert mesh.x_pixel_bounds.shape == (12, 24)
+    with pytest.raises(ValueError):
+        _ = mesh.x_step
+    with pytest.raises(ValueError):
+        magcoilcalc.RectilinearMesh([0, 1, 1], y)
+
+    loop = magcoilcalc.CurrentLoop([-150, 150], 100, 200, 1.0)
+    task = magcoilcalc.Task(loop, mesh)
+    task.run()
+    reference = magcoilcalc.Task(loop, magcoilcalc.Mesh([-100, 100], [-50, 50], 401, 11))
+    reference.run()
+    points = np.array([[-12.5, 3.0], [60, -20], [0, 0]])
+    assert np.allclose(task.field_at(points)[0], reference.field_at(points)[0], rtol=1e-4)
+    g = magcoilcalc.calculations.find_gradient(task)
+    assert g.shape == (11, 23)
+    magcoilcalc.calculations.fom_cylindrical_cell(task, 100, 60)
+
+
+def test_uniform_rectilinear_matches_mesh():
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    loop = magcoilcalc.CurrentLoop([-50, 50], 20, 21, 1.2, 4)
+    t1 = magcoilcalc.Task(loop, mesh)
+    t2 = magcoilcalc.Task(loop, magcoilcalc.RectilinearMesh.from_mesh(mesh))
+    t1.run()
+    t2.run()
+    assert np.allclose(magcoilcalc.calculations.find_gradient(t1), magcoilcalc.calculations.find_gradient(t2))
+    assert np.isclose(t2.mesh.x_step, mesh.x_step)
+
+
+def test_masked_mesh():
+    loop = magcoilcalc.CurrentLoop([-30, 30], 40, 31, 1.0, 2)
+    mesh = magcoilcalc.Mesh([-60, 60], [-60, 60], 25, 25)
+    mesh.exclude_sources([loop], margin=2)
+    assert not mesh.mask.all()
+    full = magcoilcalc.Task(loop, magcoilcalc.Mesh([-60, 60], [-60, 60], 25, 25))
+    full.run()
+    for kwargs in [dict(), dict(threads=2), dict(processes=2)]:
+        task = magcoilcalc.Task(loop, mesh)
+        task.run(**kwargs)
+        assert np.all(np.isnan(task.x_field[~mesh.mask]))
+        assert np.allclose(task.x_field[mesh.mask], full.x_field[mesh.mask])
+    circle = magcoilcalc.RectilinearMesh(np.linspace(-10, 10, 5), np.linspace(-10, 10, 5),
+                                         mask=lambda x, y: x ** 2 + y ** 2 <= 50)
+    assert circle.mask.sum() == 9
+
+
+def test_masked_queries_raise():
+    loop = magcoilcalc.CurrentLoop([-30, 30], 40, 31, 1.0, 2)
+    mesh = magcoilcalc.Mesh([-60, 60], [-60, 60], 25, 25)
+    mesh.exclude_sources([loop], margin=2)
+    task = magcoilcalc.Task(loop, mesh)
+    task.run()
+    bx, by = task.field_at([[0, 0], [0, 10]])
+    assert np.all(np.isfinite(bx))
+    assert np.all(np.isfinite(task.center_field))
+    with pytest.raises(ValueError, match="masked"):
+        task.field_at([0, 40])
+    with pytest.raises(ValueError, match="masked"):
+        task.x_field_at([[0, 41]])
+    g = magcoilcalc.calculations.find_gradient(task)
+    assert np.all(np.isnan(g[~mesh.mask]))
+    assert np.all(np.isfinite(magcoilcalc.calculations.find_gradient(task, region=((-20, 20), (-20, 20)))))
+    assert np.isfinite(magcoilcalc.calculations.fom_cylindrical_cell(task, 40, 40))
+    with pytest.raises(ValueError, match="masked"):
+        magcoilcalc.calculations.fom_cylindrical_cell(task, 100, 100)
+    with pytest.raises(ValueError, match="masked"):
+        task.make_gradient_interpolator()([[0, 35]])
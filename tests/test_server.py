@@ -0,0 +1,56 @@
+import json
+import threading
+import urllib.request
+import magcoilcalc
+import magcoilcalc.server
+import magcoilcalc.templates
+import numpy as np
+
+
+def test_service_caches():
+    mesh = magcoilcalc.Mesh([-100, 100], [-50, 50], 21, 11)
+    service = magcoilcalc.server.EvaluationService(mesh, workers=2)
+    design = {'template': 'helmholtz_coil', 'params': {'r': 250}}
+    first = service.solve(design, fields=True)
+    task = magcoilcalc.Task(magcoilcalc.templates.helmholtz_coil(r=250), mesh)
+    task.run()
+    assert np.allclose(first['x_field'], task.x_field)
+    assert service.solve(design) == {'center_field': first['center_field']}
+    assert service.status()['tasks']['hits'] == 1
+    # same geometry at another current reuses the per-source field maps
+    doubled = service.solve({'template': 'helmholtz_coil', 'params': {'r': 250, 'current': 2}})
+    assert np.isclose(doubled['center_field'][0], 2 * first['center_field'][0])
+    assert service.status()['bases']['hits'] == 2
+    probe = service.probe(design, [[0, 0], [10, 5]])
+    assert np.isclose(probe['bx'][0], first['center_field'][0])
+    assert service.fom(design, [100, 60])['fom'] > 0
+    service.close()
+
+
+def test_mesh_cache_bounded():
+    service = magcoilcalc.server.EvaluationService(workers=1, mesh_cache_bytes=3 * 2 * 11 * 5 * 8)
+    design = {'loops': [[-50, 100, 1.0], [50, 100, 1.0]]}
+    for steps in range(11, 17):
+        service.solve(design, mesh={'x_range': [-50, 50], 'y_range': [-20, 20], 'steps': [steps, 5]})
+    meshes = service.status()['meshes']
+    assert meshes['entries'] < 6
+    assert meshes['bytes'] <= 3 * 2 * 11 * 5 * 8
+    service.close()
+
+
+def test_http_roundtrip():
+    service = magcoilcalc.server.EvaluationService(magcoilcalc.Mesh([-50, 50], [-20, 20], 11, 5), workers=1)
+    server = magcoilcalc.server.make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = 'http://127.0.0.1:%d' % server.server_address[1]
+    try:
+        body = json.dumps({'design': {'loops': [[-50, 100, 1.0], [50, 100, 1.0]]}, 'points': [[0, 0]]}).encode()
+        with urllib.request.urlopen(urllib.request.Request(url + '/probe', data=body)) as response:
+            assert len(json.loads(response.read())['bx']) == 1
+        with urllib.request.urlopen(url + '/status') as response:
+            assert json.loads(response.read())['tasks']['entries'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
@@ -65,3 +65,18 @@ def test_run_tasks_sp(task):
     tasks = [task.get(), task.get(), task.get()]
     tasks = magcoilcalc.run_tasks(tasks, processes=1)
     assert ([x.done for x in tasks])
+
+
+def test_threads(task):
+    task1 = task.get()
+    task2 = task.get()
+    task1.run()
+    task2.run(threads=3)
+    assert task2.done
+    assert np.allclose(task1.x_field, task2.x_field)
+    assert np.allclose(task1.y_field, task2.y_field)
+    task3 = task.get()
+    task3._run_threads(2, tile_rows=1)
+    assert np.allclose(task1.x_field, task3.x_field)
+    with pytest.raises(ValueError):
+        task.get().run(processes=2, threads=2)
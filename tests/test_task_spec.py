@@ -0,0 +1,59 @@
+import functools
+import pickle
+import magcoilcalc
+import magcoilcalc.calculations
+import numpy as np
+
+
+def _task():
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    mag1 = magcoilcalc.CurrentLoop([-50, 50], [20, 20], 21, 1.2, 4)
+    mag2 = magcoilcalc.CurrentSheet([-50, -40], [20, 20], 5, 1.2, 1)
+    return magcoilcalc.Task([mag1, mag2], mesh)
+
+
+def test_spec_round_trip():
+    task = _task()
+    spec = task.to_spec()
+    assert spec.loops.shape == (sum(len(source.get_loop_list()) for source in task.sources), 3)
+    assert spec.sources == []
+    copy = pickle.loads(pickle.dumps(spec)).to_task()
+    task.run()
+    copy.run()
+    assert np.allclose(task.x_field, copy.x_field)
+    assert np.allclose(task.y_field, copy.y_field)
+
+
+def test_run_tasks_reduce_and_shared():
+    tasks = [_task(), _task()]
+    reference = _task()
+    reference.run()
+    centers = magcoilcalc.run_tasks(tasks, processes=2, reduce='center_field')
+    assert np.allclose(centers, reference.center_field)
+    fom = functools.partial(magcoilcalc.calculations.fom_cylindrical_cell, length=20, diameter=10)
+    assert np.allclose(magcoilcalc.run_tasks(tasks, reduce=fom), fom(reference))
+    done = magcoilcalc.run_tasks(tasks, processes=2, shared_fields=True)
+    assert not tasks[0].done
+    assert np.allclose(done[1].x_field, reference.x_field)
+    assert np.allclose(done[1].y_field, reference.y_field)
+
+
+def test_run_sources_on_mesh():
+    task = _task()
+    done = magcoilcalc.run_sources_on_mesh(task.mesh, [task.sources, task.sources[:1]], processes=2)
+    task.run()
+    assert np.allclose(done[0].x_field, task.x_field)
+
+
+def test_callable_mask_in_workers():
+    mesh = magcoilcalc.Mesh([-20, 20], [-10, 10], 21, 11)
+    mesh.mask = lambda x, y: x ** 2 + y ** 2 <= 150
+    task = magcoilcalc.Task([magcoilcalc.CurrentLoop([-50, 50], [20, 20], 21, 1.2, 4)], mesh)
+    assert isinstance(pickle.loads(pickle.dumps(task.to_spec())).mesh.mask, np.ndarray)
+    assert callable(mesh._mask)
+    done = magcoilcalc.run_tasks([task], processes=2)
+    by_mesh = magcoilcalc.run_sources_on_mesh(mesh, [task.sources], processes=2)
+    task.run()
+    for result in (done[0], by_mesh[0]):
+        assert np.array_equal(np.isnan(result.x_field), ~mesh.mask)
+        assert np.allclose(result.x_field[mesh.mask], task.x_field[mesh.mask])
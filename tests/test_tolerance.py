@@ -0,0 +1,51 @@
+import magcoilcalc
+import magcoilcalc.templates
+import magcoilcalc.calculations
+import numpy as np
+from magcoilcalc.core import _loops_b_field_vec
+from magcoilcalc.tolerance import tolerance_analysis, wilson_interval, _batched_loops_b_field
+
+
+def test_layer_index():
+    loop = magcoilcalc.CurrentLoop([-10, 10], 20, 7, 1.0, 3)
+    index = loop.get_layer_index()
+    assert list(index) == [0, 0, 0, 1, 1, 2, 2]
+    assert np.allclose(loop.get_loop_list()[:, 1], 20 + index)
+
+
+def test_batched_kernel():
+    rng = np.random.default_rng(0)
+    loops = np.stack([rng.uniform([-20, 10, -1], [20, 30, 1], (9, 3)) for _ in range(4)])
+    x = rng.uniform(-10, 10, 15)
+    y = rng.uniform(-5, 5, 15)
+    bx, by = _batched_loops_b_field(loops, x, y)
+    for sample in range(4):
+        reference = _loops_b_field_vec(loops[sample], x, y)
+        assert np.allclose(bx[sample], reference[0]) and np.allclose(by[sample], reference[1])
+
+
+def test_tolerance_analysis():
+    sources = magcoilcalc.templates.helmholtz_coil(turns=30)
+    task = magcoilcalc.Task(sources, magcoilcalc.Mesh([-60, 60], [-40, 40], 121, 81))
+    task.run()
+    exact = tolerance_analysis(task, 100, 60, samples=5)
+    assert np.allclose(exact['center_field'], task.center_field[0])
+    assert np.allclose(exact['fom'], magcoilcalc.calculations.fom_cylindrical_cell(task, 100, 60), rtol=1e-3)
+
+    ripple = tolerance_analysis(sources, 100, 60, samples=400, current_ripple=1e-3, seed=1)
+    assert np.isclose(ripple['summary']['center_field']['std'], 1e-3 * abs(task.center_field[0]) / np.sqrt(2),
+                      rtol=0.2)
+    jitter = tolerance_analysis(sources, 100, 60, samples=100, position_sigma=0.5, radius_sigma=0.5,
+                                layer_thickness_sigma=0.05, fom_limit=exact['nominal']['fom'] * 1.1, seed=2,
+                                sample_block=7)
+    assert np.std(jitter['fom']) > 0
+    low, high = jitter['yield_interval']
+    assert low <= jitter['yield'] <= high
+    lo, hi = jitter['summary']['fom']['mean_interval']
+    assert lo < np.mean(jitter['fom']) < hi
+
+
+def test_wilson_interval():
+    assert np.isclose(wilson_interval(0, 100)[0], 0, atol=1e-12)
+    low, high = wilson_interval(50, 100)
+    assert np.isclose((low + high) / 2, 0.5) and np.isclose(high - low, 0.192, atol=0.002)
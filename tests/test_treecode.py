@@ -0,0 +1,42 @@
+import magcoilcalc
+import numpy as np
+from magcoilcalc.core import _loops_b_field_vec
+from magcoilcalc._treecode import treecode_b_field, _equivalent_loops
+
+
+def test_equivalent_loops_moments():
+    rng = np.random.default_rng(0)
+    loops = np.column_stack([rng.uniform(-5, 5, 50), rng.uniform(40, 45, 50), rng.uniform(-1, 2, 50)])
+    equivalents = _equivalent_loops(loops)
+    for sign in (1, -1):
+        original = loops[np.sign(loops[:, 2]) == sign]
+        equivalent = equivalents[np.sign(equivalents[:, 2]) == sign]
+        assert np.isclose(np.sum(original[:, 2]), np.sum(equivalent[:, 2]))
+        for moment in ([1, 0], [0, 1], [2, 0], [1, 1], [0, 2]):
+            assert np.isclose(np.sum(original[:, 2] * original[:, 0] ** moment[0] * original[:, 1] ** moment[1]),
+                              np.sum(equivalent[:, 2] * equivalent[:, 0] ** moment[0] * equivalent[:, 1] ** moment[1]))
+
+
+def test_treecode_tolerance():
+    loops = np.vstack([magcoilcalc.CurrentLoop([-150, 150], 60, 1500, 1.0, 5).get_loop_list(),
+                       magcoilcalc.CurrentLoop([-20, 20], 100, 200, -2.0, 4).get_loop_list()])
+    x_mesh, y_mesh = np.meshgrid(np.linspace(-200, 200, 61), np.linspace(-120, 120, 37))
+    reference = _loops_b_field_vec(loops, x_mesh, y_mesh)
+    finite = np.isfinite(reference[0])
+    scale = np.max(np.hypot(*reference)[finite])
+    for tolerance in (1e-3, 1e-5):
+        bx, by = treecode_b_field(loops, x_mesh, y_mesh, tolerance)
+        error = np.hypot(bx - reference[0], by - reference[1])
+        assert np.max(error[finite]) < tolerance * scale
+
+
+def test_treecode_engine():
+    sources = [magcoilcalc.CurrentLoop([-100, 100], 50, 400, 1.0, 4), magcoilcalc.CurrentSheet([-10, 10], 80, 5, 1.0)]
+    mesh = magcoilcalc.Mesh([-60, 60], [-40, 40], 41, 27, mask=lambda x, y: x ** 2 + y ** 2 < 45 ** 2)
+    direct = magcoilcalc.Task(sources, mesh)
+    direct.run()
+    tree = magcoilcalc.Task(sources, mesh)
+    tree.run(engine='treecode', tree_tolerance=1e-6)
+    assert np.array_equal(np.isnan(tree.x_field), ~mesh.mask)
+    assert np.allclose(tree.x_field[mesh.mask], direct.x_field[mesh.mask], rtol=0,
+                       atol=1e-6 * np.max(np.abs(direct.x_field[mesh.mask])))